@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+chaos-driver: orquestra os incidentes (dos / kill_api / netfail) em asyncio, com o
+prober HTTP a correr em paralelo no mesmo processo, e regista cada evento em
+<RUN_DIR>/events.jsonl com timestamps em nanossegundos:
+
+  {"ts": "...", "wall_ns": 1768981764876929123, "mono_ns": 912345678901,
+   "event": "ACTION", "action": "deleting_one_api_pod", "pod": "api-..."}
+
+`wall_ns` (time.time_ns) situa o evento no tempo e é o que a análise usa (em µs,
+a escala do http_metrics.csv); `mono_ns` (time.monotonic_ns) fica no registo para
+medir à mão intervalos exatos entre eventos do mesmo run, imunes a acertos do relógio.
+Os marcadores são os mesmos do run_incident.sh/monitor_http.sh (INCIDENT_START,
+ACTION deleting_one_api_pod, FIRST_FAILURE, ...), e o prober escreve o mesmo
+http_metrics.csv do monitor, por isso a análise corre sem alterações:
+  python3 scripts/resilience_analyze.py all <RUN_DIR>
+
+Uso:
+  python3 scripts/chaos_driver.py <RUN_DIR> [--plan dos@10,kill_api@90,netfail@150]
+  python3 scripts/chaos_driver.py results/mock_run --cluster mock   # sem cluster
+"""
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import ssl
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from resilience.events import event_msg
+
+HEADER = "ts_iso,endpoint,http_code,lat_ms,ok,interval_s"
+ENDPOINTS = ("/ping", "/secure-data")
+
+
+def iso_of_ns(wall_ns: int) -> str:
+    s, ns = divmod(wall_ns, 1_000_000_000)
+    dt = datetime.fromtimestamp(s, tz=timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S") + f".{ns:09d}+00:00"
+
+
+class EventLog:
+    """events.jsonl: uma linha JSON por evento, escrita e flushed de imediato."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._fh = path.open("a", encoding="utf-8")
+
+    def emit(self, event: str, **fields) -> Dict[str, object]:
+        wall_ns, mono_ns = time.time_ns(), time.monotonic_ns()
+        rec = {"ts": iso_of_ns(wall_ns), "wall_ns": wall_ns, "mono_ns": mono_ns, "event": event, **fields}
+        self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        print(f"[{rec['ts']}] {event_msg(rec)}", flush=True)
+        return rec
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+# -----------------------------------------------------------------------------
+# Cluster real (kubectl / k6)
+# -----------------------------------------------------------------------------
+class KubectlCluster:
+    def __init__(self, ns: str, api_label: str, commands_log: Path) -> None:
+        self.ns = ns
+        self.api_label = api_label
+        self.commands_log = commands_log
+
+    async def _run(self, *argv: str, stdout=None) -> Tuple[int, str]:
+        # regista comandos para reprodutibilidade (como o run_incident.sh)
+        with self.commands_log.open("a", encoding="utf-8") as f:
+            f.write("+ " + " ".join(shlex.quote(a) for a in argv) + "\n")
+        proc = await asyncio.create_subprocess_exec(
+            *argv, stdout=stdout or asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        )
+        out, _ = await proc.communicate()
+        return proc.returncode, (out or b"").decode("utf-8", "replace")
+
+    async def pick_api_pod(self) -> Optional[str]:
+        rc, out = await self._run("kubectl", "-n", self.ns, "get", "pod", "-l", self.api_label,
+                                  "-o", "jsonpath={.items[0].metadata.name}")
+        return (out.strip() or None) if rc == 0 else None
+
+    async def delete_pod(self, name: str) -> None:
+        await self._run("kubectl", "-n", self.ns, "delete", "pod", name, "--force", "--grace-period=0")
+
+    async def wait_rollout(self, deployment: str, timeout_s: float) -> bool:
+        rc, _ = await self._run("kubectl", "-n", self.ns, "rollout", "status",
+                                f"deployment/{deployment}", f"--timeout={int(timeout_s)}s")
+        return rc == 0
+
+    async def backup_policy(self, name: str, dest: Path) -> bool:
+        rc, out = await self._run("kubectl", "-n", self.ns, "get", "networkpolicy", name, "-o", "yaml")
+        if rc != 0 or not out.strip():
+            return False
+        dest.write_text(out, encoding="utf-8")
+        return True
+
+    async def delete_policy(self, name: str) -> None:
+        await self._run("kubectl", "-n", self.ns, "delete", "networkpolicy", name, "--ignore-not-found=true")
+
+    async def apply_file(self, path: Path) -> None:
+        rc, out = await self._run("kubectl", "-n", self.ns, "apply", "-f", str(path))
+        if rc != 0:
+            raise RuntimeError(f"kubectl apply falhou: {out.strip()}")
+
+    async def run_k6(self, script: str, out_dir: Path) -> int:
+        with (out_dir / "k6_output.log").open("wb") as f:
+            rc, _ = await self._run("k6", "run", "--summary-export", str(out_dir / "k6_summary.json"),
+                                    script, stdout=f)
+        return rc
+
+
+# -----------------------------------------------------------------------------
+# Prober (equivalente ao monitor_http.sh, com probing adaptativo)
+# -----------------------------------------------------------------------------
+class Prober:
+    def __init__(self, base_url: str, csv_path: Path, events: EventLog, ctx: Optional[ssl.SSLContext],
+                 interval_s: float, burst_interval_s: float, stable_n: int, timeout_s: float) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.csv_path = csv_path
+        self.events = events
+        self.ctx = ctx
+        self.interval_s = interval_s
+        self.burst_interval_s = burst_interval_s
+        self.stable_n = stable_n
+        self.timeout_s = timeout_s
+        self.active_incidents: set = set()
+        self._stop = asyncio.Event()
+
+    def _get(self, path: str) -> int:
+        try:
+            with urllib.request.urlopen(self.base_url + path, timeout=self.timeout_s, context=self.ctx) as r:
+                r.read()
+                return r.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except (urllib.error.URLError, OSError):
+            return 0
+
+    async def measure(self, path: str, interval_s: float, out) -> int:
+        wall_ns, t0 = time.time_ns(), time.monotonic_ns()
+        # urllib é bloqueante: cada pedido numa thread, os dois endpoints em paralelo
+        code = await asyncio.to_thread(self._get, path)
+        lat_ms = (time.monotonic_ns() - t0) // 1_000_000
+        ok = 1 if 200 <= code < 300 else 0
+        out.write(f"{iso_of_ns(wall_ns)[:26]}+00:00,{path},{code:03d},{lat_ms},{ok},{interval_s}\n")
+        return ok
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def run(self) -> None:
+        new_file = not self.csv_path.exists()
+        interval = self.interval_s
+        failing, ok_streak = False, 0
+        with self.csv_path.open("a", encoding="utf-8") as out:
+            if new_file:
+                out.write(HEADER + "\n")
+            while not self._stop.is_set():
+                oks = await asyncio.gather(*(self.measure(p, interval, out) for p in ENDPOINTS))
+                out.flush()
+                fields = {f"{p.strip('/').split('-')[0]}_ok": ok for p, ok in zip(ENDPOINTS, oks)}
+                if not all(oks):
+                    ok_streak = 0
+                    if not failing:
+                        failing = True
+                        self.events.emit("FIRST_FAILURE", **fields)
+                else:
+                    ok_streak += 1
+                    if failing:
+                        failing = False
+                        self.events.emit("RECOVERED", **fields)
+
+                if ok_streak == 0:
+                    new, reason = self.burst_interval_s, "failure"
+                elif self.active_incidents:
+                    new, reason = self.burst_interval_s, "incident_start"
+                elif ok_streak >= self.stable_n:
+                    new, reason = self.interval_s, "stable"
+                else:
+                    new, reason = interval, ""
+                if new != interval:
+                    interval = new
+                    self.events.emit("PROBE_RATE", interval=f"{new}s", reason=reason)
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+
+
+# -----------------------------------------------------------------------------
+# Incidentes (mesmos marcadores do run_incident.sh)
+# -----------------------------------------------------------------------------
+async def incident_dos(cluster, events: EventLog, args: argparse.Namespace) -> None:
+    out_dir = args.run_dir / "dos"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    events.emit("ACTION", action="run_k6", script=args.k6_script)
+    rc = await cluster.run_k6(args.k6_script, out_dir)
+    events.emit("ACTION", action="k6_finished", rc=rc)
+
+
+async def incident_kill_api(cluster, events: EventLog, args: argparse.Namespace) -> None:
+    pod = await cluster.pick_api_pod()
+    if not pod:
+        raise RuntimeError(f"não encontrei pod API com label '{args.api_label}' em ns={args.ns}")
+    events.emit("ACTION", action="deleting_one_api_pod", pod=pod)
+    await cluster.delete_pod(pod)
+    events.emit("ACTION", action="waiting_for_api_rollout", deployment="api")
+    if not await cluster.wait_rollout("api", args.rollout_timeout_s):
+        raise RuntimeError("rollout da API não ficou pronto dentro do timeout")
+    events.emit("RECOVERED_INFRA", type="kill_api", deployment="api")
+
+
+async def incident_netfail(cluster, events: EventLog, args: argparse.Namespace) -> None:
+    name = args.allow_policy
+    out_dir = args.run_dir / "netfail"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    backup = out_dir / f"{name}.backup.yaml"
+    if not await cluster.backup_policy(name, backup):
+        raise RuntimeError(f"não existe '{name}' para fazer backup; sem backup não sei restaurar")
+    events.emit("ACTION", action="delete_allow_policy", name=name)
+    await cluster.delete_policy(name)
+    try:
+        events.emit("ACTION", action="netfail_sleep", seconds=args.netfail_seconds)
+        await asyncio.sleep(args.netfail_seconds)
+    finally:
+        # restaura mesmo com Ctrl+C / erro: não deixar o cluster partido
+        events.emit("ACTION", action="restore_allow_policy", name=name)
+        await cluster.apply_file(backup)
+
+
+INCIDENTS = {"dos": incident_dos, "kill_api": incident_kill_api, "netfail": incident_netfail}
+
+
+def parse_plan(s: str) -> List[Tuple[str, float]]:
+    """'dos@10,kill_api@90' -> [(tipo, segundos desde o início), ...]"""
+    plan = []
+    for item in s.split(","):
+        typ, _, at = item.strip().partition("@")
+        if typ not in INCIDENTS:
+            raise argparse.ArgumentTypeError(f"incidente desconhecido: {typ} (suportados: {', '.join(INCIDENTS)})")
+        plan.append((typ, float(at or 0)))
+    return sorted(plan, key=lambda p: p[1])
+
+
+async def scheduled(typ: str, at_s: float, t0: float, cluster, events: EventLog, prober: Optional[Prober],
+                    args: argparse.Namespace) -> bool:
+    # agenda pelo relógio monotónico do loop: sem deriva acumulada entre incidentes
+    await asyncio.sleep(max(0.0, t0 + at_s - asyncio.get_running_loop().time()))
+    if prober is not None:
+        prober.active_incidents.add(typ)
+    events.emit("INCIDENT_START", type=typ, scheduled_s=at_s)
+    ok = True
+    try:
+        await INCIDENTS[typ](cluster, events, args)
+    except Exception as e:  # noqa: BLE001 - o erro fica no events.jsonl e o run continua
+        ok = False
+        events.emit("INCIDENT_ERROR", type=typ, error=str(e))
+    finally:
+        events.emit("INCIDENT_END", type=typ)
+        if prober is not None:
+            prober.active_incidents.discard(typ)
+    return ok
+
+
+def ssl_context(args: argparse.Namespace) -> Optional[ssl.SSLContext]:
+    if not args.base_url.startswith("https"):
+        return None
+    if args.insecure:
+        ctx = ssl.create_default_context()
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+        return ctx
+    return ssl.create_default_context(cafile=args.ca)
+
+
+async def run(args: argparse.Namespace) -> int:
+    args.run_dir.mkdir(parents=True, exist_ok=True)
+    mock = None
+    if args.cluster == "mock":
+        from chaos_mock import MockCluster
+
+        cluster = mock = MockCluster(seed=args.seed, dos_s=args.mock_dos_s)
+        args.base_url = await mock.start()
+    else:
+        cluster = KubectlCluster(args.ns, args.api_label, args.run_dir / "commands.log")
+
+    events = EventLog(args.run_dir / "events.jsonl")
+    prober = None
+    probe_task = None
+    if not args.no_probe:
+        prober = Prober(args.base_url, args.run_dir / "http_metrics.csv", events, ssl_context(args),
+                        args.interval, args.burst_interval, args.stable_n, args.timeout)
+        probe_task = asyncio.create_task(prober.run())
+
+    events.emit("RUN_START", cluster=args.cluster, base_url=args.base_url,
+                plan=",".join(f"{t}@{a:g}" for t, a in args.plan))
+    t0 = asyncio.get_running_loop().time()
+    try:
+        results = await asyncio.gather(*(
+            scheduled(typ, at_s, t0, cluster, events, prober, args) for typ, at_s in args.plan
+        ))
+        # janela pós-incidente para o prober ver a recuperação
+        await asyncio.sleep(args.tail_s)
+    finally:
+        if prober is not None:
+            prober.stop()
+            await probe_task
+        events.emit("RUN_END")
+        events.close()
+        if mock is not None:
+            await mock.stop()
+    print(f"[OK] {args.run_dir / 'events.jsonl'}" + ("" if args.no_probe else f" + {args.run_dir / 'http_metrics.csv'}"))
+    return 0 if all(results) else 1
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(prog="chaos-driver")
+    ap.add_argument("run_dir", type=Path)
+    ap.add_argument("--plan", type=parse_plan, default=parse_plan("dos@10,kill_api@90,netfail@150"),
+                    help="incidentes e segundos desde o início (ex: dos@10,kill_api@90,netfail@150)")
+    ap.add_argument("--cluster", choices=("kubectl", "mock"), default="kubectl")
+    ap.add_argument("--base-url", default=os.getenv("BASE_URL", "https://api.resilience.local"))
+    ap.add_argument("--ns", default=os.getenv("NS", "resilience"))
+    ap.add_argument("--api-label", default=os.getenv("API_LABEL", "app=api"))
+    ap.add_argument("--allow-policy", default="allow-api-to-auth")
+    ap.add_argument("--k6-script", default=os.getenv("K6_SCRIPT", "scripts/k6-dos.js"))
+    ap.add_argument("--netfail-seconds", type=float, default=float(os.getenv("NETFAIL_SECONDS", "20")))
+    ap.add_argument("--rollout-timeout-s", type=float, default=120.0)
+    ap.add_argument("--tail-s", type=float, default=30.0, help="segundos de probing após o último incidente")
+    ap.add_argument("--no-probe", action="store_true", help="sem prober (p.ex. com o monitor_http.sh a correr)")
+    ap.add_argument("--interval", type=float, default=1.0)
+    ap.add_argument("--burst-interval", type=float, default=0.2)
+    ap.add_argument("--stable-n", type=int, default=3)
+    ap.add_argument("--timeout", type=float, default=5.0)
+    ap.add_argument("--insecure", action="store_true", default=os.getenv("CURL_INSECURE", "1") == "1")
+    ap.add_argument("--ca", default=os.getenv("CURL_CA") or None)
+    ap.add_argument("--seed", type=int, default=None, help="mock: semente do gerador aleatório")
+    ap.add_argument("--mock-dos-s", type=float, default=20.0, help="mock: duração do DoS simulado")
+    args = ap.parse_args()
+    try:
+        return asyncio.run(run(args))
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Cluster simulado para o chaos_driver.py: um servidor HTTP local (asyncio) com
+/ping, /secure-data e /work atrás de N "pods" em round-robin, e as mesmas
+operações que o driver faz com kubectl (apagar um pod, esperar pelo rollout,
+apagar/restaurar a NetworkPolicy api->auth, correr o DoS).
+
+Comportamento (aproximado ao do cluster real):
+  - pod apagado: continua nos endpoints durante `failover_s` (502 nesse pod)
+    e é substituído por um novo, pronto `restart_s` depois;
+  - netfail: /secure-data responde 503 enquanto a policy não existir;
+  - dos: durante `dos_s` a latência sobe e uma fração dos pedidos dá 503.
+
+Permite testar o driver e a análise (resilience_analyze.py) sem cluster:
+  python3 scripts/chaos_driver.py results/mock_run --cluster mock
+"""
+import asyncio
+import itertools
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+REASONS = {200: "OK", 404: "Not Found", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+
+class MockPod:
+    def __init__(self, name: str, ready_at: float) -> None:
+        self.name = name
+        self.ready_at = ready_at
+        self.deleted_at: Optional[float] = None
+
+
+class MockCluster:
+    def __init__(
+        self,
+        pods: int = 3,
+        restart_s: float = 8.0,
+        failover_s: float = 3.0,
+        dos_s: float = 20.0,
+        dos_latency_s: float = 0.3,
+        dos_error_rate: float = 0.15,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.restart_s = restart_s
+        self.failover_s = failover_s
+        self.dos_s = dos_s
+        self.dos_latency_s = dos_latency_s
+        self.dos_error_rate = dos_error_rate
+        self.rng = random.Random(seed)
+        self._names = (f"api-mock-{i:04x}" for i in itertools.count(1))
+        self.pods: List[MockPod] = [MockPod(next(self._names), 0.0) for _ in range(pods)]
+        self.replicas = pods
+        self.policies: Dict[str, str] = {"allow-api-to-auth": "kind: NetworkPolicy  # mock\n"}
+        self.dos_until = 0.0
+        self._rr = itertools.count()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # -------------------------------------------------------------------------
+    # "Data plane": encaminhamento dos pedidos pelos pods
+    # -------------------------------------------------------------------------
+    def endpoints(self, now: float) -> List[MockPod]:
+        # pods prontos + pods apagados que o Service ainda não retirou
+        return [
+            p for p in self.pods
+            if p.ready_at <= now and (p.deleted_at is None or now - p.deleted_at < self.failover_s)
+        ]
+
+    async def route(self, path: str) -> int:
+        now = time.monotonic()
+        if now < self.dos_until:
+            await asyncio.sleep(self.dos_latency_s * (0.5 + self.rng.random()))
+            if self.rng.random() < self.dos_error_rate:
+                return 503
+        eps = self.endpoints(now)
+        if not eps:
+            return 503
+        pod = eps[next(self._rr) % len(eps)]
+        if pod.deleted_at is not None:
+            return 502
+        if path == "/secure-data" and "allow-api-to-auth" not in self.policies:
+            return 503
+        if path in ("/ping", "/secure-data", "/work", "/health"):
+            return 200
+        return 404
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) > 1 else "/"
+            status = await self.route(path)
+            body = b'{"mock":true}'
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    # -------------------------------------------------------------------------
+    # "Control plane": a mesma interface do KubectlCluster do driver
+    # -------------------------------------------------------------------------
+    async def pick_api_pod(self) -> Optional[str]:
+        live = [p for p in self.pods if p.deleted_at is None]
+        return live[0].name if live else None
+
+    async def delete_pod(self, name: str) -> None:
+        now = time.monotonic()
+        for p in self.pods:
+            if p.name == name and p.deleted_at is None:
+                p.deleted_at = now
+                # o ReplicaSet cria logo o substituto
+                self.pods.append(MockPod(next(self._names), now + self.restart_s))
+        # o pod apagado sai da lista quando sair dos endpoints
+        self.pods = [p for p in self.pods if p.deleted_at is None or now - p.deleted_at < self.failover_s + 60]
+
+    async def wait_rollout(self, deployment: str, timeout_s: float) -> bool:
+        t_end = time.monotonic() + timeout_s
+        while time.monotonic() < t_end:
+            now = time.monotonic()
+            ready = [p for p in self.pods if p.deleted_at is None and p.ready_at <= now]
+            if len(ready) >= self.replicas:
+                return True
+            await asyncio.sleep(0.1)
+        return False
+
+    async def backup_policy(self, name: str, dest: Path) -> bool:
+        if name not in self.policies:
+            return False
+        dest.write_text(self.policies[name], encoding="utf-8")
+        return True
+
+    async def delete_policy(self, name: str) -> None:
+        self.policies.pop(name, None)
+
+    async def apply_file(self, path: Path) -> None:
+        self.policies["allow-api-to-auth"] = path.read_text(encoding="utf-8")
+
+    async def run_k6(self, script: str, out_dir: Path) -> int:
+        self.dos_until = time.monotonic() + self.dos_s
+        await asyncio.sleep(self.dos_s)
+        return 0
@@ -2,6 +2,8 @@
 set -euo pipefail
 OUT_DIR="${1:-evidencias}"
 NS="${NS:-resilience}"
+# COMPRESS=gzip|zstd comprime os *_logs.txt no fim (a análise lê .gz/.zst diretamente)
+COMPRESS="${COMPRESS:-none}"
 
 mkdir -p "$OUT_DIR"
 
@@ -24,4 +26,10 @@ grep -E " 429 |ModSecurity|OWASP|limit" "$OUT_DIR/ingress_logs.txt" > "$OUT_DIR/
 echo "[*] NetworkPolicies..."
 kubectl -n "$NS" get networkpolicy -o yaml > "$OUT_DIR/networkpolicies.yaml"
 
+if [[ "$COMPRESS" == "gzip" ]]; then
+  gzip -f "$OUT_DIR"/*_logs.txt
+elif [[ "$COMPRESS" == "zstd" ]]; then
+  zstd -q -f --rm "$OUT_DIR"/*_logs.txt
+fi
+
 echo "[*] Evidence collected in $OUT_DIR"
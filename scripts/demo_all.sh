@@ -11,7 +11,7 @@ set -euo pipefail
 #  - scripts/run_incident.sh
 #  - scripts/collect_evidence.sh
 #  - scripts/summarize_run.sh
-#  - scripts/make_report.py
+#  - scripts/resilience_analyze.py (+ scripts/resilience/)
 #
 # Variáveis úteis:
 #  - BASE_URL (default: https://api.resilience.local)
@@ -44,7 +44,7 @@ if [[ ! -x "./scripts/preflight.sh" ]]; then echo "[ERRO] ./scripts/preflight.sh
 if [[ ! -x "./scripts/run_incident.sh" ]]; then echo "[ERRO] ./scripts/run_incident.sh não existe ou não é executável"; exit 1; fi
 if [[ ! -x "./scripts/collect_evidence.sh" ]]; then echo "[ERRO] ./scripts/collect_evidence.sh não existe ou não é executável"; exit 1; fi
 if [[ ! -x "./scripts/summarize_run.sh" ]]; then echo "[ERRO] ./scripts/summarize_run.sh não existe ou não é executável"; exit 1; fi
-if [[ ! -f "./scripts/make_report.py" ]]; then echo "[ERRO] ./scripts/make_report.py não existe"; exit 1; fi
+if [[ ! -f "./scripts/resilience_analyze.py" ]]; then echo "[ERRO] ./scripts/resilience_analyze.py não existe"; exit 1; fi
 
 # Run dir
 RUN_DIR="results/demo_$(date +%Y%m%d_%H%M%S)"
@@ -105,10 +105,8 @@ pause
 # 6) Evidências + Report + Summary
 echo "[*] A recolher evidências..."
 ./scripts/collect_evidence.sh "$RUN_DIR/evidencias"
-python3 scripts/make_report.py "$RUN_DIR"
-
-python3 scripts/calc_resilience_metrics.py "$RUN_DIR"
-python3 scripts/write_metrics_md.py "$RUN_DIR"
+# metrics.json + metrics.md + report.html com um único parse dos artefactos
+python3 scripts/resilience_analyze.py all "$RUN_DIR"
 
 ./scripts/summarize_run.sh "$RUN_DIR" | tee "$RUN_DIR/summary.txt"
 echo
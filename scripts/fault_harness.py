@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+fault-harness: corre a API e o Auth (apps FastAPI) no mesmo processo, ligados por
+transportes ASGI do httpx com falhas injetáveis, e executa um cenário de
+incidentes com um prober, escrevendo os mesmos artefactos de um run no cluster
+(http_metrics.csv + events.log) e o metrics.json/metrics.md da análise.
+
+Falhas (por ligação: "client" = prober -> API, como o Ingress; "auth" = API -> Auth):
+  latency_s / jitter_s   atraso adicional (respeita o timeout de leitura do pedido)
+  reset_rate             fração de pedidos com "connection reset"
+  tls_fail               falha do handshake TLS (p.ex. certificado expirado)
+  status / rate          resposta 5xx sem chegar ao serviço
+e "cpu" (busy_ms em cada period_ms a bloquear o event loop partilhado).
+
+Cenários: embutidos (--scenario auth_5xx|auth_latency|auth_tls|conn_reset|
+ingress_latency|cpu|all) ou um ficheiro JSON com o mesmo formato:
+  {"incidents": [{"type": "auth_5xx", "at_s": 1, "for_s": 3,
+                  "link": "auth", "fault": {"status": 503, "rate": 1.0}}]}
+
+Uso (a partir da raiz do repo; requer as dependências de services/*/requirements.txt):
+  python3 scripts/fault_harness.py results/local_auth_5xx --scenario auth_5xx
+  python3 scripts/fault_harness.py results/local_all --scenario all
+
+AUTH_MODE=remote por omissão: com AUTH_MODE=local a API não chama o Auth por
+pedido e as falhas na ligação "auth" não têm efeito no /secure-data.
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import random
+import sys
+import time
+import types
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+HEADER = "ts_iso,endpoint,http_code,lat_ms,ok,interval_s"
+ENDPOINTS = ("/ping", "/secure-data")
+
+SCENARIOS: Dict[str, List[Dict[str, object]]] = {
+    "auth_5xx": [{"type": "auth_5xx", "at_s": 1, "for_s": 3, "link": "auth",
+                  "fault": {"status": 503, "rate": 1.0}}],
+    "auth_latency": [{"type": "auth_latency", "at_s": 1, "for_s": 3, "link": "auth",
+                      "fault": {"latency_s": 4.0}}],
+    "auth_tls": [{"type": "auth_tls", "at_s": 1, "for_s": 3, "link": "auth", "fault": {"tls_fail": True}}],
+    "conn_reset": [{"type": "conn_reset", "at_s": 1, "for_s": 2, "link": "client",
+                    "fault": {"reset_rate": 0.5}}],
+    "ingress_latency": [{"type": "ingress_latency", "at_s": 1, "for_s": 2, "link": "client",
+                         "fault": {"latency_s": 0.3, "jitter_s": 0.2}}],
+    "cpu": [{"type": "cpu", "at_s": 1, "for_s": 3, "link": "cpu", "fault": {"busy_ms": 40, "period_ms": 50}}],
+}
+# todos em sequência, com intervalo suficiente para a janela pós-incidente
+SCENARIOS["all"] = [
+    {**inc, "at_s": 1 + 8 * i}
+    for i, inc in enumerate(s[0] for s in list(SCENARIOS.values()))
+]
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+
+# -----------------------------------------------------------------------------
+# Serviços in-process
+# -----------------------------------------------------------------------------
+def load_service(name: str, alias: str) -> types.ModuleType:
+    # services/api/src e services/auth/src são ambos "src": importa cada um com um
+    # nome próprio para os imports relativos (from . import runtime) resolverem
+    pkg = types.ModuleType(alias)
+    pkg.__path__ = [str(ROOT / "services" / name / "src")]
+    sys.modules[alias] = pkg
+    return importlib.import_module(f"{alias}.main")
+
+
+@dataclass
+class Faults:
+    latency_s: float = 0.0
+    jitter_s: float = 0.0
+    reset_rate: float = 0.0
+    tls_fail: bool = False
+    status: int = 0
+    rate: float = 0.0
+
+    def clear(self) -> None:
+        for f in fields(self):
+            setattr(self, f.name, f.default)
+
+
+class FaultTransport(httpx.AsyncBaseTransport):
+    """Transporte httpx que injeta falhas à frente de outro (aqui, um ASGITransport)."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, rng: random.Random) -> None:
+        self.inner = inner
+        self.faults = Faults()
+        self.rng = rng
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        f = self.faults
+        if f.tls_fail:
+            raise httpx.ConnectError("[SSL: CERTIFICATE_VERIFY_FAILED] certificate has expired (injected)",
+                                     request=request)
+        if f.reset_rate and self.rng.random() < f.reset_rate:
+            raise httpx.ReadError("[Errno 104] Connection reset by peer (injected)", request=request)
+        # o ASGITransport ignora timeouts: aplicamo-los aqui, como faria a rede
+        timeout = (request.extensions.get("timeout") or {}).get("read")
+        delay = f.latency_s + (self.rng.random() * f.jitter_s if f.jitter_s else 0.0)
+        if delay:
+            if timeout is not None and delay >= timeout:
+                await asyncio.sleep(timeout)
+                raise httpx.ReadTimeout("read timeout (injected latency)", request=request)
+            await asyncio.sleep(delay)
+        if f.status and self.rng.random() < f.rate:
+            return httpx.Response(f.status, json={"detail": "injected"}, request=request)
+        left = None if timeout is None else max(0.001, timeout - delay)
+        try:
+            return await asyncio.wait_for(self.inner.handle_async_request(request), left)
+        except asyncio.TimeoutError:
+            raise httpx.ReadTimeout("read timeout", request=request)
+
+
+class CpuHog:
+    """Contenção de CPU: bloqueia o event loop `busy_ms` em cada `period_ms`."""
+
+    def __init__(self) -> None:
+        self.busy_ms = 0.0
+        self.period_ms = 50.0
+
+    def clear(self) -> None:
+        self.busy_ms = 0.0
+
+    async def run_forever(self) -> None:
+        while True:
+            if self.busy_ms:
+                t_end = time.perf_counter() + self.busy_ms / 1000
+                while time.perf_counter() < t_end:
+                    pass
+            await asyncio.sleep(max(0.001, (self.period_ms - self.busy_ms) / 1000))
+
+
+# -----------------------------------------------------------------------------
+# Artefactos
+# -----------------------------------------------------------------------------
+class EventsLog:
+    def __init__(self, path: Path) -> None:
+        self._fh = path.open("a", encoding="utf-8")
+
+    def __call__(self, msg: str) -> None:
+        line = f"[{now_iso()}] {msg}"
+        self._fh.write(line + "\n")
+        self._fh.flush()
+        print(line, file=sys.stderr, flush=True)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+async def probe_loop(client: httpx.AsyncClient, out, interval_s: float, timeout_s: float,
+                     events: EventsLog, stop: asyncio.Event) -> None:
+    failing = False
+
+    async def measure(path: str) -> int:
+        ts = now_iso()
+        t0 = time.perf_counter()
+        try:
+            r = await asyncio.wait_for(client.get(path), timeout_s)
+            code = r.status_code
+        except (httpx.HTTPError, asyncio.TimeoutError):
+            code = 0  # como o curl: 000 sem resposta
+        lat_ms = int((time.perf_counter() - t0) * 1000)
+        ok = 1 if 200 <= code < 300 else 0
+        out.write(f"{ts},{path},{code:03d},{lat_ms},{ok},{interval_s}\n")
+        return ok
+
+    while not stop.is_set():
+        t_next = time.perf_counter() + interval_s
+        ok_ping, ok_secure = await asyncio.gather(*(measure(p) for p in ENDPOINTS))
+        out.flush()
+        if not (ok_ping and ok_secure):
+            if not failing:
+                failing = True
+                events(f"FIRST_FAILURE ping_ok={ok_ping} secure_ok={ok_secure}")
+        elif failing:
+            failing = False
+            events(f"RECOVERED ping_ok={ok_ping} secure_ok={ok_secure}")
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(stop.wait(), max(0.0, t_next - time.perf_counter()))
+
+
+async def run_incident(inc: Dict[str, object], t0: float, links: Dict[str, FaultTransport], hog: CpuHog,
+                       events: EventsLog) -> None:
+    await asyncio.sleep(max(0.0, t0 + float(inc["at_s"]) - time.perf_counter()))
+    typ, link, fault = inc["type"], inc["link"], dict(inc.get("fault") or {})
+    target = hog if link == "cpu" else links[link].faults
+    events(f"INCIDENT_START type={typ}")
+    events(f"ACTION inject_fault link={link} " + " ".join(f"{k}={v}" for k, v in fault.items()))
+    for k, v in fault.items():
+        setattr(target, k, v)
+    try:
+        await asyncio.sleep(float(inc["for_s"]))
+    finally:
+        target.clear()
+        events(f"ACTION clear_fault link={link}")
+        events(f"INCIDENT_END type={typ}")
+
+
+async def run(args: argparse.Namespace, incidents: List[Dict[str, object]]) -> None:
+    rng = random.Random(args.seed)
+    api = load_service("api", "api_src")
+    auth = load_service("auth", "auth_src")
+
+    links = {
+        "auth": FaultTransport(httpx.ASGITransport(app=auth.app), rng),
+        "client": FaultTransport(httpx.ASGITransport(app=api.app), rng),
+    }
+    # o cliente da API para o Auth passa a ser o transporte com falhas (em vez de TLS real)
+    api._client = httpx.AsyncClient(transport=links["auth"], timeout=3.0)
+    hog = CpuHog()
+
+    run_dir: Path = args.run_dir
+    events = EventsLog(run_dir / "events.log")
+    csv_path = run_dir / "http_metrics.csv"
+    async with auth.app.router.lifespan_context(auth.app), api.app.router.lifespan_context(api.app):
+        client = httpx.AsyncClient(transport=links["client"], base_url="https://api.resilience.local")
+        # AUTH_MODE=local: espera pelo token de serviço antes de começar
+        t_ready = time.perf_counter() + args.warmup_s
+        while time.perf_counter() < t_ready:
+            if (await client.get("/secure-data")).status_code == 200:
+                break
+            await asyncio.sleep(0.05)
+
+        hog_task = asyncio.create_task(hog.run_forever())
+        stop = asyncio.Event()
+        new_file = not csv_path.exists()
+        with csv_path.open("a", encoding="utf-8") as out:
+            if new_file:
+                out.write(HEADER + "\n")
+            probe = asyncio.create_task(probe_loop(client, out, args.interval, args.timeout, events, stop))
+            t0 = time.perf_counter()
+            await asyncio.gather(*(run_incident(inc, t0, links, hog, events) for inc in incidents))
+            await asyncio.sleep(args.post_window_s)
+            stop.set()
+            await probe
+        hog_task.cancel()
+        await client.aclose()
+    events.close()
+
+
+def print_summary(run_dir: Path) -> None:
+    from resilience.cli import write_metrics_json, write_metrics_md
+    from resilience.metrics import compute_metrics
+    from resilience.model import load_run
+
+    run = load_run(run_dir)
+    metrics = compute_metrics(run)
+    write_metrics_json(run, metrics)
+    write_metrics_md(run, metrics)
+
+    def f(v):
+        return "—" if v is None else f"{v:.3f}"
+
+    print("\n| Incidente | Endpoint | MTTD (s) | MTTR (s) | RTO (s) |")
+    print("|---|---|---:|---:|---:|")
+    for typ, eps in metrics["incidents"].items():
+        for ep, m in eps.items():
+            print(f"| {typ} | {ep} | {f(m['mttd_s'])} | {f(m['mttr_s'])} | {f(m['rto_s'])} |")
+    for ep, m in metrics["endpoints"].items():
+        print(f"- {ep}: disponibilidade {m['availability_pct']}%, p95 {m['lat_p95_ms']} ms ({m['samples']} amostras)")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(prog="fault-harness")
+    ap.add_argument("run_dir", type=Path)
+    ap.add_argument("--scenario", default="all", help=f"{'|'.join(SCENARIOS)} ou ficheiro JSON")
+    ap.add_argument("--interval", type=float, default=0.05, help="segundos entre ciclos do prober")
+    ap.add_argument("--timeout", type=float, default=2.0, help="timeout de cada pedido do prober")
+    ap.add_argument("--post-window-s", type=int, default=3, help="probing após o último incidente")
+    ap.add_argument("--warmup-s", type=float, default=5.0)
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+
+    if args.scenario in SCENARIOS:
+        incidents = SCENARIOS[args.scenario]
+    else:
+        incidents = json.loads(Path(args.scenario).read_text(encoding="utf-8"))["incidents"]
+
+    # defaults para correr fora do cluster (o ambiente continua a mandar)
+    os.environ.setdefault("RATE_LIMIT_MODE", "off")  # o prober seria um único cliente acima do limite
+    os.environ.setdefault("AUTH_MODE", "remote")  # a API chama o Auth em cada /secure-data (ligação "auth")
+    os.environ.setdefault("AUTH_TOKENS_FILE", str(args.run_dir / ".no-tokens-file"))
+    os.environ.setdefault("AUTH_SIGNING_KEYS_FILE", str(args.run_dir / ".no-signing-keys"))
+
+    if os.environ["AUTH_MODE"] == "local" and any(i.get("link") == "auth" for i in incidents):
+        print("[WARN] AUTH_MODE=local: a API valida tokens sem chamar o Auth, "
+              "as falhas na ligação \"auth\" não vão aparecer no /secure-data", file=sys.stderr)
+
+    args.run_dir.mkdir(parents=True, exist_ok=True)
+    (args.run_dir / "post_window_s.txt").write_text(f"{args.post_window_s}\n", encoding="utf-8")
+    ev_dir = args.run_dir / "evidencias"
+    ev_dir.mkdir(exist_ok=True)
+    # os logs JSON dos dois serviços (stdout) vão para um ficheiro, como o kubectl logs
+    with (ev_dir / "inprocess_logs.txt").open("a", encoding="utf-8") as logs, contextlib.redirect_stdout(logs):
+        t0 = time.perf_counter()
+        asyncio.run(run(args, incidents))
+        elapsed = time.perf_counter() - t0
+    print(f"[OK] cenário '{args.scenario}' em {elapsed:.1f}s -> {args.run_dir}")
+    print_summary(args.run_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
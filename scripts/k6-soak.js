@@ -0,0 +1,35 @@
+import http from "k6/http";
+import { Rate } from "k6/metrics";
+
+// Carga constante para soak tests (horas): mistura leve de /ping, /secure-data e /work.
+//   k6 run -e DURATION=4h -e RATE=8 scripts/k6-soak.js
+// (RATE <= 10 cabe no orçamento de um cliente junto com o monitor_http.sh, ver soak.sh)
+const BASE_URL = __ENV.BASE_URL || "https://api.resilience.local";
+
+export const rate_errors = new Rate("rate_errors");
+
+export const options = {
+  insecureSkipTLSVerify: true,
+  scenarios: {
+    soak: {
+      executor: "constant-arrival-rate",
+      rate: Number(__ENV.RATE || 8),
+      timeUnit: "1s",
+      duration: __ENV.DURATION || "1h",
+      preAllocatedVUs: 20,
+      maxVUs: 200,
+    },
+  },
+  thresholds: {
+    rate_errors: ["rate<0.01"],
+  },
+};
+
+const PATHS = ["/ping", "/ping", "/secure-data", "/secure-data", "/work?n=50000"];
+
+export default function () {
+  const path = PATHS[Math.floor(Math.random() * PATHS.length)];
+  const res = http.get(`${BASE_URL}${path}`, { timeout: "10s", headers: { "X-Request-Timeout-Ms": "10000" } });
+  // 429 é o rate limit a funcionar, não um erro do serviço
+  rate_errors.add(res.status === 0 || res.status >= 500);
+}
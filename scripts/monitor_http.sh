@@ -10,15 +10,44 @@ set -euo pipefail
 # Nota:
 #   - Se usar cert self-signed no Ingress, usa CURL_INSECURE=1
 #   - Se CA, podes passar CURL_CA=/path/ca.crt
+#
+# Probing adaptativo (ADAPTIVE=1, default):
+#   - ritmo base = INTERVAL_SEC (2º argumento)
+#   - passa a BURST_INTERVAL_SEC (default 0.2s) quando observa uma falha ou há
+#     um INCIDENT_START sem INCIDENT_END nos events.log do run
+#   - volta ao ritmo base após STABLE_N (default 3) ciclos OK seguidos, sem incidente ativo
+#   - cada amostra regista o intervalo ativo (coluna interval_s), para a análise
+#     poder ponderar as amostras pelo tempo que representam
+#
+# Runs longos (soak): ROTATE_LINES>0 escreve em http_metrics.csv.d/ em vez de
+# http_metrics.csv: active.csv recebe as amostras e, a cada ROTATE_LINES linhas,
+# é fechado num chunk comprimido (COMPRESS=gzip|zstd) registado em index.jsonl
+# com o intervalo temporal (a análise só descomprime os chunks de que precisa).
 
 BASE_URL="${1:?BASE_URL (ex: https://api.resilience.local)}"
 INTERVAL_SEC="${2:-1}"
 OUT_DIR="${3:-results/run}"
 
+ADAPTIVE="${ADAPTIVE:-1}"
+BURST_INTERVAL_SEC="${BURST_INTERVAL_SEC:-0.2}"
+STABLE_N="${STABLE_N:-3}"
+ROTATE_LINES="${ROTATE_LINES:-0}"
+COMPRESS="${COMPRESS:-gzip}"
+
 mkdir -p "$OUT_DIR"
 
-CSV="$OUT_DIR/http_metrics.csv"
+HEADER="ts_iso,endpoint,http_code,lat_ms,ok,interval_s"
 EVENTS="$OUT_DIR/events.log"
+if (( ROTATE_LINES > 0 )); then
+  CHUNK_DIR="$OUT_DIR/http_metrics.csv.d"
+  CSV="$CHUNK_DIR/active.csv"
+  mkdir -p "$CHUNK_DIR"
+  CHUNK_SEQ="$(grep -c . "$CHUNK_DIR/index.jsonl" 2>/dev/null || true)"
+  CHUNK_SEQ="${CHUNK_SEQ:-0}"
+else
+  CSV="$OUT_DIR/http_metrics.csv"
+fi
+CSV_LINES=0
 
 CURL_FLAGS=()
 if [[ "${CURL_INSECURE:-0}" == "1" ]]; then
@@ -28,16 +57,53 @@ if [[ -n "${CURL_CA:-}" ]]; then
   CURL_FLAGS+=(--cacert "$CURL_CA")
 fi
 
-echo "ts_iso,endpoint,http_code,lat_ms,ok" > "$CSV"
-echo "[$(date -Is)] monitor started base_url=$BASE_URL interval=${INTERVAL_SEC}s" | tee -a "$EVENTS"
+# timestamps com milissegundos (no modo burst há várias amostras por segundo)
+now_iso() {
+  date -u +%Y-%m-%dT%H:%M:%S.%3N+00:00
+}
+
+# fecha o chunk ativo: comprime-o e acrescenta a entrada ao índice
+rotate_csv() {
+  (( CSV_LINES > 0 )) || return 0
+  CHUNK_SEQ=$((CHUNK_SEQ+1))
+  local chunk t_min t_max
+  chunk="$CHUNK_DIR/$(printf 'chunk-%06d.csv' "$CHUNK_SEQ")"
+  mv "$CSV" "$chunk"
+  echo "$HEADER" > "$CSV"
+  t_min="$(sed -n 2p "$chunk" | cut -d, -f1)"
+  t_max="$(tail -n 1 "$chunk" | cut -d, -f1)"
+  if [[ "$COMPRESS" == "zstd" ]]; then
+    zstd -q --rm "$chunk" && chunk="$chunk.zst"
+  else
+    gzip -f "$chunk" && chunk="$chunk.gz"
+  fi
+  printf '{"file": "%s", "t_min": "%s", "t_max": "%s", "lines": %d}\n' \
+    "$(basename "$chunk")" "$t_min" "$t_max" "$CSV_LINES" >> "$CHUNK_DIR/index.jsonl"
+  CSV_LINES=0
+}
+
+if (( ROTATE_LINES > 0 )) && [[ -s "$CSV" ]]; then
+  # active.csv de um monitor anterior (interrompido): fecha-o antes de continuar
+  CSV_LINES=$(( $(wc -l < "$CSV") - 1 ))
+  rotate_csv
+else
+  echo "$HEADER" > "$CSV"
+fi
+echo "$STABLE_N" > "$OUT_DIR/stable_n.txt"
+echo "[$(date -Is)] monitor started base_url=$BASE_URL interval=${INTERVAL_SEC}s adaptive=$ADAPTIVE burst_interval=${BURST_INTERVAL_SEC}s" | tee -a "$EVENTS"
 
 # Estado para MTTD/MTTR (simples e eficaz)
 INCIDENT_ACTIVE=0
 T_FIRST_FAIL=""
 T_RECOVER=""
 
+# Estado do probing adaptativo
+CUR_INTERVAL="$INTERVAL_SEC"
+OK_STREAK=0
+
 measure() {
   local endpoint="$1"
+  local interval="$2"
   local url="${BASE_URL}${endpoint}"
 
   # curl format: http_code + total_time
@@ -56,27 +122,50 @@ measure() {
   if [[ "$code" =~ ^2[0-9][0-9]$ ]]; then ok=1; fi
 
   local ts
-  ts="$(date -Is)"
-  echo "$ts,$endpoint,$code,$lat_ms,$ok" >> "$CSV"
+  ts="$(now_iso)"
+  echo "$ts,$endpoint,$code,$lat_ms,$ok,$interval" >> "$CSV"
 
   # lógica de incidente: consideramos falha se /ping falhar OU /secure-data falhar
   # (vai chamar measure para os dois)
   echo "$ok"
 }
 
+# há algum INCIDENT_START sem INCIDENT_END nos events.log do run (raiz + subpastas)?
+incident_marker_active() {
+  local starts ends
+  starts="$(cat "$OUT_DIR"/*/events.log 2>/dev/null | grep -c "INCIDENT_START" || true)"
+  ends="$(cat "$OUT_DIR"/*/events.log 2>/dev/null | grep -c "INCIDENT_END" || true)"
+  (( ${starts:-0} > ${ends:-0} ))
+}
+
+set_interval() {
+  local new="$1" reason="$2"
+  if [[ "$new" != "$CUR_INTERVAL" ]]; then
+    CUR_INTERVAL="$new"
+    echo "[$(date -Is)] PROBE_RATE interval=${new}s reason=$reason" | tee -a "$EVENTS"
+  fi
+}
+
 while true; do
   # mede endpoints chave
-  ok_ping="$(measure /ping)"
-  ok_secure="$(measure /secure-data)"
+  ok_ping="$(measure /ping "$CUR_INTERVAL")"
+  ok_secure="$(measure /secure-data "$CUR_INTERVAL")"
+
+  if (( ROTATE_LINES > 0 )); then
+    CSV_LINES=$((CSV_LINES+2))
+    (( CSV_LINES >= ROTATE_LINES )) && rotate_csv
+  fi
 
   # incidente se algum falhar
   if [[ "$ok_ping" == "0" || "$ok_secure" == "0" ]]; then
+    OK_STREAK=0
     if [[ "$INCIDENT_ACTIVE" == "0" ]]; then
       INCIDENT_ACTIVE=1
       T_FIRST_FAIL="$(date -Is)"
       echo "[$T_FIRST_FAIL] FIRST_FAILURE ping_ok=$ok_ping secure_ok=$ok_secure" | tee -a "$EVENTS"
     fi
   else
+    OK_STREAK=$((OK_STREAK+1))
     if [[ "$INCIDENT_ACTIVE" == "1" ]]; then
       INCIDENT_ACTIVE=0
       T_RECOVER="$(date -Is)"
@@ -84,5 +173,15 @@ while true; do
     fi
   fi
 
-  sleep "$INTERVAL_SEC"
+  if [[ "$ADAPTIVE" == "1" ]]; then
+    if [[ "$OK_STREAK" == "0" ]]; then
+      set_interval "$BURST_INTERVAL_SEC" failure
+    elif incident_marker_active; then
+      set_interval "$BURST_INTERVAL_SEC" incident_start
+    elif (( OK_STREAK >= STABLE_N )); then
+      set_interval "$INTERVAL_SEC" stable
+    fi
+  fi
+
+  sleep "$CUR_INTERVAL"
 done
@@ -0,0 +1,10 @@
+"""
+Análise de runs de resiliência (MTTD / MTTR / RTO).
+
+Cada artefacto de um run (http_metrics.csv, events.log, k6_summary.json)
+é lido uma única vez para um `Run` em memória; os writers (metrics.json,
+metrics.md, report.html) trabalham todos sobre esse modelo.
+"""
+from .model import Event, Incident, Point, Run, load_run, parse_ts
+
+__all__ = ["Event", "Incident", "Point", "Run", "load_run", "parse_ts"]
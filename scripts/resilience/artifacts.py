@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import shutil
+import subprocess
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Sequence, Tuple
+
+# Artefactos de texto (http_metrics.csv, *_logs.txt) em três formas, lidas de forma
+# transparente por open_lines():
+#
+#   <nome>                 texto simples (formato original)
+#   <nome>.gz / .zst       um único ficheiro comprimido
+#   <nome>.d/              em chunks rodados (runs longos / soak):
+#       index.jsonl          uma linha por chunk fechado:
+#                            {"file", "t_min", "t_max", "lines"}
+#       chunk-000001.csv.gz  chunks fechados e comprimidos (cada um com cabeçalho)
+#       active.csv           chunk aberto, em texto (append direto do monitor)
+#
+# Com o índice, quem só precisa de uma janela temporal descomprime apenas os
+# chunks cujo [t_min, t_max] a interseta.
+
+CODECS = {"gzip": ".gz", "zstd": ".zst"}
+INDEX_NAME = "index.jsonl"
+ACTIVE_PREFIX = "active"
+
+Window = Tuple[datetime, datetime]
+
+
+def _open_zstd(path: Path) -> IO[bytes]:
+    # zstandard é opcional: sem o módulo usa o binário zstd, se existir
+    try:
+        import zstandard
+    except ImportError:
+        zstd = shutil.which("zstd")
+        if zstd is None:
+            raise RuntimeError(f"{path}: precisa do módulo zstandard ou do binário zstd")
+        out = subprocess.run([zstd, "-dc", str(path)], check=True, capture_output=True).stdout
+        return io.BytesIO(out)
+    return zstandard.ZstdDecompressor().stream_reader(path.open("rb"))
+
+
+def open_text(path: Path) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace", newline="")
+    if path.suffix == ".zst":
+        return io.TextIOWrapper(_open_zstd(path), encoding="utf-8", errors="replace", newline="")
+    return path.open("r", encoding="utf-8", errors="replace", newline="")
+
+
+def compress_file(path: Path, codec: str) -> Path:
+    """Comprime `path` para <path>.gz/.zst e remove o original."""
+    out = path.with_name(path.name + CODECS[codec])
+    if codec == "gzip":
+        with path.open("rb") as src, gzip.open(out, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst)
+    else:
+        try:
+            import zstandard
+        except ImportError:
+            zstd = shutil.which("zstd")
+            if zstd is None:
+                raise RuntimeError("codec zstd: precisa do módulo zstandard ou do binário zstd")
+            subprocess.run([zstd, "-q", "-f", "-o", str(out), str(path)], check=True)
+        else:
+            with path.open("rb") as src, out.open("wb") as dst:
+                zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+    path.unlink()
+    return out
+
+
+@dataclass
+class Chunk:
+    path: Path
+    t_min: Optional[datetime]
+    t_max: Optional[datetime]
+    lines: int = 0
+
+    def overlaps(self, windows: Sequence[Window]) -> bool:
+        if self.t_min is None or self.t_max is None:
+            return True  # sem intervalo conhecido: não dá para excluir
+        return any(self.t_min <= b and a <= self.t_max for a, b in windows)
+
+
+def chunk_dir(path: Path) -> Path:
+    return path.with_name(path.name + ".d")
+
+
+def _index_ts(e: dict, key: str, where: str) -> Optional[datetime]:
+    from .model import parse_ts  # import local: model.py usa este módulo para ler o CSV
+
+    if not e.get(key):
+        return None
+    try:
+        return parse_ts(e[key])
+    except (ValueError, TypeError):
+        # o chunk continua a ser lido (sem intervalo, nunca é excluído por janela)
+        print(f"[WARN] {where}: {key}={e[key]!r} inválido", file=sys.stderr)
+        return None
+
+
+def read_index(d: Path) -> List[Chunk]:
+    chunks: List[Chunk] = []
+    idx = d / INDEX_NAME
+    if not idx.is_file():
+        return chunks
+    for n, ln in enumerate(idx.read_text(encoding="utf-8").splitlines(), 1):
+        if not ln.strip():
+            continue
+        where = f"{idx}:{n}"
+        try:
+            e = json.loads(ln)
+            path = d / e["file"]
+            lines = int(e.get("lines", 0))
+        except (ValueError, KeyError, TypeError) as err:
+            # linha truncada (escrita interrompida): avisa em vez de perder o chunk em silêncio
+            print(f"[WARN] {where}: entrada ignorada ({err})", file=sys.stderr)
+            continue
+        chunks.append(Chunk(
+            path=path,
+            t_min=_index_ts(e, "t_min", where),
+            t_max=_index_ts(e, "t_max", where),
+            lines=lines,
+        ))
+    return chunks
+
+
+def active_chunk(d: Path) -> Optional[Path]:
+    return next(iter(sorted(d.glob(ACTIVE_PREFIX + ".*"))), None)
+
+
+def resolve(path: Path) -> Optional[Path]:
+    """Forma em disco do artefacto `path` (texto, comprimido ou diretoria de chunks)."""
+    for cand in (path, *(path.with_name(path.name + ext) for ext in CODECS.values()), chunk_dir(path)):
+        if cand.exists():
+            return cand
+    return None
+
+
+def exists(path: Path) -> bool:
+    return resolve(path) is not None
+
+
+def select_chunks(path: Path, windows: Optional[Sequence[Window]] = None) -> List[Path]:
+    """Ficheiros a ler (por ordem) para cobrir `windows` (None = tudo)."""
+    found = resolve(path)
+    if found is None:
+        return []
+    if not found.is_dir():
+        return [found]
+    files = [c.path for c in read_index(found) if windows is None or c.overlaps(windows)]
+    active = active_chunk(found)
+    if active is not None:
+        files.append(active)
+    return [f for f in files if f.is_file()]
+
+
+def open_lines(path: Path, windows: Optional[Sequence[Window]] = None) -> Iterator[str]:
+    """Linhas do artefacto, descomprimindo só os chunks necessários para `windows`."""
+    for f in select_chunks(path, windows):
+        with open_text(f) as fh:
+            yield from fh
+
+
+class ChunkWriter:
+    """
+    Escrita append-only em chunks rodados: linhas vão para active.<ext> e, a cada
+    chunk_lines, o chunk é comprimido e registado no índice. `ts_of(line)` extrai
+    o timestamp (ISO) de uma linha para o intervalo do chunk (None = sem timestamp).
+    """
+
+    def __init__(self, path: Path, codec: str = "gzip", chunk_lines: int = 50000,
+                 header: Optional[str] = None, ts_of=None) -> None:
+        self.dir = chunk_dir(path)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.ext = path.suffix or ".txt"
+        self.codec = codec
+        self.chunk_lines = chunk_lines
+        self.header = header
+        self.ts_of = ts_of
+        self.seq = len(read_index(self.dir))
+        self._recover_active()
+        self._open_active()
+
+    def _header_line(self) -> Optional[str]:
+        return self.header.rstrip("\r\n") if self.header else None
+
+    def _recover_active(self) -> None:
+        # active.* deixado por um writer morto (p.ex. soak_sample.py reiniciado no
+        # mesmo run): as linhas não estão no índice, por isso são recontadas e o
+        # ficheiro é rodado para um chunk antes de começar um active novo
+        active = self.dir / f"{ACTIVE_PREFIX}{self.ext}"
+        if not active.exists() or active.stat().st_size == 0:
+            return
+        header = self._header_line()
+        lines = 0
+        t_min: Optional[str] = None
+        t_max: Optional[str] = None
+        with active.open(encoding="utf-8", errors="replace", newline="") as fh:
+            for i, ln in enumerate(fh):
+                ln = ln.rstrip("\r\n")
+                if not ln or (i == 0 and ln == header):
+                    continue
+                lines += 1
+                ts = self.ts_of(ln) if self.ts_of is not None else None
+                if ts:
+                    t_min = t_min or ts
+                    t_max = ts
+        if lines == 0:
+            return  # só o cabeçalho: _open_active continua o mesmo ficheiro
+        self.active = active
+        self.fh = active.open("a", encoding="utf-8", newline="")
+        if not active.read_bytes().endswith(b"\n"):
+            self.fh.write("\n")  # última linha cortada a meio
+        self.lines, self.t_min, self.t_max = lines, t_min, t_max
+        self.rotate(reopen=False)
+
+    def _open_active(self) -> None:
+        self.active = self.dir / f"{ACTIVE_PREFIX}{self.ext}"
+        fresh = not self.active.exists() or self.active.stat().st_size == 0
+        self.fh = self.active.open("a", encoding="utf-8", newline="")
+        self.lines = 0
+        self.t_min: Optional[str] = None
+        self.t_max: Optional[str] = None
+        if fresh and self.header:
+            self.fh.write(self.header.rstrip("\n") + "\n")
+
+    def write(self, line: str) -> None:
+        self.fh.write(line.rstrip("\n") + "\n")
+        self.lines += 1
+        if self.ts_of is not None:
+            ts = self.ts_of(line)
+            if ts:
+                self.t_min = self.t_min or ts
+                self.t_max = ts
+        if self.lines >= self.chunk_lines:
+            self.rotate()
+
+    def flush(self) -> None:
+        # torna as linhas do chunk ativo visíveis para quem lê o run em curso
+        self.fh.flush()
+
+    def rotate(self, reopen: bool = True) -> None:
+        self.fh.close()
+        if self.lines == 0:
+            if reopen:
+                self._open_active()
+            return
+        self.seq += 1
+        closed = self.active.rename(self.dir / f"chunk-{self.seq:06d}{self.ext}")
+        packed = compress_file(closed, self.codec)
+        entry = {
+            "file": packed.name, "t_min": self.t_min, "t_max": self.t_max,
+            "lines": self.lines,
+        }
+        with (self.dir / INDEX_NAME).open("a", encoding="utf-8") as idx:
+            idx.write(json.dumps(entry) + "\n")
+        if reopen:
+            self._open_active()
+
+    def close(self) -> None:
+        # fecha o chunk aberto (run terminado: tudo comprimido e indexado); o
+        # active.* que sobra só com o cabeçalho deixa de fazer falta (com linhas, nunca)
+        self.rotate(reopen=False)
+        header = self._header_line()
+        header_size = len((header + "\n").encode("utf-8")) if header else 0
+        if self.lines == 0 and self.active.exists() and self.active.stat().st_size <= header_size:
+            self.active.unlink()
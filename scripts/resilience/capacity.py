@@ -0,0 +1,519 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+import statistics
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from . import artifacts
+from .model import parse_ts
+
+# Modelo de capacidade da API e conselheiro de HPA, calculados offline a partir de
+# runs existentes (results/<run>):
+#  - evidencias/ingress_logs.txt: pedidos por pod (upstream_addr) e latência do
+#    upstream -> pedidos/s e latência por pod em blocos de `bin_s` segundos;
+#  - evidencias/api_logs.txt: compute_s dos work_done (CPU por /work) e lat_ms dos
+#    restantes endpoints -> custo de CPU por pedido, por endpoint (os de I/O, que
+#    passam o tempo à espera de outro serviço, contam MIN_CPU_S);
+#  - dos/k6_summary.json: débito e p95 do lado do cliente (perfil de carga).
+#
+# A curva p95(ρ) ajusta-se a p95 = a + b/(1-ρ) (forma M/M/1), com ρ = CPU usado /
+# CPU disponível por pod. Com ela simula-se o HPA (algoritmo e comportamento por
+# omissão do autoscaling/v2) para perfis de carga e escolhe-se target/min/max.
+
+HPA_SYNC_S = 15
+HPA_TOLERANCE = 0.1
+SCALE_DOWN_WINDOW_S = 300
+RHO_MAX = 0.95  # acima disto o modelo M/M/1 deixa de ser informativo
+MIN_CPU_S = 0.001  # custo mínimo por pedido (parse/log/resposta)
+# a latência destes é sobretudo espera (ida ao Auth em AUTH_MODE=remote), não CPU:
+# usá-la como custo inflacionava o CPU por pedido, o ρ e as réplicas recomendadas
+IO_BOUND = ("/secure-data",)
+
+# formato por omissão do ingress-nginx, com o prefixo --timestamps do kubectl
+INGRESS_RE = re.compile(
+    r'^(?P<ts>\S+) \S+ - \S+ \[[^\]]+\] "(?P<method>[A-Z]+) (?P<uri>\S+) [^"]*" (?P<status>\d{3}) \d+ '
+    r'"[^"]*" "[^"]*" \d+ (?P<rt>[\d.]+) \[(?P<upstream>[^\]]*)\] \[[^\]]*\] '
+    r'(?P<addr>\S+) \S+ (?P<urt>[\d.]+) (?P<ustatus>\d{3}) \S+$'
+)
+
+
+@dataclass
+class IngressHit:
+    ts: float
+    pod: str      # upstream_addr (IP:porta do pod)
+    path: str
+    status: int
+    upstream_s: float
+
+
+@dataclass
+class LatencyModel:
+    a: float  # segundos
+    b: float  # segundos
+    kind: str  # "fit" (regressão) ou "mm1" (p95 a carga baixa escalado por 1/(1-ρ))
+
+    def p95_s(self, rho: float) -> float:
+        if rho >= 1:
+            return math.inf
+        return self.a + self.b / (1 - min(rho, RHO_MAX))
+
+    def rho_at(self, slo_s: float) -> float:
+        # maior ρ com p95 <= SLO
+        if slo_s <= self.a + self.b:
+            return 0.0
+        return min(RHO_MAX, 1 - self.b / (slo_s - self.a))
+
+
+@dataclass
+class PodSpec:
+    request_m: float
+    limit_m: float
+
+    @property
+    def capacity_cores(self) -> float:
+        # /work é Python CPU-bound num só processo uvicorn: com o GIL, tanto no
+        # executor (threads) como no modo cooperativo não passa de ~1 core por pod
+        return min(self.limit_m, 1000.0) / 1000
+
+
+def _path(uri: str) -> str:
+    return uri.split("?", 1)[0]
+
+
+def load_ingress_hits(run_dir: Path, upstream: str = "resilience-api-80") -> List[IngressHit]:
+    out: List[IngressHit] = []
+    for ln in artifacts.open_lines(run_dir / "evidencias" / "ingress_logs.txt"):
+        m = INGRESS_RE.match(ln.rstrip("\r\n"))
+        # 429/503 do próprio Ingress não chegam a um pod (upstream_addr "-")
+        if not m or m["upstream"] != upstream or m["addr"] == "-":
+            continue
+        try:
+            ts = parse_ts(m["ts"]).timestamp()
+        except ValueError:
+            continue
+        out.append(IngressHit(ts, m["addr"], _path(m["uri"]), int(m["ustatus"]), float(m["urt"])))
+    out.sort(key=lambda h: h.ts)
+    return out
+
+
+def load_api_costs(run_dir: Path) -> Dict[str, List[float]]:
+    """Amostras de custo (s) por endpoint: compute_s do /work, lat_ms dos outros."""
+    out: Dict[str, List[float]] = {}
+    for ln in artifacts.open_lines(run_dir / "evidencias" / "api_logs.txt"):
+        i = ln.find("{")
+        if i < 0:
+            continue
+        try:
+            ev = json.loads(ln[i:])
+        except ValueError:
+            continue
+        if ev.get("event") == "work_done" and isinstance(ev.get("compute_s"), (int, float)):
+            out.setdefault("/work", []).append(float(ev["compute_s"]))
+        elif ev.get("event") == "http" and ev.get("path") != "/work" and isinstance(ev.get("lat_ms"), (int, float)):
+            out.setdefault(ev.get("path", ""), []).append(ev["lat_ms"] / 1000)
+    return out
+
+
+def load_k6_rate(run_dir: Path) -> Optional[Tuple[float, float]]:
+    """(pedidos/s, duração em s) do k6_summary.json, se existir."""
+    path = run_dir / "dos" / "k6_summary.json"
+    try:
+        m = json.loads(path.read_text(encoding="utf-8")).get("metrics", {})
+    except (OSError, ValueError):
+        return None
+    reqs = m.get("http_reqs") or {}
+    reqs = reqs.get("values", reqs)
+    count, rate = reqs.get("count"), reqs.get("rate")
+    if not isinstance(count, (int, float)) or not isinstance(rate, (int, float)) or rate <= 0:
+        return None
+    return float(rate), float(count) / float(rate)
+
+
+def cpu_costs(samples: Dict[str, List[float]], hits: Sequence[IngressHit]) -> Dict[str, float]:
+    """
+    CPU (s) por pedido de cada endpoint: mediana das amostras da API (MIN_CPU_S nos
+    IO_BOUND); sem amostras de /work usa a mediana do upstream_response_time do
+    Ingress (majorante).
+    """
+    costs = {p: MIN_CPU_S if p in IO_BOUND else max(MIN_CPU_S, statistics.median(v))
+             for p, v in samples.items() if v}
+    if "/work" not in costs:
+        work = [h.upstream_s for h in hits if h.path == "/work" and h.status == 200]
+        if work:
+            costs["/work"] = max(MIN_CPU_S, statistics.median(work))
+    return costs
+
+
+def _cost(costs: Dict[str, float], path: str) -> float:
+    return costs.get(path, MIN_CPU_S)
+
+
+def pod_bins(hits: Sequence[IngressHit], costs: Dict[str, float], bin_s: float) -> List[Dict[str, object]]:
+    """Uma linha por (pod, bloco): pedidos/s, CPU estimado (m) e latências do upstream."""
+    bins: Dict[Tuple[str, int], List[IngressHit]] = {}
+    for h in hits:
+        bins.setdefault((h.pod, int(h.ts // bin_s)), []).append(h)
+    out = []
+    for (pod, _), hs in sorted(bins.items()):
+        lat = [h.upstream_s for h in hs if h.status < 500]
+        if not lat:
+            continue
+        out.append({
+            "pod": pod,
+            "rps": len(hs) / bin_s,
+            "cpu_m": sum(_cost(costs, h.path) for h in hs) / bin_s * 1000,
+            "lat": lat,
+        })
+    return out
+
+
+def _p(values: List[float], q: float) -> float:
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+
+def capacity_curve(bins: List[Dict[str, object]], pod: PodSpec, width: float = 0.05,
+                   min_bins: int = 3) -> List[Dict[str, float]]:
+    """Agrupa os blocos por faixas de ρ (largura `width`): pedidos/s × CPU × latência por pod."""
+    groups: Dict[int, List[Dict[str, object]]] = {}
+    for b in bins:
+        rho = b["cpu_m"] / 1000 / pod.capacity_cores
+        groups.setdefault(min(int(rho / width), int(1 / width)), []).append(b)
+    rows = []
+    for _, grp in sorted(groups.items()):
+        if len(grp) < min_bins:
+            continue
+        lat = [x for b in grp for x in b["lat"]]
+        cpu_m = statistics.fmean(b["cpu_m"] for b in grp)
+        rows.append({
+            "bins": len(grp),
+            "rps": round(statistics.fmean(b["rps"] for b in grp), 2),
+            "cpu_m": round(cpu_m, 1),
+            "rho": round(min(cpu_m / 1000 / pod.capacity_cores, 1.0), 3),
+            "p50_ms": round(_p(lat, 0.50) * 1000, 1),
+            "p95_ms": round(_p(lat, 0.95) * 1000, 1),
+        })
+    return rows
+
+
+def linear_fit(xs: Sequence[float], ys: Sequence[float]) -> Optional[Tuple[float, float]]:
+    """(intercept, slope) por mínimos quadrados."""
+    n = len(xs)
+    if n < 3:
+        return None
+    mx, my = sum(xs) / n, sum(ys) / n
+    sxx = sum((x - mx) ** 2 for x in xs)
+    if sxx == 0:
+        return None
+    slope = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx
+    return my - slope * mx, slope
+
+
+def fit_latency(curve: List[Dict[str, float]]) -> Optional[LatencyModel]:
+    if not curve:
+        return None
+    xs = [1 / (1 - min(r["rho"], RHO_MAX)) for r in curve]
+    ys = [r["p95_ms"] / 1000 for r in curve]
+    fit = linear_fit(xs, ys)
+    # a < 0 é aceitável desde que p95(0) = a + b seja positivo: a curva real (event
+    # loop + throttling do CFS) sobe mais depressa do que o M/M/1 puro
+    if fit is not None and fit[1] > 0 and fit[0] + fit[1] > 0:
+        return LatencyModel(a=fit[0], b=fit[1], kind="fit")
+    # latência não cresce com a carga observada (pods folgados): sem dados perto da
+    # saturação, assume-se M/M/1 a partir do p95 com menos carga
+    return LatencyModel(a=0.0, b=ys[0] * (1 - min(curve[0]["rho"], RHO_MAX)), kind="mm1")
+
+
+# -----------------------------------------------------------------------------
+# Perfis de carga
+# -----------------------------------------------------------------------------
+def observed_profile(hits: Sequence[IngressHit], base: float) -> List[float]:
+    """
+    Pedidos/s totais na API, segundo a segundo, tal como o Ingress os viu. Os logs
+    são só a cauda (--tail), por isso o perfil começa e acaba na carga base.
+    """
+    if not hits:
+        return []
+    t0 = int(hits[0].ts)
+    prof = [0.0] * (int(hits[-1].ts) - t0 + 1)
+    for h in hits:
+        prof[int(h.ts) - t0] += 1
+    return [base] * 120 + prof + [base] * SCALE_DOWN_WINDOW_S
+
+
+def shaped_profile(spec: str) -> Tuple[str, List[float]]:
+    """step:BASE:PEAK:SEGUNDOS, ramp:BASE:PEAK:SEGUNDOS ou spike:BASE:PEAK:SEGUNDOS."""
+    kind, base, peak, dur = spec.split(":")
+    base_f, peak_f, n = float(base), float(peak), int(dur)
+    lead = [base_f] * 120
+    tail = [base_f] * SCALE_DOWN_WINDOW_S
+    if kind == "step":
+        body = [peak_f] * n
+    elif kind == "ramp":
+        body = [base_f + (peak_f - base_f) * i / max(1, n - 1) for i in range(n)]
+    elif kind == "spike":
+        body = [peak_f] * min(n, 30) + [base_f] * max(0, n - 30)
+    else:
+        raise ValueError(f"perfil desconhecido: {spec}")
+    return spec, lead + body + tail
+
+
+def k6_profile(rate: float, duration_s: float, base: float) -> List[float]:
+    # o DoS do demo: base, k6 durante `duration_s` e de volta à base
+    return [base] * 120 + [rate] * int(duration_s) + [base] * SCALE_DOWN_WINDOW_S
+
+
+# -----------------------------------------------------------------------------
+# Simulação do HPA
+# -----------------------------------------------------------------------------
+def simulate_hpa(
+    load: Sequence[float],
+    cpu_per_req: float,
+    pod: PodSpec,
+    model: LatencyModel,
+    slo_s: float,
+    target_pct: float,
+    min_r: int,
+    max_r: int,
+    startup_s: int,
+) -> Dict[str, float]:
+    """
+    Simulação a 1 s do HPA autoscaling/v2 com o comportamento por omissão:
+    sync a cada 15 s, tolerância de 10%, scale-up até max(+100%, +4 pods) por sync,
+    scale-down pelo máximo das recomendações dos últimos 300 s. Pods novos só
+    recebem tráfego `startup_s` depois de criados.
+    """
+    ready_at: List[int] = [0] * min_r
+    recs: List[Tuple[int, int]] = []
+    usage_acc, usage_n = 0.0, 0
+    violated = 0
+    pod_seconds = 0
+    peak_r = min_r
+    capped = 0  # syncs em que o HPA queria mais do que max_r
+
+    for t, rps in enumerate(load):
+        ready = sum(1 for r in ready_at if r <= t)
+        demand = rps * cpu_per_req
+        avail = ready * pod.capacity_cores
+        rho = demand / avail if avail else math.inf
+        if model.p95_s(rho) > slo_s:
+            violated += 1
+        if ready:
+            usage_acc += min(demand, avail) / ready
+            usage_n += 1
+        pod_seconds += len(ready_at)
+
+        if t and t % HPA_SYNC_S == 0 and usage_n:
+            util = usage_acc / usage_n / (pod.request_m / 1000) * 100
+            usage_acc, usage_n = 0.0, 0
+            ratio = util / target_pct
+            spec = len(ready_at)
+            want = spec if abs(ratio - 1) <= HPA_TOLERANCE else math.ceil(ready * ratio)
+            if want > max_r:
+                capped += 1
+            want = max(min_r, min(max_r, want))
+            recs.append((t, want))
+            recs = [(rt, r) for rt, r in recs if rt > t - SCALE_DOWN_WINDOW_S]
+            if want > spec:
+                desired = min(want, max(spec * 2, spec + 4))
+            else:
+                # estabilização: só desce até à maior recomendação da janela
+                desired = min(spec, max(r for _, r in recs))
+            if desired > spec:
+                ready_at += [t + startup_s] * (desired - spec)
+            elif desired < spec:
+                # remove primeiro os que ainda não estão prontos
+                ready_at = sorted(ready_at)[:desired]
+            peak_r = max(peak_r, len(ready_at))
+
+    n = max(1, len(load))
+    return {
+        "violation_frac": round(violated / n, 4),
+        "avg_replicas": round(pod_seconds / n, 2),
+        "peak_replicas": peak_r,
+        "capped_syncs": capped,
+    }
+
+
+def recommend(
+    profiles: Dict[str, List[float]],
+    cpu_per_req: float,
+    pod: PodSpec,
+    model: LatencyModel,
+    slo_s: float,
+    targets: Sequence[int],
+    min_floor: int,
+    startup_s: int,
+    max_violation: float,
+) -> Dict[str, object]:
+    rho_slo = model.rho_at(slo_s)
+    rps_pod_slo = rho_slo * pod.capacity_cores / cpu_per_req if cpu_per_req else math.inf
+    start = max(p[0] for p in profiles.values())
+    peak = max(max(p) for p in profiles.values())
+    # minReplicas de partida: aguentar o início de qualquer perfil sem escalar (e o PDB)
+    base_min = max(min_floor, math.ceil(start / rps_pod_slo) if rps_pod_slo else min_floor)
+
+    rows = []
+    for target in targets:
+        rho_target = target / 100 * pod.request_m / 1000 / pod.capacity_cores
+        # maxReplicas: pico no equilíbrio do target e dentro do SLO, +1 de folga
+        steady = math.ceil(peak * cpu_per_req / (target / 100 * pod.request_m / 1000))
+        max_r = max(base_min, steady, math.ceil(peak / rps_pod_slo) if rps_pod_slo else 0) + 1
+        # picos mais rápidos do que o HPA (sync + arranque dos pods) só se absorvem
+        # com mais réplicas mínimas: sobe min até cumprir o SLO em todos os perfis
+        for min_r in range(base_min, max_r + 1):
+            sims = {name: simulate_hpa(load, cpu_per_req, pod, model, slo_s, target, min_r, max_r, startup_s)
+                    for name, load in profiles.items()}
+            worst = max(s["violation_frac"] for s in sims.values())
+            if worst <= max_violation:
+                break
+        rows.append({
+            "target_pct": target,
+            "rho_at_target": round(rho_target, 3),
+            "min_replicas": min_r,
+            "max_replicas": max_r,
+            "worst_violation_frac": worst,
+            "avg_replicas": round(statistics.fmean(s["avg_replicas"] for s in sims.values()), 2),
+            "feasible": rho_target <= rho_slo,
+            "profiles": sims,
+        })
+
+    ok = [r for r in rows if r["feasible"] and r["worst_violation_frac"] <= max_violation]
+    if ok:
+        best = min(ok, key=lambda r: (r["avg_replicas"], r["target_pct"]))
+    else:
+        best = min(rows, key=lambda r: (r["worst_violation_frac"], r["avg_replicas"]))
+    return {
+        "rho_slo": round(rho_slo, 3),
+        "rps_per_pod_at_slo": round(rps_pod_slo, 2),
+        "peak_rps": round(peak, 2),
+        "grid": rows,
+        "recommended": {k: best[k] for k in ("target_pct", "min_replicas", "max_replicas",
+                                              "worst_violation_frac", "avg_replicas")},
+        "meets_slo": best in ok,
+    }
+
+
+def analyze_capacity(
+    run_dirs: Sequence[Path],
+    pod: PodSpec,
+    slo_ms: float,
+    targets: Sequence[int],
+    shapes: Sequence[str] = (),
+    bin_s: float = 5.0,
+    min_floor: int = 3,
+    startup_s: int = 30,
+    max_violation: float = 0.01,
+    base_rps: float = 3.0,
+    load_scale: float = 1.0,
+) -> Dict[str, object]:
+    hits: List[IngressHit] = []
+    samples: Dict[str, List[float]] = {}
+    profiles: Dict[str, List[float]] = {}
+    k6 = {}
+    for run_dir in run_dirs:
+        run_hits = load_ingress_hits(run_dir)
+        hits += run_hits
+        for p, v in load_api_costs(run_dir).items():
+            samples.setdefault(p, []).extend(v)
+        if run_hits:
+            profiles[f"observed:{run_dir.name}"] = observed_profile(run_hits, base_rps)
+        rate = load_k6_rate(run_dir)
+        if rate:
+            k6[run_dir.name] = {"rps": round(rate[0], 2), "duration_s": round(rate[1], 1)}
+            profiles[f"k6:{run_dir.name}"] = k6_profile(rate[0], rate[1], base_rps)
+    for spec in shapes:
+        name, load = shaped_profile(spec)
+        profiles[name] = load
+    if not targets or min(targets) <= 0:
+        raise ValueError(f"targets de CPU têm de ser > 0 (recebido: {list(targets)})")
+    if not hits:
+        raise ValueError("nenhum pedido da API nos ingress_logs.txt dos runs indicados")
+    if load_scale != 1.0:
+        profiles = {k: [x * load_scale for x in v] for k, v in profiles.items()}
+
+    costs = cpu_costs(samples, hits)
+    mix: Dict[str, int] = {}
+    for h in hits:
+        mix[h.path] = mix.get(h.path, 0) + 1
+    cpu_per_req = sum(n * _cost(costs, p) for p, n in mix.items()) / len(hits)
+
+    curve = capacity_curve(pod_bins(hits, costs, bin_s), pod)
+    model = fit_latency(curve)
+    rec = recommend(profiles, cpu_per_req, pod, model, slo_ms / 1000, targets,
+                    min_floor, startup_s, max_violation)
+    return {
+        "runs": [str(d) for d in run_dirs],
+        "slo_p95_ms": slo_ms,
+        "pod": {"cpu_request_m": pod.request_m, "cpu_limit_m": pod.limit_m,
+                "capacity_cores": pod.capacity_cores},
+        "requests": len(hits),
+        "pods_seen": len({h.pod for h in hits}),
+        "mix": {p: round(n / len(hits), 3) for p, n in sorted(mix.items())},
+        "cpu_s_per_request": {p: round(c, 4) for p, c in sorted(costs.items())},
+        "cpu_s_per_request_mix": round(cpu_per_req, 5),
+        "k6": k6,
+        "curve": curve,
+        "latency_model": {"a_ms": round(model.a * 1000, 2), "b_ms": round(model.b * 1000, 2), "kind": model.kind},
+        "load_scale": load_scale,
+        "profiles": {k: {"seconds": len(v), "peak_rps": round(max(v), 2)} for k, v in profiles.items()},
+        **rec,
+    }
+
+
+def render_capacity_md(data: Dict[str, object]) -> str:
+    pod = data["pod"]
+    lm = data["latency_model"]
+    rec = data["recommended"]
+    lines = ["# Capacidade da API e HPA", ""]
+    lines.append(f"- Runs: {len(data['runs'])} ({data['requests']} pedidos em {data['pods_seen']} pods)")
+    lines.append(f"- SLO: p95 <= **{data['slo_p95_ms']} ms**; pod: request {pod['cpu_request_m']}m / "
+                 f"limit {pod['cpu_limit_m']}m")
+    lines.append(f"- CPU por pedido (mix observado): {data['cpu_s_per_request_mix'] * 1000:.2f} ms "
+                 f"({', '.join(f'{p} {c * 1000:.1f} ms' for p, c in data['cpu_s_per_request'].items())})")
+    lines.append(f"- Latência: p95 = {lm['a_ms']} ms + {lm['b_ms']} ms / (1 - ρ) ({lm['kind']})")
+    lines.append(f"- Por pod dentro do SLO: ρ <= {data['rho_slo']} ≈ **{data['rps_per_pod_at_slo']} pedidos/s**")
+    lines.append("")
+    lines.append("## Curva por pod")
+    lines.append("")
+    lines.append("| Blocos | Pedidos/s | CPU (m) | ρ | p50 (ms) | p95 (ms) |")
+    lines.append("|---:|---:|---:|---:|---:|---:|")
+    for r in data["curve"]:
+        lines.append(f"| {r['bins']} | {r['rps']} | {r['cpu_m']} | {r['rho']} | {r['p50_ms']} | {r['p95_ms']} |")
+    lines.append("")
+    lines.append("## Simulação do HPA")
+    lines.append("")
+    lines.append("Perfis: " + ", ".join(f"`{k}` ({v['seconds']} s, pico {v['peak_rps']}/s)"
+                                       for k, v in data["profiles"].items()))
+    lines.append("")
+    lines.append("| Target CPU | ρ no target | min | max | Violação SLO (pior) | Réplicas médias |")
+    lines.append("|---:|---:|---:|---:|---:|---:|")
+    for r in data["grid"]:
+        flag = "" if r["feasible"] else " (ρ > SLO)"
+        lines.append(f"| {r['target_pct']}%{flag} | {r['rho_at_target']} | {r['min_replicas']} | "
+                     f"{r['max_replicas']} | {r['worst_violation_frac'] * 100:.2f}% | {r['avg_replicas']} |")
+    lines.append("")
+    verdict = "cumpre o SLO" if data["meets_slo"] else "NÃO cumpre o SLO em todos os perfis (menor violação)"
+    lines.append(f"## Recomendação ({verdict})")
+    lines.append("")
+    lines.append("```yaml")
+    lines.append(f"  minReplicas: {rec['min_replicas']}")
+    lines.append(f"  maxReplicas: {rec['max_replicas']}")
+    lines.append("  metrics:")
+    lines.append("    - type: Resource")
+    lines.append("      resource:")
+    lines.append("        name: cpu")
+    lines.append("        target:")
+    lines.append("          type: Utilization")
+    lines.append(f"          averageUtilization: {rec['target_pct']}")
+    lines.append("```")
+    lines.append("")
+    lines.append("_Utilização do HPA é relativa ao request de CPU; o custo por pedido vem dos logs "
+                 f"(compute_s do /work; {', '.join(IO_BOUND)} à espera do Auth conta {MIN_CPU_S * 1000:g} ms) "
+                 "e a latência do upstream no Ingress._")
+    lines.append("")
+    return "\n".join(lines)
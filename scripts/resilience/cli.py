@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from . import artifacts
+from .artifacts import CODECS, ChunkWriter, compress_file
+from .capacity import PodSpec, analyze_capacity, render_capacity_md
+from .markdown import render_markdown
+from .metrics import compute_metrics
+from .model import Run, _detect_delimiter, load_run, parse_ts
+from .replay import parse_grid, parse_window_grid, render_summary, replay_run, summarize, write_sensitivity_csv
+from .report import write_report
+from .soak import DEFAULT_LIMITS, analyze_soak, render_soak_md
+from .store import DEFAULT_DB, compare, connect, ingest_run, render_compare, select_runs, stored_params
+
+
+def write_metrics_json(run: Run, metrics: Dict[str, object]) -> Path:
+    path = run.run_dir / "metrics.json"
+    path.write_text(json.dumps(metrics, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"[OK] metrics.json criado: {path}")
+    return path
+
+
+def write_metrics_md(run: Run, metrics: Dict[str, object]) -> Path:
+    path = run.run_dir / "metrics.md"
+    path.write_text(render_markdown(metrics, run.run_dir.name), encoding="utf-8")
+    print(f"[OK] metrics.md criado: {path}")
+    return path
+
+
+def cmd_metrics(run: Run, args: argparse.Namespace) -> int:
+    write_metrics_json(run, compute_metrics(run))
+    return 0
+
+
+def cmd_md(run: Run, args: argparse.Namespace) -> int:
+    write_metrics_md(run, compute_metrics(run))
+    return 0
+
+
+def cmd_report(run: Run, args: argparse.Namespace) -> int:
+    path = write_report(run)
+    print(f"[OK] Report criado: {path}")
+    return 0
+
+
+def cmd_all(run: Run, args: argparse.Namespace) -> int:
+    metrics = compute_metrics(run)
+    write_metrics_json(run, metrics)
+    write_metrics_md(run, metrics)
+    return cmd_report(run, args)
+
+
+def label_kv(s: str) -> tuple:
+    k, sep, v = s.partition("=")
+    if not sep or not k.strip():
+        raise argparse.ArgumentTypeError(f"label inválida {s!r} (esperado K=V)")
+    return k.strip(), v.strip()
+
+
+def cmd_ingest(args: argparse.Namespace) -> int:
+    labels = dict(args.label)
+    conn = connect(args.db)
+    for run_dir in args.run_dirs:
+        try:
+            run = load_run(run_dir, stable_n=args.stable_n, post_window_s=args.post_window_s)
+        except FileNotFoundError as e:
+            print(f"[WARN] {e}", file=sys.stderr)
+            continue
+        run_id = ingest_run(conn, run, compute_metrics(run), labels)
+        if run_id is None:
+            stored = stored_params(conn, run.run_dir.name)
+            if stored != (run.stable_n, run.post_window_s):
+                print(f"[SKIP] {run.run_dir.name} já existe em {args.db} com stable_n={stored[0]},"
+                      f" post_window_s={stored[1]}; NÃO reingerido com stable_n={run.stable_n},"
+                      f" post_window_s={run.post_window_s} (use outra --db)", file=sys.stderr)
+            else:
+                print(f"[SKIP] {run.run_dir.name} já existe em {args.db}")
+        else:
+            print(f"[OK] {run.run_dir.name} ingerido (run_id={run_id}, amostras={len(run.points)})")
+    conn.close()
+    return 0
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    conn = connect(args.db)
+    runs_a = select_runs(conn, args.a)
+    runs_b = select_runs(conn, args.b)
+    if not runs_a or not runs_b:
+        print(f"Erro: seleção vazia (A={len(runs_a)} runs, B={len(runs_b)} runs)", file=sys.stderr)
+        return 2
+    rows = compare(conn, runs_a, runs_b)
+    conn.close()
+    if args.json:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+    else:
+        print(f"A: {args.a} ({len(runs_a)} runs)  B: {args.b} ({len(runs_b)} runs)\n")
+        print(render_compare(rows))
+    return 0
+
+
+def cmd_replay(args: argparse.Namespace) -> int:
+    t0 = time.perf_counter()
+    rows = []
+    for run_dir in args.run_dirs:
+        try:
+            run = load_run(run_dir)
+        except FileNotFoundError as e:
+            print(f"[WARN] {e}", file=sys.stderr)
+            continue
+        rows += replay_run(run, args.stable_n, args.post_window_s, args.sample_every)
+    write_sensitivity_csv(rows, args.out)
+    summary = summarize(rows)
+    print(render_summary(summary))
+    print(f"\n[OK] {len(rows)} combinações em {time.perf_counter() - t0:.2f}s -> {args.out}")
+    return 0
+
+
+def _pack_ts(line: str, delim: Optional[str]) -> Optional[str]:
+    # 1.º campo da linha, se for um timestamp (o que o índice guarda em t_min/t_max)
+    head = line.split(delim, 1)[0] if delim else (line.split(None, 1) or [""])[0]
+    head = head.strip()
+    try:
+        parse_ts(head)
+    except ValueError:
+        return None
+    return head
+
+
+def cmd_pack(args: argparse.Namespace) -> int:
+    """
+    Converte os artefactos de texto de um run para o formato comprimido:
+    http_metrics.csv -> http_metrics.csv.d/ (chunks + índice) e *_logs.txt -> .gz/.zst.
+    """
+    run_dir = args.run_dir
+    csv_path = run_dir / "http_metrics.csv"
+    if csv_path.is_file():
+        with csv_path.open(encoding="utf-8", errors="replace") as f:
+            header = f.readline()
+            delim = _detect_delimiter(header)
+            if _pack_ts(header, delim) is not None:  # CSV antigo sem cabeçalho
+                f.seek(0)
+                header = None
+            bad: List[str] = []
+
+            def ts_of(ln: str) -> Optional[str]:
+                ts = _pack_ts(ln, delim)
+                if ts is None and ln.strip():
+                    bad.append(ln.rstrip("\r\n"))
+                return ts
+
+            w = ChunkWriter(csv_path, codec=args.codec, chunk_lines=args.chunk_lines,
+                            header=header, ts_of=ts_of)
+            n = 0
+            for ln in f:
+                w.write(ln)
+                n += 1
+            w.close()
+        # só apaga o original se o índice cobre todas as linhas com intervalos válidos:
+        # um chunk sem t_min/t_max seria lido sempre, mas a janela do baseline já não o filtra
+        chunks = artifacts.read_index(w.dir)
+        unranged = [c.path.name for c in chunks if c.t_min is None or c.t_max is None]
+        indexed = sum(c.lines for c in chunks)
+        if bad or unranged or indexed != n:
+            print(f"Erro: {csv_path.name} não removido ({indexed}/{n} linhas indexadas)", file=sys.stderr)
+            if bad:
+                print(f"  {len(bad)} linhas sem timestamp (1.ª: {bad[0]!r})", file=sys.stderr)
+            if unranged:
+                print(f"  chunks sem intervalo: {', '.join(unranged)}", file=sys.stderr)
+            print(f"  (chunks em {w.dir}; apagar antes de repetir o pack)", file=sys.stderr)
+            return 1
+        csv_path.unlink()
+        print(f"[OK] {csv_path.name} -> {w.dir.name}/ ({w.seq} chunks, {args.codec})")
+    for log in sorted(run_dir.rglob("*_logs.txt")):
+        out = compress_file(log, args.codec)
+        print(f"[OK] {log.relative_to(run_dir)} -> {out.name}")
+    return 0
+
+
+def cmd_soak(args: argparse.Namespace) -> int:
+    run_dir = args.run_dir.resolve()
+    if not artifacts.exists(run_dir / "soak.csv"):
+        print(f"Erro: falta {run_dir / 'soak.csv'} (scripts/soak_sample.py)", file=sys.stderr)
+        return 2
+    points = load_run(run_dir).points if artifacts.exists(run_dir / "http_metrics.csv") else []
+    limits = {k: getattr(args, k) for k in DEFAULT_LIMITS}
+    data = analyze_soak(run_dir, points, limits)
+    (run_dir / "soak.json").write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    md = render_soak_md(data, run_dir.name)
+    (run_dir / "soak.md").write_text(md, encoding="utf-8")
+    print(md)
+    print(f"[OK] soak.json / soak.md em {run_dir}")
+    # falha do soak = exit 1 (para usar em CI / scripts)
+    return 1 if data["verdict"] == "fail" else 0
+
+
+def cmd_capacity(args: argparse.Namespace) -> int:
+    try:
+        data = analyze_capacity(
+            args.run_dirs, PodSpec(args.cpu_request_m, args.cpu_limit_m), args.slo_p95_ms, args.targets,
+            shapes=args.profile, bin_s=args.bin_s, min_floor=args.min_floor, startup_s=args.startup_s,
+            max_violation=args.max_violation, base_rps=args.base_rps, load_scale=args.load_scale,
+        )
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    args.out.mkdir(parents=True, exist_ok=True)
+    (args.out / "capacity.json").write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    md = render_capacity_md(data)
+    (args.out / "capacity.md").write_text(md, encoding="utf-8")
+    print(md)
+    print(f"[OK] capacity.json / capacity.md em {args.out}")
+    return 0
+
+
+def _add_window_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--stable-n", type=int, default=None,
+                   help="OK consecutivos para recuperação estável (default: stable_n.txt ou 3)")
+    p.add_argument("--post-window-s", type=int, default=None,
+                   help="janela pós-incidente em segundos (default: post_window_s.txt ou 30)")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        prog="resilience-analyze",
+        description="Análise de um run (results/<run>): metrics.json, metrics.md e report.html.",
+    )
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    def add(name: str, func, help_: str) -> argparse.ArgumentParser:
+        p = sub.add_parser(name, help=help_)
+        p.add_argument("run_dir", type=Path, help="diretoria do run (ex: results/demo_...)")
+        _add_window_args(p)
+        p.add_argument("--incidents-only", action="store_true",
+                       help="com http_metrics em chunks, lê só os chunks das janelas dos incidentes")
+        p.set_defaults(run_func=func)
+        return p
+
+    add("metrics", cmd_metrics, "escreve metrics.json")
+    add("md", cmd_md, "escreve metrics.md")
+    add("report", cmd_report, "escreve report.html (+ gráficos PNG)")
+    add("all", cmd_all, "metrics.json + metrics.md + report.html (parse único)")
+
+    p = sub.add_parser("ingest", help="guarda runs na base de dados de regressão (append-only)")
+    p.add_argument("run_dirs", type=Path, nargs="+")
+    p.add_argument("--db", type=Path, default=DEFAULT_DB)
+    p.add_argument("--label", action="append", default=[], metavar="K=V", type=label_kv,
+                   help="etiqueta de configuração do run (ex: hpa=60, replicas=3)")
+    _add_window_args(p)
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("compare", help="compara MTTD/MTTR/RTO entre dois conjuntos de runs")
+    p.add_argument("--db", type=Path, default=DEFAULT_DB)
+    p.add_argument("--a", required=True, help="seletor A: glob de nome ou label K=V (vírgula = união)")
+    p.add_argument("--b", required=True, help="seletor B")
+    p.add_argument("--json", action="store_true", help="saída em JSON em vez de tabela markdown")
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser("replay", help="análise de sensibilidade offline (stable_n x janela x amostragem)")
+    p.add_argument("run_dirs", type=Path, nargs="+")
+    p.add_argument("--stable-n", type=parse_grid, default=parse_grid("1-5"), metavar="GRID",
+                   help="valores de stable_n (ex: 1,2,3 ou 1-5)")
+    p.add_argument("--post-window-s", type=parse_window_grid, default=parse_grid("10,20,30,45,60"), metavar="GRID",
+                   help="janelas pós-incidente em segundos")
+    p.add_argument("--sample-every", type=parse_grid, default=parse_grid("1,2,3,4"), metavar="GRID",
+                   help="downsampling: manter 1 em cada k amostras (simula probing mais lento)")
+    p.add_argument("--out", type=Path, default=Path("sensitivity.csv"))
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser("pack", help="comprime os artefactos de um run (chunks rodados + índice)")
+    p.add_argument("run_dir", type=Path)
+    p.add_argument("--codec", choices=sorted(CODECS), default="gzip")
+    p.add_argument("--chunk-lines", type=int, default=50000, help="linhas por chunk de http_metrics")
+    p.set_defaults(func=cmd_pack)
+
+    p = sub.add_parser("soak", help="tendências de RSS/FDs/lag/latência por hora de um run de soak")
+    p.add_argument("run_dir", type=Path)
+    for key, default in DEFAULT_LIMITS.items():
+        p.add_argument(f"--{key.replace('_', '-')}", dest=key, type=float, default=default,
+                       help=f"limite do declive (default: {default})")
+    p.set_defaults(func=cmd_soak)
+
+    p = sub.add_parser("capacity", help="curva de capacidade por pod e recomendação de HPA (offline)")
+    p.add_argument("run_dirs", type=Path, nargs="+")
+    p.add_argument("--slo-p95-ms", type=float, default=300.0, help="SLO de latência p95 no upstream")
+    # defaults = resources da API em k8s/03-services-deployments.yaml
+    p.add_argument("--cpu-request-m", type=float, default=150.0)
+    p.add_argument("--cpu-limit-m", type=float, default=600.0)
+    p.add_argument("--targets", type=parse_grid, default=parse_grid("40,50,60,70,80,100,120,150,200"),
+                   metavar="GRID", help="averageUtilization a simular (%% do request)")
+    p.add_argument("--profile", action="append", default=[], metavar="KIND:BASE:PEAK:S",
+                   help="perfil sintético extra: step|ramp|spike (ex: step:5:200:600)")
+    p.add_argument("--load-scale", type=float, default=1.0, help="multiplica todos os perfis (crescimento)")
+    p.add_argument("--base-rps", type=float, default=3.0, help="carga antes/depois do pico nos perfis observados e k6")
+    p.add_argument("--min-floor", type=int, default=3, help="mínimo de réplicas (PDB minAvailable + 1)")
+    p.add_argument("--startup-s", type=int, default=30, help="segundos até um pod novo receber tráfego")
+    p.add_argument("--max-violation", type=float, default=0.01, help="fração de tempo fora do SLO aceite")
+    p.add_argument("--bin-s", type=float, default=5.0, help="bloco (s) para pedidos/s e CPU por pod")
+    p.add_argument("--out", type=Path, default=Path("results"))
+    p.set_defaults(func=cmd_capacity)
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if not hasattr(args, "run_func"):
+        return args.func(args)
+    try:
+        run = load_run(args.run_dir, stable_n=args.stable_n, post_window_s=args.post_window_s,
+                       incidents_only=args.incidents_only)
+    except FileNotFoundError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    return args.run_func(run, args)
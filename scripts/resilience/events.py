@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Classificação das mensagens dos events.log / events.jsonl numa só passagem:
+# os marcadores de todos os tipos de evento são juntos numa regex única
+# (alternância de grupos nomeados k0, k1, ...) e o grupo que casou diz o tipo.
+# Os campos são os `chave=valor` que vêm depois do marcador.
+#
+# Se todos os marcadores começam por um literal, a regex leva à frente um
+# lookahead com esses caracteres: o search salta logo as posições que não podem
+# começar um marcador (a alternância, por si, tenta todos os ramos em cada uma).
+#
+# Tipos novos (p.ex. um incidente com marcadores próprios) entram por config,
+# sem mexer nos scripts: event_kinds.json na pasta do run e/ou o ficheiro em
+# $RESILIENCE_EVENT_KINDS, no formato
+#
+#   {"kinds": [
+#     {"name": "drain_start", "pattern": "DRAIN_BEGIN", "role": "start", "incident": "drain_node"},
+#     {"name": "drain_end", "pattern": "DRAIN_DONE", "role": "end", "incident": "drain_node"},
+#     {"name": "drain_action", "pattern": "ACTION cordon", "role": "action", "incident": "drain_node"}
+#   ]}
+#
+# (ou só a lista). Um tipo com o mesmo `name` de um default substitui-o.
+
+EVENT_KINDS_FILE = "event_kinds.json"
+EVENT_KINDS_ENV = "RESILIENCE_EVENT_KINDS"
+
+# papel do evento no modelo (extract_incidents / baseline / report.html)
+ROLES = ("start", "end", "action", "first_failure", "first_success", "recovered", "marker")
+
+LITERAL_HEAD = re.compile(r"^[A-Za-z0-9_](?![?*{])")
+
+# campos de um registo do events.jsonl (scripts/chaos_driver.py) que não viram `chave=valor`
+JSONL_META = ("ts", "wall_ns", "mono_ns", "event", "action")
+
+
+@dataclass(frozen=True)
+class EventKind:
+    name: str
+    pattern: str             # regex do marcador (procurada em qualquer ponto da mensagem)
+    role: str = "marker"
+    type_field: str = "type"  # campo com o tipo de incidente (start/end/action)
+    incident: Optional[str] = None  # tipo fixo, em vez do campo
+    report: bool = True      # listado nos eventos do report.html
+
+    def incident_type(self, fields: Dict[str, str]) -> Optional[str]:
+        return self.incident or fields.get(self.type_field)
+
+
+DEFAULT_EVENT_KINDS: Tuple[EventKind, ...] = (
+    EventKind("incident_start", r"INCIDENT_START", role="start"),
+    EventKind("incident_end", r"INCIDENT_END", role="end"),
+    # RTO do kill_api medido a partir da ação (t0), não do INCIDENT_START
+    EventKind("kill_action", r"ACTION deleting_one_api_pod", role="action", incident="kill_api", report=False),
+    EventKind("first_failure", r"FIRST_FAILURE", role="first_failure"),
+    EventKind("first_success", r"FIRST_SUCCESS", role="first_success"),
+    # RECOVERED_INFRA (rollout do deployment concluído) não é o serviço a responder:
+    # é um marcador próprio, listado no report mas fora do "recovered"
+    EventKind("recovered", r"RECOVER(?:ED)?(?![_A-Z])", role="recovered"),
+    EventKind("recovered_infra", r"RECOVERED_INFRA", role="marker"),
+)
+
+
+def event_msg(rec: Dict[str, object]) -> str:
+    """Mensagem de um registo do events.jsonl igual à linha do events.log
+    ("ACTION deleting_one_api_pod pod=..."), para os mesmos marcadores/regex."""
+    words = [str(rec.get("event", ""))] + ([str(rec["action"])] if "action" in rec else [])
+    return " ".join(words + [f"{k}={v}" for k, v in rec.items() if k not in JSONL_META])
+
+
+class EventClassifier:
+    def __init__(self, kinds: Iterable[EventKind] = DEFAULT_EVENT_KINDS) -> None:
+        self.kinds: List[EventKind] = list(kinds)
+        for kind in self.kinds:
+            if kind.role not in ROLES:
+                raise ValueError(f"tipo de evento {kind.name!r}: role inválido {kind.role!r}")
+            try:
+                rx = re.compile(kind.pattern)
+            except re.error as e:
+                raise ValueError(f"tipo de evento {kind.name!r}: regex inválida ({e})")
+            if rx.groupindex:
+                raise ValueError(f"tipo de evento {kind.name!r}: grupos nomeados não são suportados")
+        alternatives = "|".join(f"(?P<k{i}>{k.pattern})" for i, k in enumerate(self.kinds))
+        if self.kinds and all("|" not in k.pattern and LITERAL_HEAD.match(k.pattern) for k in self.kinds):
+            heads = "".join(sorted({k.pattern[0] for k in self.kinds}))
+            alternatives = f"(?=[{re.escape(heads)}])(?:{alternatives})"
+        try:
+            self._re = re.compile(alternatives) if self.kinds else None
+        except re.error as e:
+            raise ValueError(f"tipos de evento incompatíveis numa só regex ({e})")
+
+    def classify(self, msg: str) -> Tuple[Optional[EventKind], Dict[str, str]]:
+        m = self._re.search(msg) if self._re is not None else None
+        if m is None:
+            return None, {}
+        # o grupo exterior é o último a fechar: lastgroup é sempre o kN do tipo
+        kind = self.kinds[int(m.lastgroup[1:])]
+        fields = {}
+        for tok in msg[m.end():].split():
+            key, sep, value = tok.partition("=")
+            if sep and key:
+                fields[key] = value
+        return kind, fields
+
+
+def _kind_of(d: dict, src: Path) -> EventKind:
+    try:
+        return EventKind(
+            name=str(d["name"]),
+            pattern=str(d["pattern"]),
+            role=str(d.get("role", "marker")),
+            type_field=str(d.get("type_field", "type")),
+            incident=d.get("incident"),
+            report=bool(d.get("report", True)),
+        )
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"{src}: tipo de evento inválido ({e}): {d!r}")
+
+
+def read_event_kinds(path: Path) -> List[EventKind]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    items = data.get("kinds", []) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError(f"{path}: esperado uma lista de tipos de evento")
+    return [_kind_of(d, path) for d in items]
+
+
+def load_classifier(run_dir: Optional[Path] = None) -> EventClassifier:
+    """Defaults + $RESILIENCE_EVENT_KINDS + <run>/event_kinds.json (o último ganha por nome)."""
+    paths = []
+    env = os.environ.get(EVENT_KINDS_ENV)
+    if env:
+        paths.append(Path(env))
+    if run_dir is not None and (run_dir / EVENT_KINDS_FILE).is_file():
+        paths.append(run_dir / EVENT_KINDS_FILE)
+    extra: Dict[str, EventKind] = {}
+    for p in paths:
+        for kind in read_event_kinds(p):
+            extra[kind.name] = kind
+    # os da config primeiro: na mesma posição da mensagem a alternância escolhe o primeiro
+    kinds = list(extra.values()) + [k for k in DEFAULT_EVENT_KINDS if k.name not in extra]
+    return EventClassifier(kinds)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import mmap
+import os
+from bisect import bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Leitura de ficheiros de texto grandes (http_metrics.csv, events.log, capturas de
+# logs) sem os carregar inteiros: as linhas são fatias de um mmap, e um índice
+# esparso (timestamp, offset) permite ir direto a um intervalo temporal.
+#
+# O índice é amostrado por bytes (uma entrada a cada `stride` bytes, na linha
+# seguinte) em vez de a cada N linhas: assim construí-lo custa O(tamanho/stride)
+# e não obriga a percorrer o ficheiro todo. Pressupõe ficheiros append-only com
+# timestamps não decrescentes (caso do monitor).
+
+TsOf = Callable[[bytes], Optional[datetime]]
+
+DEFAULT_STRIDE = 64 * 1024
+
+
+class MappedLines:
+    """Linhas (offset, bytes) de um ficheiro mapeado em memória."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._fh = self.path.open("rb")
+        self.size = os.fstat(self._fh.fileno()).st_size
+        # mmap de tamanho 0 não é permitido: ficheiro vazio = sem linhas
+        self.mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def close(self) -> None:
+        if self.mm is not None:
+            self.mm.close()
+        self._fh.close()
+
+    def __enter__(self) -> "MappedLines":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def line_start(self, pos: int) -> int:
+        # início da primeira linha completa em pos ou depois
+        if pos <= 0 or self.mm is None:
+            return 0
+        nl = self.mm.find(b"\n", pos - 1)
+        return self.size if nl < 0 else nl + 1
+
+    def lines(self, start: int = 0) -> Iterator[Tuple[int, bytes]]:
+        mm = self.mm
+        if mm is None:
+            return
+        pos = start
+        while pos < self.size:
+            nl = mm.find(b"\n", pos)
+            end = self.size if nl < 0 else nl
+            line = mm[pos:end]
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            yield pos, line
+            pos = end + 1
+
+
+class SparseTimeIndex:
+    """Entradas (ts, offset) ordenadas; start_offset(t0) diz onde começar a ler."""
+
+    def __init__(self, entries: List[Tuple[datetime, int]]) -> None:
+        self.entries = entries
+        self._ts = [ts for ts, _ in entries]
+
+    @classmethod
+    def build(cls, ml: MappedLines, ts_of: TsOf, stride: int = DEFAULT_STRIDE) -> "SparseTimeIndex":
+        entries: List[Tuple[datetime, int]] = []
+        pos = 0
+        while pos < ml.size:
+            # primeira linha com timestamp a partir de pos (salta cabeçalhos)
+            for off, line in ml.lines(ml.line_start(pos)):
+                ts = ts_of(line)
+                if ts is not None:
+                    if not entries or (off > entries[-1][1] and ts >= entries[-1][0]):
+                        entries.append((ts, off))
+                    pos = off + stride
+                    break
+            else:
+                break
+        return cls(entries)
+
+    def start_offset(self, t0: datetime) -> int:
+        # última entrada estritamente antes de t0 (linhas com ts == t0 podem estar antes)
+        i = bisect_right(self._ts, t0) - 1
+        while i > 0 and self._ts[i] >= t0:
+            i -= 1
+        return self.entries[i][1] if i >= 0 else 0
+
+
+_CACHE: Dict[Tuple[str, int, int, int], SparseTimeIndex] = {}
+
+
+def time_index(ml: MappedLines, ts_of: TsOf, stride: int = DEFAULT_STRIDE) -> SparseTimeIndex:
+    # cache por processo (o mesmo ficheiro é consultado por várias janelas/incidentes)
+    st = os.stat(ml.path)
+    key = (str(ml.path), st.st_size, st.st_mtime_ns, stride)
+    idx = _CACHE.get(key)
+    if idx is None:
+        idx = _CACHE[key] = SparseTimeIndex.build(ml, ts_of, stride)
+    return idx
+
+
+def lines_between(path: Path, ts_of: TsOf, t0: datetime, t1: datetime,
+                  stride: int = DEFAULT_STRIDE) -> Iterator[bytes]:
+    """Linhas com t0 <= ts <= t1, lendo só a zona do ficheiro que as contém."""
+    with MappedLines(path) as ml:
+        start = time_index(ml, ts_of, stride).start_offset(t0)
+        for _, line in ml.lines(start):
+            ts = ts_of(line)
+            if ts is None or ts < t0:
+                continue
+            if ts > t1:
+                break
+            yield line
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from typing import Dict
+
+
+def fmt(v):
+    return "-" if v is None else str(v)
+
+
+def render_markdown(data: Dict[str, object], run_name: str) -> str:
+    stable_n = data.get("stable_n")
+    post_window = data.get("post_window_s")
+    rpo = data.get("rpo")
+
+    overlaps = data.get("overlaps", [])
+    incidents = data.get("incidents", {})
+    k6 = data.get("k6", {})
+
+    lines = []
+    lines.append(f"# Métricas de Resiliência — {run_name}")
+    lines.append("")
+    lines.append(f"- Diretoria do run: `{data.get('run_dir')}`")
+    lines.append(f"- Recuperação estável: **{stable_n} OK consecutivos**")
+    lines.append(f"- Janela pós-incidente: **{post_window}s**")
+    lines.append(f"- RPO: **{rpo}**")
+    lines.append("")
+
+    baseline = data.get("baseline", {})
+    lines.append("## Baseline")
+    lines.append(f"- FIRST_FAILURE antes do 1º incidente: **{baseline.get('first_failure_at') or '—'}**")
+    lines.append(f"- Nota: {baseline.get('note','')}")
+    lines.append("")
+
+    lines.append("## Incidentes (MTTD / MTTR / RTO)")
+    if not incidents:
+        lines.append("_Sem incidentes encontrados._")
+        lines.append("")
+    else:
+        for itype, per_ep in incidents.items():
+            lines.append(f"### {itype}")
+            for ep, vals in per_ep.items():
+                lines.append(f"- **{ep}**")
+                lines.append(f"  - Início: {vals.get('t_incident_start')}")
+                lines.append(f"  - Fim: {vals.get('t_incident_end')}")
+                lines.append(f"  - FIRST_FAILURE: {vals.get('t_first_failure') or '—'}")
+                lines.append(f"  - RECOVERED (estável): {vals.get('t_recovered_stable') or '—'}")
+                lines.append(f"  - MTTD(s): {fmt(vals.get('mttd_s'))}")
+                lines.append(f"  - MTTR(s): {fmt(vals.get('mttr_s'))}")
+                lines.append(f"  - RTO(s): {fmt(vals.get('rto_s'))}")
+                if "rto_action_s" in vals:
+                    lines.append(f"  - RTO desde ACTION (s): {fmt(vals.get('rto_action_s'))}")
+                note = vals.get("note")
+                if note:
+                    lines.append(f"  - Nota: {note}")
+            lines.append("")
+
+    if overlaps:
+        lines.append("## Avisos de sobreposição")
+        for o in overlaps:
+            lines.append(f"- {o['a']} ↔ {o['b']} ({o['a_start']}..{o['a_end']} | {o['b_start']}..{o['b_end']})")
+            lines.append(f"  - {o.get('note','')}")
+        lines.append("")
+
+    endpoints = data.get("endpoints", {})
+    if endpoints:
+        lines.append("## Disponibilidade por endpoint (ponderada pelo intervalo de probing)")
+        if data.get("samples_scope") == "incident_windows":
+            lines.append("_Só amostras das janelas dos incidentes (`--incidents-only`)._")
+        for ep, vals in endpoints.items():
+            av = vals.get("availability_pct")
+            av_s = "—" if av is None else f"{av:.2f}%"
+            lines.append(f"- **{ep}**: {av_s} OK, p95 {fmt(vals.get('lat_p95_ms'))} ms ({vals.get('samples')} amostras)")
+        lines.append("")
+
+    lines.append("## DoS (k6)")
+    lines.append(f"- http_reqs: **{k6.get('http_reqs') or '—'}**")
+    lines.append(f"- p95: **{k6.get('http_req_duration_p95_ms') or '—'} ms**")
+    lines.append(f"- max: **{k6.get('http_req_duration_max_ms') or '—'} ms**")
+    if k6.get("source"):
+        lines.append(f"- fonte: `{k6.get('source')}`")
+    lines.append("")
+
+    return "\n".join(lines)
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from .model import Incident, Point, Run, fmt_ts
+
+ENDPOINTS = ["/ping", "/secure-data"]
+
+
+def first_failure_in_window(pts: List[Point], t0: datetime, t1: datetime) -> Optional[datetime]:
+    # pts: série de um endpoint a partir de t0 (Run.series_from)
+    for p in pts:
+        if p.ts < t0:
+            continue
+        if p.ts > t1:
+            break
+        if p.ok == 0:
+            return p.ts
+    return None
+
+
+def stable_recovery_time(
+    pts: List[Point],
+    t_from: datetime,
+    t_until: datetime,
+    stable_n: int
+) -> Optional[datetime]:
+    # “recuperação estável”: stable_n OK consecutivos
+    streak = 0
+    candidate_ts: Optional[datetime] = None
+    for p in pts:
+        if p.ts < t_from:
+            continue
+        if p.ts > t_until:
+            break
+        if p.ok == 1:
+            if streak == 0:
+                candidate_ts = p.ts
+            streak += 1
+            if streak >= stable_n:
+                return candidate_ts
+        else:
+            streak = 0
+            candidate_ts = None
+    return None
+
+
+def availability_pct(pts: List[Point]) -> Optional[float]:
+    # OK% ponderado pelo intervalo de probing: amostras em burst valem menos tempo
+    total = sum(p.weight for p in pts)
+    if not total:
+        return None
+    return sum(p.weight for p in pts if p.ok) / total * 100.0
+
+
+def weighted_percentile(pts: List[Point], q: float) -> int:
+    if not pts:
+        return 0
+    ordered = sorted(pts, key=lambda p: p.lat_ms)
+    target = q * sum(p.weight for p in ordered)
+    acc = 0.0
+    for p in ordered:
+        acc += p.weight
+        if acc >= target - 1e-9:
+            return p.lat_ms
+    return ordered[-1].lat_ms
+
+
+def overlaps(a: Incident, b: Incident) -> bool:
+    if a.end is None or b.end is None:
+        return False
+    return not (a.end <= b.start or b.end <= a.start)
+
+
+def endpoint_metrics(run: Run, inc: Incident, ep: str) -> Dict[str, object]:
+    assert inc.end is not None
+    win_end = inc.end + timedelta(seconds=run.post_window_s)
+    pts = run.series_from(ep, inc.start)
+
+    t_first = first_failure_in_window(pts, inc.start, win_end)
+    t_recovered = None
+    if t_first:
+        t_recovered = stable_recovery_time(pts, t_first, win_end, run.stable_n)
+
+    mttd = (t_first - inc.start).total_seconds() if t_first else None
+    mttr = (t_recovered - t_first).total_seconds() if (t_first and t_recovered) else None
+    # RTO genérico: do início do incidente até à recuperação estável
+    rto = (t_recovered - inc.start).total_seconds() if (t_recovered and t_first) else None
+
+    out: Dict[str, object] = {
+        "t_incident_start": fmt_ts(inc.start),
+        "t_incident_end": fmt_ts(inc.end),
+        "window_end": fmt_ts(win_end),
+        "t_first_failure": fmt_ts(t_first),
+        "t_recovered_stable": fmt_ts(t_recovered),
+        "mttd_s": mttd,
+        "mttr_s": mttr,
+        "rto_s": rto,
+        "note": (
+            "Sem falha detetada na janela do incidente."
+            if not t_first else
+            ("Falha detetada, mas sem recuperação estável na janela." if not t_recovered else None)
+        ),
+    }
+
+    # kill_api: RTO medido a partir do ACTION deleting_one_api_pod (t0 da ação)
+    if inc.action_t0:
+        rec = stable_recovery_time(run.series_from(ep, inc.action_t0), inc.action_t0, win_end, run.stable_n)
+        out["t0_action"] = fmt_ts(inc.action_t0)
+        out["rto_action_s"] = (rec - inc.action_t0).total_seconds() if rec else None
+
+    return out
+
+
+def compute_metrics(run: Run) -> Dict[str, object]:
+    inc_list = [i for i in run.incidents.values() if i.end is not None]
+
+    # baseline: FIRST_FAILURE só conta se for ANTES do primeiro incidente
+    first_inc_start = inc_list[0].start if inc_list else None
+    baseline_first_failure = None
+    if first_inc_start:
+        for ev in run.events:
+            if ev.ts >= first_inc_start:
+                break
+            if ev.role == "first_failure":
+                baseline_first_failure = ev.ts
+                break
+
+    out: Dict[str, object] = {
+        "run_dir": str(run.run_dir),
+        "rpo": "0 (stateless/NA)",
+        "stable_n": run.stable_n,
+        "post_window_s": run.post_window_s,
+        "baseline": {
+            "first_failure_at": fmt_ts(baseline_first_failure),
+            "note": "Baseline FIRST_FAILURE só é considerado se ocorrer antes do 1º INCIDENT_START."
+        },
+        "incidents": {},
+        "overlaps": [],
+    }
+
+    # overlaps (informação explícita para o relatório)
+    for i in range(len(inc_list)):
+        for j in range(i + 1, len(inc_list)):
+            a, b = inc_list[i], inc_list[j]
+            if overlaps(a, b):
+                out["overlaps"].append({
+                    "a": a.type, "b": b.type,
+                    "a_start": fmt_ts(a.start), "a_end": fmt_ts(a.end),
+                    "b_start": fmt_ts(b.start), "b_end": fmt_ts(b.end),
+                    "note": "Incidentes sobrepostos podem contaminar atribuição causal de falhas."
+                })
+
+    for inc in inc_list:
+        out["incidents"][inc.type] = {ep: endpoint_metrics(run, inc, ep) for ep in ENDPOINTS}
+
+    out["endpoints"] = {
+        ep: {
+            "samples": len(run.series(ep)),
+            "availability_pct": availability_pct(run.series(ep)),
+            "lat_p95_ms": weighted_percentile(run.series(ep), 0.95),
+        }
+        for ep in run.endpoints()
+    }
+    if run.windows is not None:
+        # só os chunks das janelas dos incidentes foram lidos (--incidents-only)
+        out["samples_scope"] = "incident_windows"
+
+    out["k6"] = {
+        "http_reqs": run.k6["http_reqs"],
+        "http_req_duration_p95_ms": run.k6["p95_ms"],
+        "http_req_duration_max_ms": run.k6["max_ms"],
+        "source": str(run.k6_source) if run.k6_source else None,
+    }
+    return out
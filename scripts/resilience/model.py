@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+import csv
+import heapq
+import itertools
+import json
+import re
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from . import artifacts
+from .events import EventClassifier, EventKind, event_msg, load_classifier
+from .lineindex import MappedLines, lines_between
+
+
+# linhas de events.log: "[<iso-ts>] <mensagem>"
+EVENT_LINE_RE = re.compile(r"^\[(?P<ts>[^]]+)\]\s+(?P<msg>.*)$")
+
+DEFAULT_STABLE_N = 3
+DEFAULT_POST_WINDOW_S = 30
+
+
+def parse_ts(s: str) -> datetime:
+    # aceita date -Is / -Iseconds (com timezone) e sufixo Z; sem timezone assume UTC
+    dt = datetime.fromisoformat(s.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def fmt_ts(dt: Optional[datetime]) -> Optional[str]:
+    return dt.isoformat() if dt else None
+
+
+@dataclass
+class Point:
+    ts: datetime
+    endpoint: str
+    http_code: int
+    lat_ms: int
+    ok: int  # 1/0
+    interval_s: Optional[float] = None  # intervalo de probing ativo (monitor adaptativo)
+
+    @property
+    def weight(self) -> float:
+        # cada amostra representa o intervalo de probing em que foi tirada
+        return self.interval_s if self.interval_s else 1.0
+
+
+@dataclass
+class Event:
+    ts: datetime
+    msg: str
+    source: str  # caminho relativo do events.log de origem
+    kind: Optional[EventKind] = None  # preenchido por load_events (events.EventClassifier)
+    fields: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def role(self) -> Optional[str]:
+        return self.kind.role if self.kind else None
+
+
+@dataclass
+class Incident:
+    type: str
+    start: datetime
+    end: Optional[datetime] = None
+    action_t0: Optional[datetime] = None  # p/ RTO desde a ação (kill_api: ACTION deleting_one_api_pod)
+
+
+@dataclass
+class Run:
+    run_dir: Path
+    points: List[Point]
+    events: List[Event]
+    incidents: Dict[str, Incident]
+    k6: Dict[str, Optional[float]]
+    k6_source: Optional[Path]
+    stable_n: int = DEFAULT_STABLE_N
+    post_window_s: int = DEFAULT_POST_WINDOW_S
+    # janelas carregadas (load_run(incidents_only=True)); None = run completo
+    windows: Optional[List[artifacts.Window]] = None
+    _by_endpoint: Dict[str, List[Point]] = field(default_factory=dict, repr=False)
+
+    def _index(self) -> Dict[str, List[Point]]:
+        # amostras por endpoint, ordenadas por ts (calculado uma vez)
+        if not self._by_endpoint and self.points:
+            for p in self.points:
+                self._by_endpoint.setdefault(p.endpoint, []).append(p)
+        return self._by_endpoint
+
+    def series(self, endpoint: str) -> List[Point]:
+        return self._index().get(endpoint, [])
+
+    def series_from(self, endpoint: str, t0: datetime) -> List[Point]:
+        pts = self.series(endpoint)
+        i = bisect_left(pts, t0, key=lambda p: p.ts)
+        return pts[i:]
+
+    def endpoints(self) -> List[str]:
+        return sorted(self._index())
+
+
+# -----------------------------------------------------------------------------
+# http_metrics.csv
+# -----------------------------------------------------------------------------
+def _to_int(s: str) -> int:
+    try:
+        return int(float(s))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _to_float(s: str) -> Optional[float]:
+    try:
+        return float(s)
+    except (TypeError, ValueError):
+        return None
+
+
+def _detect_delimiter(first_line: str) -> Optional[str]:
+    # deteta o delimitador uma vez (monitor escreve CSV; versões antigas TSV)
+    for d in ("\t", ";", ","):
+        if d in first_line:
+            return d
+    return None  # whitespace
+
+
+def merge_windows(windows: Sequence[artifacts.Window]) -> List[artifacts.Window]:
+    out: List[artifacts.Window] = []
+    for a, b in sorted(windows):
+        if out and a <= out[-1][1]:
+            out[-1] = (out[-1][0], max(out[-1][1], b))
+        else:
+            out.append((a, b))
+    return out
+
+
+def _csv_ts_of(delim: Optional[str]):
+    sep = delim.encode() if delim else None
+
+    def ts_of(line: bytes) -> Optional[datetime]:
+        head = line.split(sep, 1)[0].strip() if line else b""
+        if not head.startswith(b"20") or b"T" not in head:
+            return None
+        try:
+            return parse_ts(head.decode())
+        except ValueError:
+            return None
+    return ts_of
+
+
+def _plain_lines_in_windows(path: Path, windows: Sequence[artifacts.Window]) -> Iterator[str]:
+    # CSV em texto: cabeçalho + só as zonas do ficheiro das janelas (índice esparso)
+    with MappedLines(path) as ml:
+        header = next((ln for _, ln in ml.lines()), b"").decode("utf-8", "replace")
+    yield header
+    ts_of = _csv_ts_of(_detect_delimiter(header))
+    for a, b in merge_windows(windows):
+        for line in lines_between(path, ts_of, a, b):
+            yield line.decode("utf-8", "replace")
+
+
+def load_http_metrics(csv_path: Path, windows: Optional[Sequence[artifacts.Window]] = None) -> List[Point]:
+    """
+    Lê o CSV em texto, comprimido (.gz/.zst) ou em chunks (http_metrics.csv.d/).
+    Com `windows`, nos chunks só são descomprimidos os que intersetam as janelas
+    e no texto simples só são lidas as zonas das janelas (mmap + índice esparso).
+    """
+    pts: List[Point] = []
+    found = artifacts.resolve(csv_path)
+    if windows is not None and found == csv_path and found.is_file():
+        lines = _plain_lines_in_windows(csv_path, windows)
+    else:
+        lines = artifacts.open_lines(csv_path, windows)
+    first = next(lines, "")
+    if not first:
+        return pts
+    delim = _detect_delimiter(first)
+    lines = itertools.chain([first], lines)
+    rows = csv.reader(lines, delimiter=delim) if delim else (ln.split() for ln in lines)
+
+    # colunas: ts_iso,endpoint,http_code,lat_ms,ok[,interval_s] (cabeçalho opcional)
+    idx = {"ts_iso": 0, "endpoint": 1, "http_code": 2, "lat_ms": 3, "ok": 4}
+    i_interval: Optional[int] = None
+    for row in rows:
+        if len(row) < 5:
+            continue
+        ts_s = row[idx["ts_iso"]].strip()
+        if not ts_s.startswith("20") or "T" not in ts_s:
+            # cabeçalho: respeita a ordem das colunas, se existir
+            names = [c.strip() for c in row]
+            if all(k in names for k in idx):
+                idx = {k: names.index(k) for k in idx}
+                i_interval = names.index("interval_s") if "interval_s" in names else None
+            continue
+        try:
+            ts = parse_ts(ts_s)
+        except ValueError:
+            continue
+        ok_s = row[idx["ok"]].strip().lower()
+        pts.append(Point(
+            ts=ts,
+            endpoint=row[idx["endpoint"]].strip(),
+            http_code=_to_int(row[idx["http_code"]]),
+            lat_ms=_to_int(row[idx["lat_ms"]]),
+            ok=1 if ok_s in ("1", "true", "ok") else 0,
+            interval_s=_to_float(row[i_interval]) if i_interval is not None and i_interval < len(row) else None,
+        ))
+    pts.sort(key=lambda p: p.ts)
+    return pts
+
+
+# -----------------------------------------------------------------------------
+# events.log (monitor na raiz + um por incidente em subpastas)
+# -----------------------------------------------------------------------------
+def find_event_logs(run_dir: Path) -> List[Path]:
+    logs = []
+    for name in ("events.log", "events.jsonl"):
+        root = run_dir / name
+        if root.is_file():
+            logs.append(root)
+        logs += sorted(p for p in run_dir.rglob(name) if p != root)
+    return logs
+
+
+# events.jsonl (scripts/chaos_driver.py): {"wall_ns": ..., "mono_ns": ..., "event": ..., ...}
+#
+# O tempo do evento é o wall_ns, truncado a µs de propósito: é a resolução do
+# datetime e do ts_iso do http_metrics.csv (o prober grava [:26]), e os eventos
+# têm de cair na mesma escala que as amostras para o RTO/MTTR. O mono_ns não é
+# usado aqui: só é comparável dentro do mesmo processo, e as amostras do
+# http_metrics.csv estão no relógio de parede.
+
+
+def _ts_of_ns(wall_ns: int) -> datetime:
+    s, ns = divmod(int(wall_ns), 1_000_000_000)
+    return datetime.fromtimestamp(s, tz=timezone.utc) + timedelta(microseconds=ns // 1000)
+
+
+def _parse_jsonl_event(raw: bytes, src: str) -> Optional[Event]:
+    try:
+        rec = json.loads(raw)
+        ts = _ts_of_ns(rec["wall_ns"])
+    except (ValueError, KeyError, TypeError):
+        return None
+    return Event(ts=ts, msg=event_msg(rec), source=src)
+
+
+def _parse_event(raw: bytes, src: str) -> Optional[Event]:
+    m = EVENT_LINE_RE.match(raw.decode("utf-8", "replace").strip())
+    if not m:
+        return None
+    try:
+        ts = parse_ts(m.group("ts"))
+    except ValueError:
+        return None
+    return Event(ts=ts, msg=m.group("msg"), source=src)
+
+
+def _read_events(path: Path, src: str) -> Iterator[Event]:
+    parse = _parse_jsonl_event if path.suffix == ".jsonl" else _parse_event
+    with MappedLines(path) as ml:
+        for _, raw in ml.lines():
+            ev = parse(raw, src)
+            if ev is not None:
+                yield ev
+
+
+def load_events(run_dir: Path, classifier: Optional[EventClassifier] = None) -> List[Event]:
+    """
+    Junta os events.log (e events.jsonl do chaos_driver) do run (raiz + incidentes) por ordem temporal.
+
+    Cada ficheiro é append-only (já ordenado), por isso basta um merge k-way
+    (heapq) em vez de carregar tudo num set e ordenar; os duplicados (a mesma
+    linha em vários ficheiros) chegam juntos e só é preciso lembrar as
+    mensagens do timestamp atual. Os events.log são sempre lidos inteiros (são
+    pequenos e é deles que saem as janelas dos incidentes, que só depois filtram
+    o http_metrics). Cada evento é classificado uma vez
+    (tipo + campos) com o `classifier` (por omissão o do run, ver events.py).
+    """
+    if classifier is None:
+        classifier = load_classifier(run_dir)
+    streams = [
+        _read_events(path, str(path.relative_to(run_dir)))
+        for path in find_event_logs(run_dir)
+    ]
+    out: List[Event] = []
+    cur_ts: Optional[datetime] = None
+    seen_msgs: set = set()
+    for ev in heapq.merge(*streams, key=lambda e: e.ts):
+        if ev.ts != cur_ts:
+            cur_ts, seen_msgs = ev.ts, set()
+        if ev.msg in seen_msgs:
+            continue
+        seen_msgs.add(ev.msg)
+        ev.kind, ev.fields = classifier.classify(ev.msg)
+        out.append(ev)
+
+    if any(b.ts < a.ts for a, b in zip(out, out[1:])):
+        # algum ficheiro fora de ordem (editado à mão?): ordena e volta a deduplicar
+        seen = set()
+        uniq = []
+        for ev in sorted(out, key=lambda e: e.ts):
+            if (ev.ts, ev.msg) not in seen:
+                seen.add((ev.ts, ev.msg))
+                uniq.append(ev)
+        out = uniq
+    return out
+
+
+def extract_incidents(events: List[Event]) -> Dict[str, Incident]:
+    incidents: Dict[str, Incident] = {}
+    for ev in events:
+        if ev.role not in ("start", "end", "action"):
+            continue
+        typ = ev.kind.incident_type(ev.fields)
+        if not typ:
+            continue
+        if ev.role == "start":
+            if typ not in incidents:
+                incidents[typ] = Incident(type=typ, start=ev.ts)
+            continue
+        inc = incidents.get(typ)
+        if inc is None:
+            continue
+        if ev.role == "end":
+            inc.end = ev.ts
+        elif inc.action_t0 is None:
+            inc.action_t0 = ev.ts
+    return dict(sorted(incidents.items(), key=lambda kv: kv[1].start))
+
+
+# -----------------------------------------------------------------------------
+# k6
+# -----------------------------------------------------------------------------
+def parse_k6_summary(k6_path: Path) -> Dict[str, Optional[float]]:
+    empty: Dict[str, Optional[float]] = {"http_reqs": None, "p95_ms": None, "max_ms": None}
+    if not k6_path.exists():
+        return empty
+    try:
+        data = json.loads(k6_path.read_text(encoding="utf-8"))
+    except Exception:
+        return empty
+
+    m = data.get("metrics", {})
+
+    # suportar estruturas diferentes:
+    # - m["http_reqs"] = {"count":..., "rate":...}
+    # - ou m["http_reqs"]["values"]["count"] (formato handleSummary)
+    def num(mm: object, *keys: str) -> Optional[float]:
+        if not isinstance(mm, dict):
+            return None
+        for k in keys:
+            v = mm.get(k)
+            if isinstance(v, (int, float)):
+                return float(v)
+        vv = mm.get("values")
+        if isinstance(vv, dict):
+            for k in keys:
+                v = vv.get(k)
+                if isinstance(v, (int, float)):
+                    return float(v)
+        return None
+
+    dur = m.get("http_req_duration")
+    return {
+        "http_reqs": num(m.get("http_reqs"), "count"),
+        "p95_ms": num(dur, "p(95)", "p95"),
+        "max_ms": num(dur, "max"),
+    }
+
+
+def _read_int(path: Path, default: int) -> int:
+    try:
+        return int(path.read_text().strip())
+    except (OSError, ValueError):
+        return default
+
+
+def incident_windows(incidents: Dict[str, Incident], post_window_s: int) -> List[artifacts.Window]:
+    # intervalo que MTTD/MTTR/RTO leem de cada incidente: [início (ou ACTION), fim + janela]
+    out = []
+    for inc in incidents.values():
+        if inc.end is None:
+            continue
+        start = min(inc.start, inc.action_t0) if inc.action_t0 else inc.start
+        out.append((start, inc.end + timedelta(seconds=post_window_s)))
+    return out
+
+
+def load_run(
+    run_dir: Path,
+    stable_n: Optional[int] = None,
+    post_window_s: Optional[int] = None,
+    incidents_only: bool = False,
+) -> Run:
+    """
+    Lê todos os artefactos de um run (uma passagem por ficheiro).
+
+    incidents_only: lê primeiro os events.log e, do http_metrics em chunks, só
+    descomprime os chunks que intersetam as janelas dos incidentes (runs longos).
+    MTTD/MTTR/RTO ficam iguais; a disponibilidade por endpoint passa a ser a
+    das amostras carregadas.
+    """
+    run_dir = Path(run_dir).resolve()
+    http_csv = run_dir / "http_metrics.csv"
+    if not artifacts.exists(http_csv):
+        raise FileNotFoundError(f"falta {http_csv}")
+
+    events = load_events(run_dir)
+    incidents = extract_incidents(events)
+    if stable_n is None:
+        stable_n = _read_int(run_dir / "stable_n.txt", DEFAULT_STABLE_N)
+    if post_window_s is None:
+        post_window_s = _read_int(run_dir / "post_window_s.txt", DEFAULT_POST_WINDOW_S)
+    windows = incident_windows(incidents, post_window_s) if incidents_only else None
+
+    k6_path = run_dir / "dos" / "k6_summary.json"
+    return Run(
+        run_dir=run_dir,
+        points=load_http_metrics(http_csv, windows),
+        events=events,
+        incidents=incidents,
+        k6=parse_k6_summary(k6_path),
+        k6_source=k6_path if k6_path.exists() else None,
+        stable_n=stable_n,
+        post_window_s=post_window_s,
+        windows=windows,
+    )
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import statistics
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .metrics import ENDPOINTS
+from .model import Run
+
+# Replay offline: recalcula MTTD/MTTR/RTO a partir do http_metrics.csv guardado
+# para uma grelha de (stable_n, post_window_s, sample_every), sem repetir o
+# experimento no cluster.
+
+SENSITIVITY_FIELDS = [
+    "run", "incident", "endpoint", "stable_n", "post_window_s", "sample_every",
+    "mttd_s", "mttr_s", "rto_s",
+]
+
+
+@dataclass
+class Series:
+    """Série de um endpoint pré-indexada para responder a toda a grelha."""
+    ts: List[float]
+    fail_idx: List[int]        # índices das amostras ok==0
+    streak_start: List[int]    # início de cada sequência de OKs
+    streak_len: List[int]      # comprimento da sequência correspondente
+
+    @classmethod
+    def build(cls, ts: List[float], ok: List[int]) -> "Series":
+        fail_idx, starts, lens = [], [], []
+        i, n = 0, len(ok)
+        while i < n:
+            if ok[i]:
+                j = i
+                while j < n and ok[j]:
+                    j += 1
+                starts.append(i)
+                lens.append(j - i)
+                i = j
+            else:
+                fail_idx.append(i)
+                i += 1
+        return cls(ts=ts, fail_idx=fail_idx, streak_start=starts, streak_len=lens)
+
+    def first_failure(self, t0: float, t1: float) -> Optional[int]:
+        i = bisect_left(self.ts, t0)
+        k = bisect_left(self.fail_idx, i)
+        if k < len(self.fail_idx) and self.ts[self.fail_idx[k]] <= t1:
+            return self.fail_idx[k]
+        return None
+
+    def stable_recovery(self, after_idx: int, t1: float, stable_n: int) -> Optional[int]:
+        # primeira sequência de >= stable_n OKs depois da falha, terminada até t1
+        k = bisect_right(self.streak_start, after_idx)
+        for s, ln in zip(self.streak_start[k:], self.streak_len[k:]):
+            if self.ts[s] > t1:
+                return None
+            if ln >= stable_n and self.ts[s + stable_n - 1] <= t1:
+                return s
+            if ln >= stable_n:
+                return None  # a sequência ultrapassa t1 antes de estabilizar
+        return None
+
+
+def build_series(run: Run, sample_every: int) -> Dict[str, Series]:
+    out = {}
+    for ep in ENDPOINTS:
+        pts = run.series(ep)[::sample_every]
+        out[ep] = Series.build([p.ts.timestamp() for p in pts], [p.ok for p in pts])
+    return out
+
+
+def replay_run(
+    run: Run,
+    stable_ns: Sequence[int],
+    windows: Sequence[int],
+    sample_every: Sequence[int],
+) -> List[Dict[str, object]]:
+    rows: List[Dict[str, object]] = []
+    incidents = [i for i in run.incidents.values() if i.end is not None]
+    for k in sample_every:
+        series = build_series(run, k)
+        for inc in incidents:
+            t_start = inc.start.timestamp()
+            t_end = inc.end.timestamp()
+            for ep, s in series.items():
+                for w in windows:
+                    win_end = t_end + w
+                    f = s.first_failure(t_start, win_end)
+                    for n in stable_ns:
+                        r = s.stable_recovery(f, win_end, n) if f is not None else None
+                        t_f = s.ts[f] if f is not None else None
+                        t_r = s.ts[r] if r is not None else None
+                        rows.append({
+                            "run": run.run_dir.name,
+                            "incident": inc.type,
+                            "endpoint": ep,
+                            "stable_n": n,
+                            "post_window_s": w,
+                            "sample_every": k,
+                            "mttd_s": (t_f - t_start) if t_f is not None else None,
+                            "mttr_s": (t_r - t_f) if t_r is not None else None,
+                            "rto_s": (t_r - t_start) if t_r is not None else None,
+                        })
+    return rows
+
+
+def summarize(rows: Iterable[Dict[str, object]]) -> List[Dict[str, object]]:
+    # média por (incidente, endpoint, parâmetros) sobre todos os runs
+    groups: Dict[Tuple, Dict[str, List[float]]] = {}
+    for r in rows:
+        key = (r["incident"], r["endpoint"], r["stable_n"], r["post_window_s"], r["sample_every"])
+        g = groups.setdefault(key, {"mttd_s": [], "mttr_s": [], "rto_s": [], "runs": []})
+        g["runs"].append(1)
+        for m in ("mttd_s", "mttr_s", "rto_s"):
+            if r[m] is not None:
+                g[m].append(r[m])
+    out = []
+    for key in sorted(groups):
+        g = groups[key]
+        out.append({
+            "incident": key[0], "endpoint": key[1],
+            "stable_n": key[2], "post_window_s": key[3], "sample_every": key[4],
+            "runs": len(g["runs"]),
+            "detected": len(g["mttd_s"]),
+            "recovered": len(g["mttr_s"]),
+            "mttd_s": statistics.fmean(g["mttd_s"]) if g["mttd_s"] else None,
+            "mttr_s": statistics.fmean(g["mttr_s"]) if g["mttr_s"] else None,
+            "rto_s": statistics.fmean(g["rto_s"]) if g["rto_s"] else None,
+        })
+    return out
+
+
+def write_sensitivity_csv(rows: List[Dict[str, object]], path: Path) -> None:
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=SENSITIVITY_FIELDS)
+        w.writeheader()
+        w.writerows(rows)
+
+
+def render_summary(summary: List[Dict[str, object]]) -> str:
+    def f(v):
+        return "-" if v is None else f"{v:.1f}"
+
+    lines = [
+        "| Incidente | Endpoint | stable_n | janela (s) | 1/k amostras | deteções | recuperações | MTTD | MTTR | RTO |",
+        "|---|---|---:|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for r in summary:
+        lines.append(
+            f"| {r['incident']} | {r['endpoint']} | {r['stable_n']} | {r['post_window_s']}"
+            f" | {r['sample_every']} | {r['detected']}/{r['runs']} | {r['recovered']}/{r['runs']}"
+            f" | {f(r['mttd_s'])} | {f(r['mttr_s'])} | {f(r['rto_s'])} |"
+        )
+    return "\n".join(lines)
+
+
+def parse_grid(s: str, minimum: int = 1) -> List[int]:
+    # "1,2,3" ou intervalo "1-5"; type= do argparse (erros como ArgumentTypeError)
+    out: List[int] = []
+    try:
+        for part in s.split(","):
+            part = part.strip()
+            if "-" in part:
+                a, b = part.split("-", 1)
+                out.extend(range(int(a), int(b) + 1))
+            elif part:
+                out.append(int(part))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"grelha inválida {s!r} (ex: 1,2,3 ou 1-5)")
+    if not out:
+        raise argparse.ArgumentTypeError(f"grelha vazia {s!r}")
+    low = min(out)
+    if low < minimum:
+        raise argparse.ArgumentTypeError(f"grelha {s!r}: {low} < {minimum}")
+    return sorted(set(out))
+
+
+def parse_window_grid(s: str) -> List[int]:
+    # janelas pós-incidente: 0 s é válido (só a janela do incidente)
+    return parse_grid(s, minimum=0)
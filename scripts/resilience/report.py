@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .metrics import availability_pct, weighted_percentile
+from .model import Point, Run
+
+
+def endpoint_table(run: Run) -> List[Tuple[str, int, float, int, int]]:
+    # OK% e p95 ponderados pelo intervalo de probing (iguais ao não ponderado sem interval_s)
+    table = []
+    for ep in run.endpoints():
+        pts = run.series(ep)
+        okp = availability_pct(pts) or 0.0
+        table.append((ep, len(pts), okp, max((p.lat_ms for p in pts), default=0), weighted_percentile(pts, 0.95)))
+    return table
+
+
+def first_failure(run: Run) -> Optional[Point]:
+    return next((p for p in run.points if p.ok == 0), None)
+
+
+def write_plots(run: Run, table, out_dir: Path) -> bool:
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("[WARN] matplotlib não instalado: report.html sem gráficos")
+        return False
+
+    endpoints = [r[0] for r in table]
+    ok_rates = [r[2] for r in table]
+    max_lats = [r[3] for r in table]
+    p95_lats = [r[4] for r in table]
+
+    # ok% por endpoint
+    plt.figure()
+    plt.bar(endpoints, ok_rates)
+    plt.ylabel("OK (%)")
+    plt.title("OK% por endpoint")
+    plt.ylim(0, 100)
+    plt.tight_layout()
+    plt.savefig(out_dir / "ok_rate.png", dpi=160)
+    plt.close()
+
+    # latência (p95 e max)
+    plt.figure()
+    x = range(len(endpoints))
+    plt.bar([i-0.2 for i in x], p95_lats, width=0.4, label="p95 (ms)")
+    plt.bar([i+0.2 for i in x], max_lats, width=0.4, label="max (ms)")
+    plt.xticks(list(x), endpoints)
+    plt.ylabel("Latência (ms)")
+    plt.title("Latência por endpoint")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(out_dir / "latency.png", dpi=160)
+    plt.close()
+
+    # timeline simples (incidentes), no intervalo das métricas
+    t0 = run.points[0].ts if run.points else None
+    t1 = run.points[-1].ts if run.points else None
+    ff = first_failure(run)
+
+    plt.figure()
+    if t0 and t1:
+        plt.plot([t0, t1], [0, 0])  # linha base invisível
+        y = 1
+        for inc in run.incidents.values():
+            plt.hlines(y, inc.start, inc.end or t1, linewidth=6)
+            plt.text(inc.start, y+0.1, inc.type, fontsize=9)
+            y += 1
+        if ff:
+            plt.vlines(ff.ts, 0, max(1, y), linestyles="dashed")
+            plt.text(ff.ts, 0.2, f"FIRST_FAILURE ({ff.endpoint} {ff.http_code})", rotation=90, fontsize=8)
+        plt.yticks([])
+        plt.title("Timeline (incidentes + first failure)")
+        plt.tight_layout()
+        plt.savefig(out_dir / "timeline.png", dpi=160)
+    plt.close()
+    return True
+
+
+def esc(s: str) -> str:
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def render_html(run: Run, table) -> str:
+    name = run.run_dir.name
+    ff = first_failure(run)
+    ff_line = "n/a"
+    if ff:
+        ff_line = f"{ff.ts.isoformat()} endpoint={ff.endpoint} status={ff.http_code} lat_ms={ff.lat_ms}"
+
+    rows_html = "\n".join(
+        f"<tr><td>{esc(ep)}</td><td>{cnt}</td><td>{okp:.1f}</td><td>{mx}</td><td>{p95v}</td></tr>"
+        for ep, cnt, okp, mx, p95v in table
+    )
+
+    events_html = "<br>".join(
+        esc(f"[{ev.ts.isoformat()}] {ev.msg}")
+        for ev in run.events if ev.kind is not None and ev.kind.report
+    )
+
+    return f"""<!doctype html>
+<html lang="pt">
+<head>
+  <meta charset="utf-8">
+  <title>Relatório de Run - {esc(name)}</title>
+  <style>
+    body {{ font-family: Arial, sans-serif; margin: 24px; }}
+    table {{ border-collapse: collapse; width: 100%; margin: 12px 0; }}
+    th, td {{ border: 1px solid #ccc; padding: 8px; text-align: left; }}
+    th {{ background: #f2f2f2; }}
+    .grid {{ display: grid; grid-template-columns: 1fr 1fr; gap: 16px; }}
+    img {{ max-width: 100%; border: 1px solid #ddd; padding: 6px; background: #fff; }}
+    code {{ background: #f7f7f7; padding: 2px 4px; }}
+  </style>
+</head>
+<body>
+  <h1>Relatório do Run: {esc(name)}</h1>
+
+  <p><b>Fonte:</b> <code>http_metrics.csv</code> (ts_iso, endpoint, http_code, lat_ms, ok[, interval_s]);
+     OK% e p95 ponderados pelo intervalo de probing de cada amostra</p>
+  <p><b>FIRST_FAILURE (auto):</b> <code>{esc(ff_line)}</code></p>
+
+  <h2>Métricas por endpoint</h2>
+  <table>
+    <thead>
+      <tr>
+        <th>Endpoint</th><th>Count</th><th>OK (%)</th><th>Max lat (ms)</th><th>P95 lat (ms)</th>
+      </tr>
+    </thead>
+    <tbody>
+      {rows_html}
+    </tbody>
+  </table>
+
+  <h2>Gráficos</h2>
+  <div class="grid">
+    <div>
+      <h3>OK% por endpoint</h3>
+      <img src="ok_rate.png" alt="OK rate">
+    </div>
+    <div>
+      <h3>Latência (p95 vs max)</h3>
+      <img src="latency.png" alt="Latency">
+    </div>
+  </div>
+
+  <div style="margin-top:16px;">
+    <h3>Timeline</h3>
+    <img src="timeline.png" alt="Timeline">
+  </div>
+
+  <h2>Eventos (agregados)</h2>
+  <p style="white-space: pre-wrap;">{events_html if events_html else "Sem events.log agregado."}</p>
+
+</body>
+</html>
+"""
+
+
+def write_report(run: Run) -> Path:
+    table = endpoint_table(run)
+    write_plots(run, table, run.run_dir)
+    report_path = run.run_dir / "report.html"
+    report_path.write_text(render_html(run, table), encoding="utf-8")
+    return report_path
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from . import artifacts
+from .metrics import weighted_percentile
+from .model import Point, parse_ts
+
+# Soak: tendência (declive por hora, mínimos quadrados) de RSS, FDs e lag do event
+# loop por processo (soak.csv.d/, escrito pelo scripts/soak_sample.py) e do p95 de
+# latência do monitor (http_metrics), com limites que dão o soak como falhado.
+
+# limites por omissão (por hora); ajustáveis na linha de comandos
+DEFAULT_LIMITS = {
+    "rss_mb_per_h": 10.0,
+    "open_fds_per_h": 5.0,
+    "loop_lag_ms_per_h": 2.0,
+    "lat_p95_ms_per_h": 10.0,
+}
+MIN_SPAN_H = 0.25  # séries mais curtas (p.ex. pod substituído) não são avaliadas
+LAT_BUCKET = timedelta(minutes=5)
+THROTTLED = 429  # respondido pelo rate limit em ~1 ms: não é latência do serviço
+
+
+@dataclass
+class SoakSample:
+    ts: datetime
+    service: str
+    pod: str
+    rss_kb: Optional[int]
+    open_fds: Optional[int]
+    loop_lag_max_ms: Optional[float]
+    lat_ms: int
+    ok: int
+
+
+def _num(s: str, cast=float):
+    try:
+        return cast(s)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_soak(run_dir: Path) -> List[SoakSample]:
+    out: List[SoakSample] = []
+    # cada chunk repete o cabeçalho: essas linhas falham no parse_ts e são saltadas
+    for row in csv.DictReader(artifacts.open_lines(run_dir / "soak.csv")):
+        try:
+            ts = parse_ts(row["ts_iso"])
+        except (KeyError, ValueError, AttributeError):
+            continue
+        out.append(SoakSample(
+            ts=ts,
+            service=row.get("service", ""),
+            pod=row.get("pod", ""),
+            rss_kb=_num(row.get("rss_kb"), int),
+            open_fds=_num(row.get("open_fds"), int),
+            loop_lag_max_ms=_num(row.get("loop_lag_max_ms")),
+            lat_ms=_num(row.get("lat_ms"), int) or 0,
+            ok=1 if row.get("ok", "").strip() == "1" else 0,
+        ))
+    out.sort(key=lambda s: s.ts)
+    return out
+
+
+def ols_slope(xs: Sequence[float], ys: Sequence[float]) -> Optional[float]:
+    n = len(xs)
+    if n < 3:
+        return None
+    mx = sum(xs) / n
+    my = sum(ys) / n
+    sxx = sum((x - mx) ** 2 for x in xs)
+    if sxx == 0:
+        return None
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx
+
+
+def _trend(points: List[Tuple[datetime, float]]) -> Dict[str, object]:
+    t0 = points[0][0]
+    xs = [(t - t0).total_seconds() / 3600 for t, _ in points]
+    ys = [v for _, v in points]
+    return {
+        "samples": len(points),
+        "span_h": round(xs[-1], 3),
+        "first": ys[0],
+        "last": ys[-1],
+        "slope_per_h": ols_slope(xs, ys),
+    }
+
+
+def process_trends(samples: List[SoakSample]) -> Dict[str, Dict[str, object]]:
+    """Tendências por (serviço, pod): cada pod é um processo com a sua série."""
+    by_proc: Dict[str, List[SoakSample]] = {}
+    for s in samples:
+        if s.ok and s.pod:
+            by_proc.setdefault(f"{s.service}/{s.pod}", []).append(s)
+    out: Dict[str, Dict[str, object]] = {}
+    for proc, ss in sorted(by_proc.items()):
+        series = {
+            "rss_mb": [(s.ts, s.rss_kb / 1024) for s in ss if s.rss_kb is not None],
+            "open_fds": [(s.ts, float(s.open_fds)) for s in ss if s.open_fds is not None and s.open_fds >= 0],
+            "loop_lag_ms": [(s.ts, s.loop_lag_max_ms) for s in ss if s.loop_lag_max_ms is not None],
+        }
+        out[proc] = {name: _trend(pts) for name, pts in series.items() if pts}
+    return out
+
+
+def latency_trends(points: List[Point]) -> Dict[str, Dict[str, object]]:
+    """p95 por blocos de 5 min (ponderado) e a sua tendência, por endpoint (sem os 429)."""
+    by_ep: Dict[str, List[Point]] = {}
+    for p in points:
+        if p.http_code != THROTTLED:
+            by_ep.setdefault(p.endpoint, []).append(p)
+    out: Dict[str, Dict[str, object]] = {}
+    for ep, pts in sorted(by_ep.items()):
+        buckets: List[Tuple[datetime, float]] = []
+        start = pts[0].ts
+        cur: List[Point] = []
+        for p in pts:
+            if p.ts - start >= LAT_BUCKET and cur:
+                buckets.append((start, float(weighted_percentile(cur, 0.95))))
+                start, cur = p.ts, []
+            cur.append(p)
+        if cur:
+            buckets.append((start, float(weighted_percentile(cur, 0.95))))
+        out[ep] = _trend(buckets)
+    return out
+
+
+def evaluate(
+    procs: Dict[str, Dict[str, object]],
+    lat: Dict[str, Dict[str, object]],
+    limits: Dict[str, float],
+) -> List[Dict[str, object]]:
+    checks: List[Dict[str, object]] = []
+
+    def check(subject: str, metric: str, trend: Dict[str, object], limit: float) -> None:
+        slope = trend.get("slope_per_h")
+        if slope is None or trend["span_h"] < MIN_SPAN_H:
+            status = "inconclusive"
+        else:
+            status = "fail" if slope > limit else "pass"
+        checks.append({"subject": subject, "metric": metric, "slope_per_h": slope,
+                       "limit_per_h": limit, "span_h": trend["span_h"], "status": status})
+
+    for proc, series in procs.items():
+        for metric, key in (("rss_mb", "rss_mb_per_h"), ("open_fds", "open_fds_per_h"),
+                            ("loop_lag_ms", "loop_lag_ms_per_h")):
+            if metric in series:
+                check(proc, metric, series[metric], limits[key])
+    for ep, trend in lat.items():
+        check(ep, "lat_p95_ms", trend, limits["lat_p95_ms_per_h"])
+    return checks
+
+
+def analyze_soak(run_dir: Path, points: List[Point], limits: Dict[str, float]) -> Dict[str, object]:
+    samples = load_soak(run_dir)
+    procs = process_trends(samples)
+    lat = latency_trends(points)
+    checks = evaluate(procs, lat, limits)
+    t = [s.ts for s in samples] + [p.ts for p in points]
+    statuses = {c["status"] for c in checks}
+    return {
+        "run_dir": str(run_dir),
+        "duration_h": round((max(t) - min(t)).total_seconds() / 3600, 3) if t else 0.0,
+        "samples": len(samples),
+        "sample_errors": sum(1 for s in samples if not s.ok),
+        "throttled": sum(1 for p in points if p.http_code == THROTTLED),
+        "limits_per_h": limits,
+        "processes": procs,
+        "latency": lat,
+        "checks": checks,
+        "verdict": "fail" if "fail" in statuses else ("pass" if "pass" in statuses else "inconclusive"),
+    }
+
+
+def _f(v, nd=3) -> str:
+    return "—" if v is None else f"{v:.{nd}f}"
+
+
+def render_soak_md(data: Dict[str, object], run_name: str) -> str:
+    lines = [f"# Soak — {run_name}", ""]
+    lines.append(f"- Duração: **{data['duration_h']} h**")
+    lines.append(f"- Amostras de runtime: {data['samples']} ({data['sample_errors']} falhadas)")
+    if data.get("throttled"):
+        lines.append(f"- Probes com 429 (fora do p95): {data['throttled']} — carga acima do orçamento do rate limit?")
+    lines.append(f"- Veredicto: **{str(data['verdict']).upper()}**")
+    lines.append("")
+    lines.append("| Processo / endpoint | Métrica | Declive /h | Limite /h | Janela (h) | Estado |")
+    lines.append("|---|---|---:|---:|---:|---|")
+    for c in data["checks"]:
+        lines.append(f"| {c['subject']} | {c['metric']} | {_f(c['slope_per_h'])} | {c['limit_per_h']} "
+                     f"| {c['span_h']} | {c['status']} |")
+    lines.append("")
+    lines.append(f"_Séries com menos de {MIN_SPAN_H} h (p.ex. pods substituídos) ficam `inconclusive`._")
+    lines.append("")
+    return "\n".join(lines)
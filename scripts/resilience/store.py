@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import fnmatch
+import json
+import random
+import sqlite3
+import statistics
+import time
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .model import Run
+
+# base de dados de regressão entre runs (append-only)
+DEFAULT_DB = Path("results") / "resilience.db"
+
+METRIC_KEYS = ("mttd_s", "mttr_s", "rto_s", "rto_action_s")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id        INTEGER PRIMARY KEY,
+    name          TEXT NOT NULL UNIQUE,
+    run_dir       TEXT NOT NULL,
+    ingested_at   REAL NOT NULL,
+    stable_n      INTEGER NOT NULL,
+    post_window_s INTEGER NOT NULL,
+    labels        TEXT NOT NULL DEFAULT '{}',
+    k6_http_reqs  REAL,
+    k6_p95_ms     REAL,
+    k6_max_ms     REAL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id    INTEGER NOT NULL REFERENCES runs(run_id),
+    endpoint  TEXT NOT NULL,
+    ts        REAL NOT NULL,
+    http_code INTEGER NOT NULL,
+    lat_ms    INTEGER NOT NULL,
+    ok        INTEGER NOT NULL,
+    interval_s REAL
+);
+CREATE INDEX IF NOT EXISTS samples_run_ep_ts ON samples(run_id, endpoint, ts);
+CREATE TABLE IF NOT EXISTS incident_metrics (
+    run_id   INTEGER NOT NULL REFERENCES runs(run_id),
+    incident TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    metric   TEXT NOT NULL,
+    value    REAL,
+    PRIMARY KEY (run_id, incident, endpoint, metric)
+);
+CREATE INDEX IF NOT EXISTS incident_metrics_lookup ON incident_metrics(incident, endpoint, metric);
+"""
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    # bases criadas antes de interval_s (peso de cada amostra no monitor adaptativo)
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(samples)")}
+    if "interval_s" not in cols:
+        conn.execute("ALTER TABLE samples ADD COLUMN interval_s REAL")
+    return conn
+
+
+def stored_params(conn: sqlite3.Connection, name: str) -> Optional[Tuple[int, int]]:
+    """(stable_n, post_window_s) com que o run foi ingerido, ou None se não existir."""
+    row = conn.execute("SELECT stable_n, post_window_s FROM runs WHERE name = ?", (name,)).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def ingest_run(
+    conn: sqlite3.Connection,
+    run: Run,
+    metrics: Dict[str, object],
+    labels: Optional[Dict[str, str]] = None,
+) -> Optional[int]:
+    """Guarda um run (amostras + métricas por incidente). Devolve None se já existir."""
+    name = run.run_dir.name
+    if conn.execute("SELECT 1 FROM runs WHERE name = ?", (name,)).fetchone():
+        return None
+
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO runs (name, run_dir, ingested_at, stable_n, post_window_s, labels,"
+            " k6_http_reqs, k6_p95_ms, k6_max_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (name, str(run.run_dir), time.time(), run.stable_n, run.post_window_s,
+             json.dumps(labels or {}, sort_keys=True),
+             run.k6["http_reqs"], run.k6["p95_ms"], run.k6["max_ms"]),
+        )
+        run_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO samples (run_id, endpoint, ts, http_code, lat_ms, ok, interval_s)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((run_id, p.endpoint, p.ts.timestamp(), p.http_code, p.lat_ms, p.ok, p.interval_s)
+             for p in run.points),
+        )
+        conn.executemany(
+            "INSERT INTO incident_metrics (run_id, incident, endpoint, metric, value) VALUES (?, ?, ?, ?, ?)",
+            (
+                (run_id, inc, ep, k, vals[k])
+                for inc, per_ep in metrics.get("incidents", {}).items()
+                for ep, vals in per_ep.items()
+                for k in METRIC_KEYS if k in vals
+            ),
+        )
+    return run_id
+
+
+def select_runs(conn: sqlite3.Connection, selector: str) -> List[int]:
+    """
+    Seleciona runs por nome (glob, ex: 'demo_202601*') ou por label ('hpa=60').
+    Vários seletores separados por vírgula são unidos.
+    """
+    rows = conn.execute("SELECT run_id, name, labels FROM runs").fetchall()
+    picked = []
+    for part in (s.strip() for s in selector.split(",") if s.strip()):
+        for run_id, name, labels in rows:
+            if "=" in part:
+                k, v = part.split("=", 1)
+                hit = json.loads(labels).get(k) == v
+            else:
+                hit = fnmatch.fnmatch(name, part)
+            if hit and run_id not in picked:
+                picked.append(run_id)
+    return picked
+
+
+def metric_values(
+    conn: sqlite3.Connection, run_ids: Sequence[int]
+) -> Dict[Tuple[str, str, str], List[float]]:
+    out: Dict[Tuple[str, str, str], List[float]] = {}
+    if not run_ids:
+        return out
+    marks = ",".join("?" * len(run_ids))
+    for inc, ep, metric, value in conn.execute(
+        f"SELECT incident, endpoint, metric, value FROM incident_metrics"
+        f" WHERE run_id IN ({marks}) AND value IS NOT NULL",
+        tuple(run_ids),
+    ):
+        out.setdefault((inc, ep, metric), []).append(value)
+    return out
+
+
+def permutation_p_value(a: List[float], b: List[float], rounds: int = 10000, seed: int = 0) -> Optional[float]:
+    # teste de permutação (bilateral) à diferença de médias: sem assumir normalidade
+    if len(a) < 2 or len(b) < 2:
+        return None
+    observed = abs(statistics.fmean(a) - statistics.fmean(b))
+    pooled = a + b
+    n = len(a)
+    total = sum(pooled)
+
+    def extreme(idx: Iterable[int]) -> bool:
+        sa = sum(pooled[i] for i in idx)
+        return abs(sa / n - (total - sa) / (len(pooled) - n)) >= observed - 1e-12
+
+    all_splits = list(combinations(range(len(pooled)), n)) if len(pooled) <= 16 else None
+    if all_splits is not None:
+        hits = sum(1 for idx in all_splits if extreme(idx))
+        return hits / len(all_splits)
+
+    rng = random.Random(seed)
+    idx = list(range(len(pooled)))
+    hits = 0
+    for _ in range(rounds):
+        rng.shuffle(idx)
+        hits += extreme(idx[:n])
+    return (hits + 1) / (rounds + 1)
+
+
+def compare(conn: sqlite3.Connection, runs_a: Sequence[int], runs_b: Sequence[int]) -> List[Dict[str, object]]:
+    va = metric_values(conn, runs_a)
+    vb = metric_values(conn, runs_b)
+    rows = []
+    for key in sorted(set(va) | set(vb)):
+        a, b = va.get(key, []), vb.get(key, [])
+        mean_a = statistics.fmean(a) if a else None
+        mean_b = statistics.fmean(b) if b else None
+        rows.append({
+            "incident": key[0],
+            "endpoint": key[1],
+            "metric": key[2],
+            "n_a": len(a),
+            "n_b": len(b),
+            "mean_a": mean_a,
+            "mean_b": mean_b,
+            "delta": (mean_b - mean_a) if (mean_a is not None and mean_b is not None) else None,
+            "p_value": permutation_p_value(a, b),
+        })
+    return rows
+
+
+def render_compare(rows: List[Dict[str, object]]) -> str:
+    def f(v, spec=".2f"):
+        return "-" if v is None else format(v, spec)
+
+    lines = [
+        "| Incidente | Endpoint | Métrica | n(A) | n(B) | média A | média B | Δ (B-A) | p |",
+        "|---|---|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for r in rows:
+        lines.append(
+            f"| {r['incident']} | {r['endpoint']} | {r['metric']} | {r['n_a']} | {r['n_b']}"
+            f" | {f(r['mean_a'])} | {f(r['mean_b'])} | {f(r['delta'], '+.2f')} | {f(r['p_value'], '.3f')} |"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+resilience-analyze: ponto de entrada único para a análise de um run.
+
+Uso:
+  python3 scripts/resilience_analyze.py all <RUN_DIR>
+  python3 scripts/resilience_analyze.py metrics|md|report <RUN_DIR>
+"""
+from resilience.cli import main
+
+if __name__ == "__main__":
+    raise SystemExit(main())
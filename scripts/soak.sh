@@ -0,0 +1,69 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# -----------------------------------------------------------------------------
+# soak.sh
+#  - run longo (horas) sob carga constante, para detetar fugas de memória/FDs e
+#    deriva de latência
+#  - monitor_http.sh em modo ROTATE_LINES (chunks comprimidos)
+#  - soak_sample.py: RSS / FDs / lag do event loop via GET /debug/runtime
+#  - k6-soak.js: carga constante (se o k6 estiver instalado)
+#  - no fim: resilience_analyze.py soak (exit 1 se algum declive passar o limite)
+#
+# Uso:
+#   ./scripts/soak.sh [DURAÇÃO]        # ex: 4h (default), 90m
+#
+# Variáveis úteis:
+#  - BASE_URL / AUTH_BASE_URL (default: https://api|auth.resilience.local)
+#  - SOAK_RATE=8 (pedidos/s do k6), SAMPLE_INTERVAL=10 (s), ROTATE_LINES=20000
+#
+# O k6 e o monitor saem do mesmo IP, logo partilham o orçamento do rate limit
+# (RATE_LIMIT_MODE=fair, defaults: 20 rps, metade para o /work). Com o mix do
+# k6-soak.js (4/5 leves, 1/5 /work de custo 5) e o monitor a 2 req/s leves:
+#   leves: 0.8*SOAK_RATE + 2 <= 10 rps     /work: 0.2*SOAK_RATE*5 <= 10 tokens/s
+# ou seja SOAK_RATE <= 10. Acima disso o monitor leva 429, dispara FIRST_FAILURE
+# e passa a modo burst, e o soak mede o limiter em vez do serviço.
+#  - CURL_INSECURE=1 (default) / CURL_CA=/caminho/ca.crt
+# -----------------------------------------------------------------------------
+
+DURATION="${1:-4h}"
+BASE_URL="${BASE_URL:-https://api.resilience.local}"
+AUTH_BASE_URL="${AUTH_BASE_URL:-https://auth.resilience.local}"
+SOAK_RATE="${SOAK_RATE:-8}"
+SAMPLE_INTERVAL="${SAMPLE_INTERVAL:-10}"
+export ROTATE_LINES="${ROTATE_LINES:-20000}"
+export CURL_INSECURE="${CURL_INSECURE:-1}"
+export BASE_URL AUTH_BASE_URL
+
+RUN_DIR="results/soak_$(date +%Y%m%d_%H%M%S)"
+mkdir -p "$RUN_DIR"
+echo "[*] RUN_DIR=$RUN_DIR DURATION=$DURATION SOAK_RATE=$SOAK_RATE"
+if awk -v r="$SOAK_RATE" 'BEGIN { exit !(r > 10) }'; then
+  echo "[WARN] SOAK_RATE=$SOAK_RATE passa o orçamento do rate limit por cliente (10/s com o monitor): esperar 429 no monitor"
+fi
+
+PIDS=()
+cleanup() {
+  echo "[*] A terminar processos em background..."
+  for pid in "${PIDS[@]}"; do kill "$pid" >/dev/null 2>&1 || true; done
+  wait >/dev/null 2>&1 || true
+}
+trap cleanup EXIT
+
+./scripts/monitor_http.sh "$BASE_URL" 1 "$RUN_DIR" >/dev/null &
+PIDS+=($!)
+
+if command -v k6 >/dev/null 2>&1; then
+  k6 run -e DURATION="$DURATION" -e RATE="$SOAK_RATE" -e BASE_URL="$BASE_URL" \
+    --summary-export "$RUN_DIR/k6_soak_summary.json" scripts/k6-soak.js > "$RUN_DIR/k6_soak_output.log" 2>&1 &
+  PIDS+=($!)
+else
+  echo "[WARN] k6 não encontrado: soak sem carga gerada (só tráfego existente)"
+fi
+
+# o sampler define a duração do soak; depois o resto é terminado pelo trap
+(cd scripts && python3 soak_sample.py "../$RUN_DIR" --duration "$DURATION" --interval "$SAMPLE_INTERVAL")
+
+cleanup
+trap - EXIT
+python3 scripts/resilience_analyze.py soak "$RUN_DIR"
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+soak-sample: amostra periodicamente o estado dos processos (GET /debug/runtime da
+API e do Auth: RSS, FDs, threads, lag do event loop) e a latência desse pedido,
+para um run de soak de várias horas.
+
+As amostras vão para <RUN_DIR>/soak.csv.d/ (chunks gzip + index.jsonl, o mesmo
+formato do http_metrics em modo ROTATE_LINES); a análise é feita por
+  python3 scripts/resilience_analyze.py soak <RUN_DIR>
+
+Uso:
+  python3 scripts/soak_sample.py <RUN_DIR> [--api URL] [--auth URL] [--interval 10] [--duration 4h]
+"""
+import argparse
+import json
+import os
+import ssl
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+from resilience.artifacts import ChunkWriter
+
+HEADER = "ts_iso,service,pod,uptime_s,rss_kb,open_fds,threads,loop_lag_ms,loop_lag_max_ms,lat_ms,ok"
+
+
+def parse_duration(s: str) -> float:
+    # "3600", "90m", "4h" -> segundos (0 = até Ctrl+C)
+    units = {"s": 1, "m": 60, "h": 3600}
+    if s and s[-1] in units:
+        return float(s[:-1]) * units[s[-1]]
+    return float(s)
+
+
+def ssl_context(args: argparse.Namespace) -> ssl.SSLContext:
+    if args.insecure:
+        ctx = ssl.create_default_context()
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+        return ctx
+    return ssl.create_default_context(cafile=args.ca)
+
+
+def sample(service: str, base_url: str, token: str, ctx: ssl.SSLContext, timeout: float) -> str:
+    req = urllib.request.Request(f"{base_url}/debug/runtime", headers={"Authorization": f"Bearer {token}"})
+    ts = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout, context=ctx) as r:
+            data = json.loads(r.read())
+        lat_ms = int((time.perf_counter() - t0) * 1000)
+    except (urllib.error.URLError, OSError, ValueError):
+        lat_ms = int((time.perf_counter() - t0) * 1000)
+        return f"{ts},{service},,,,,,,,{lat_ms},0"
+    return ",".join(str(v) for v in (
+        ts, service, data.get("pod", ""), data.get("uptime_s", ""),
+        int(data.get("rss_bytes", 0)) // 1024, data.get("open_fds", ""), data.get("threads", ""),
+        data.get("loop_lag_ms", ""), data.get("loop_lag_max_ms", ""), lat_ms, 1,
+    ))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(prog="soak-sample")
+    ap.add_argument("run_dir", type=Path)
+    ap.add_argument("--api", default=os.getenv("BASE_URL", "https://api.resilience.local"))
+    ap.add_argument("--auth", default=os.getenv("AUTH_BASE_URL", "https://auth.resilience.local"))
+    ap.add_argument("--token", default=os.getenv("AUTH_TOKEN", "secreto123"))
+    ap.add_argument("--interval", type=float, default=10.0, help="segundos entre amostras")
+    ap.add_argument("--fanout", type=int, default=3,
+                    help="pedidos por serviço em cada amostra (atrás do Ingress cada um cai num pod)")
+    ap.add_argument("--duration", type=parse_duration, default=0.0, help="ex: 4h, 90m (0 = até Ctrl+C)")
+    ap.add_argument("--timeout", type=float, default=5.0)
+    ap.add_argument("--chunk-lines", type=int, default=5000)
+    ap.add_argument("--insecure", action="store_true", default=os.getenv("CURL_INSECURE") == "1")
+    ap.add_argument("--ca", default=os.getenv("CURL_CA") or None)
+    args = ap.parse_args()
+
+    ctx = ssl_context(args)
+    targets = [("api", args.api.rstrip("/")), ("auth", args.auth.rstrip("/"))]
+    w = ChunkWriter(
+        args.run_dir / "soak.csv", codec="gzip", chunk_lines=args.chunk_lines, header=HEADER,
+        ts_of=lambda ln: ln.split(",", 1)[0],
+    )
+    t_end = time.monotonic() + args.duration if args.duration else None
+    print(f"[*] soak-sample -> {w.dir} (interval={args.interval}s, fanout={args.fanout})", flush=True)
+    try:
+        while t_end is None or time.monotonic() < t_end:
+            t0 = time.monotonic()
+            for service, url in targets:
+                for _ in range(args.fanout):
+                    w.write(sample(service, url, args.token, ctx, args.timeout))
+            w.flush()
+            time.sleep(max(0.0, args.interval - (time.monotonic() - t0)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        w.close()
+    print(f"[OK] soak-sample terminado ({w.seq} chunks em {w.dir})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
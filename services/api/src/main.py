@@ -1,13 +1,20 @@
 import asyncio
+import hashlib
+import hmac
 import json
 import os
+import threading
 import time
-from typing import Any
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
 
 import httpx
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 
-app = FastAPI(title="API", version="1.0")
+from . import runtime
+from .ratelimit import RateLimit, RateLimiter
+from .state import SharedState, make_backend
+from .tokens import b64url_decode, verify
 
 AUTH_URL = os.getenv("AUTH_URL", "https://auth:8000/validate")
 AUTH_TOKEN = os.getenv("AUTH_TOKEN", "secreto123")
@@ -15,24 +22,278 @@ AUTH_TOKEN = os.getenv("AUTH_TOKEN", "secreto123")
 # CA da tua PKI (cert-manager) montada em /etc/resilience-ca/ca.crt
 AUTH_CA_FILE = os.getenv("AUTH_CA_FILE", "/etc/resilience-ca/ca.crt")
 
+# AUTH_MODE=local  -> valida tokens assinados localmente (Auth só emite tokens/chaves)
+# AUTH_MODE=remote -> chama /validate do Auth em cada pedido (comportamento antigo)
+AUTH_MODE = os.getenv("AUTH_MODE", "local")
+_AUTH_BASE = AUTH_URL.rsplit("/", 1)[0]
+AUTH_TOKEN_URL = os.getenv("AUTH_TOKEN_URL", f"{_AUTH_BASE}/token")
+AUTH_KEYS_URL = os.getenv("AUTH_KEYS_URL", f"{_AUTH_BASE}/keys")
+AUTH_KEYS_REFRESH_S = float(os.getenv("AUTH_KEYS_REFRESH_S", "60"))
+
+# /work: "executor" (thread do executor, comportamento existente) ou, opt-in,
+# "cooperative" (fatias no event loop, cede entre fatias)
+WORK_MODE = os.getenv("WORK_MODE", "executor")
+WORK_DEADLINE_S = float(os.getenv("WORK_DEADLINE_S", "10"))
+WORK_SLICE_S = float(os.getenv("WORK_SLICE_S", "0.005"))
+
+# Deadline do pedido: orçamento restante em ms no header (definido pelo cliente
+# ou por um serviço a montante), limitado pelo timeout do Ingress (proxy-read-timeout).
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+INGRESS_TIMEOUT_S = float(os.getenv("INGRESS_TIMEOUT_S", "60"))
+WORK_MIN_BUDGET_S = float(os.getenv("WORK_MIN_BUDGET_S", "0.05"))
+
+# Rate limiting por cliente (token verificado ou IP do X-Forwarded-For): "off", "bucket" ou "fair".
+# Em "fair", RATE_LIMIT_WORK_SHARE do orçamento de cada cliente é só para o /work
+# e os /work em curso (RATE_LIMIT_WORK_INFLIGHT, teto do pod) repartem-se pelos clientes ativos.
+RATE_LIMIT_MODE = os.getenv("RATE_LIMIT_MODE", "fair")
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "20"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "40"))
+RATE_LIMIT_WORK_COST = float(os.getenv("RATE_LIMIT_WORK_COST", "5"))
+RATE_LIMIT_WORK_SHARE = float(os.getenv("RATE_LIMIT_WORK_SHARE", "0.5"))
+RATE_LIMIT_WORK_INFLIGHT = int(os.getenv("RATE_LIMIT_WORK_INFLIGHT", "4"))
+RATE_LIMIT_IDLE_S = float(os.getenv("RATE_LIMIT_IDLE_S", "60"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+RATE_LIMIT_TRUST_XFF = os.getenv("RATE_LIMIT_TRUST_XFF", "1") == "1"
+# nº de proxies de confiança que acrescentam ao X-Forwarded-For (o Ingress)
+RATE_LIMIT_XFF_HOPS = int(os.getenv("RATE_LIMIT_XFF_HOPS", "1"))
+RATE_LIMIT_WINDOW_S = float(os.getenv("RATE_LIMIT_WINDOW_S", "1"))
+
+# Estado partilhado entre réplicas (contadores do rate limit + cache de validação):
+# "memory" (por pod) ou "redis" (STATE_URL, qualquer servidor com protocolo Redis).
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+STATE_URL = os.getenv("STATE_URL", "redis://state:6379/0")
+STATE_SYNC_S = float(os.getenv("STATE_SYNC_S", "0.1"))
+STATE_NEAR_TTL_S = float(os.getenv("STATE_NEAR_TTL_S", "1"))
+STATE_TIMEOUT_S = float(os.getenv("STATE_TIMEOUT_S", "0.2"))
+
+# contadores expostos em /metrics (formato texto Prometheus)
+COUNTERS: Dict[str, float] = {
+    "work_started_total": 0,
+    "work_done_total": 0,
+    "work_rejected_deadline_total": 0,
+    "work_aborted_deadline_total": 0,
+    "work_aborted_disconnect_total": 0,
+    "work_late_total": 0,
+    "work_after_deadline_seconds_total": 0.0,
+    "auth_rejected_deadline_total": 0,
+    "auth_upstream_deadline_total": 0,
+}
+
 
 def log(event: str, **fields: Any) -> None:
     payload = {"ts": time.time(), "service": "api", "event": event, **fields}
     print(json.dumps(payload, ensure_ascii=False), flush=True)
 
 
-@app.middleware("http")
-async def access_log(request: Request, call_next):
-    t0 = time.time()
-    try:
-        resp = await call_next(request)
-        dt = (time.time() - t0) * 1000
-        log("http", method=request.method, path=request.url.path, status=resp.status_code, lat_ms=int(dt))
-        return resp
-    except Exception as e:
+SHARED = SharedState(
+    make_backend(STATE_BACKEND, STATE_URL, STATE_TIMEOUT_S),
+    sync_s=STATE_SYNC_S,
+    near_ttl_s=STATE_NEAR_TTL_S,
+)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def auth_client() -> httpx.AsyncClient:
+    # cliente partilhado (pool de ligações + contexto TLS carregado uma vez)
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(verify=AUTH_CA_FILE, timeout=3.0)
+    return _client
+
+
+class LocalAuth:
+    """
+    Validação local de tokens assinados (HS256).
+
+    Em background mantém o key set (/keys) e um token de serviço (/token) do Auth.
+    Se o Auth ficar inacessível (netfail), só a emissão/refresh falha: os pedidos
+    continuam a ser validados com as chaves e o token em cache até expirarem.
+
+    Tokens validados e o token de serviço vão também para o SHARED: um pod novo
+    (p.ex. depois do kill_api) arranca com a cache das outras réplicas, mesmo
+    sem conseguir chegar ao Auth.
+    """
+
+    def __init__(self) -> None:
+        self.keys: Dict[str, bytes] = {}
+        self.token: Optional[str] = None
+        self.token_exp: float = 0.0
+        self.token_ttl: float = 0.0
+        self.next_keys: float = 0.0
+        self.next_token: float = 0.0
+        self.healthy = True
+        self._verified: Dict[str, float] = {}  # token -> exp (evita HMAC repetido)
+
+    @staticmethod
+    def _shared_key(token: str) -> str:
+        return "av:" + hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+    def _remember(self, token: str, exp: float) -> None:
+        if len(self._verified) >= 1024:
+            self._verified.clear()
+        self._verified[token] = exp
+
+    async def verify(self, token: str) -> bool:
+        now = time.time()
+        exp = self._verified.get(token)
+        if exp is not None:
+            if exp >= now:
+                return True
+            del self._verified[token]
+        payload = verify(token, self.keys)
+        if payload is not None:
+            exp = float(payload["exp"])
+            self._remember(token, exp)
+            SHARED.put_json(self._shared_key(token), {"exp": exp}, int((exp - now) * 1000) + 1)
+            return True
+        if not self._unknown_kid(token):
+            return False
+        self.next_keys = 0.0  # rotação de chaves: refresh no próximo ciclo
+        # sem a chave (pod novo, Auth inacessível): validação feita por outra réplica
+        cached = await SHARED.get_json(self._shared_key(token))
+        if cached is not None and cached["exp"] >= now:
+            self._remember(token, float(cached["exp"]))
+            return True
+        return False
+
+    def _unknown_kid(self, token: str) -> bool:
+        try:
+            header = json.loads(b64url_decode(token.split(".", 1)[0]))
+        except (ValueError, TypeError, AttributeError):
+            return False
+        # o header vem do cliente: JSON válido mas não objeto ([1], null) não é um token
+        return isinstance(header, dict) and header.get("kid") not in self.keys
+
+    async def refresh(self) -> None:
+        headers = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+        now = time.time()
+        if now >= self.next_keys:
+            r = await auth_client().get(AUTH_KEYS_URL, headers=headers)
+            r.raise_for_status()
+            self.keys = {k["kid"]: b64url_decode(k["k"]) for k in r.json()["keys"]}
+            self.next_keys = now + AUTH_KEYS_REFRESH_S
+            log("auth_keys_refreshed", kids=list(self.keys))
+        # renova o token de serviço quando falta 1/3 da validade
+        if self.token is None or now >= self.next_token:
+            r = await auth_client().post(AUTH_TOKEN_URL, headers=headers)
+            r.raise_for_status()
+            data = r.json()
+            self.token = data["access_token"]
+            self.token_exp = float(data["exp"])
+            self.token_ttl = float(data["expires_in"])
+            self.next_token = self.token_exp - self.token_ttl / 3
+            log("auth_token_refreshed", exp=self.token_exp)
+            SHARED.put_json(
+                "auth:service_token",
+                {"token": self.token, "exp": self.token_exp, "ttl": self.token_ttl},
+                int((self.token_exp - now) * 1000),
+            )
+
+    async def adopt_shared_token(self) -> None:
+        # Auth inacessível e sem token próprio válido: usa o de outra réplica
+        if self.token is not None and self.token_exp > time.time():
+            return
+        data = await SHARED.get_json("auth:service_token")
+        if data is None or data["exp"] <= time.time():
+            return
+        self.token = data["token"]
+        self.token_exp = float(data["exp"])
+        self.token_ttl = float(data["ttl"])
+        log("auth_token_adopted", source=SHARED.backend.name, exp=self.token_exp)
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+                if not self.healthy:
+                    log("auth_refresh_recovered")
+                self.healthy = True
+            except Exception as e:
+                if self.healthy:
+                    log("auth_refresh_failed", error=str(e), token_valid_until=self.token_exp)
+                self.healthy = False
+                await self.adopt_shared_token()
+            await asyncio.sleep(1.0)
+
+
+LOCAL_AUTH = LocalAuth()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = asyncio.create_task(LOCAL_AUTH.run_forever()) if AUTH_MODE == "local" else None
+    sync = asyncio.create_task(SHARED.run_forever(log))
+    lag = asyncio.create_task(runtime.LOOP_LAG.run_forever())
+    yield
+    if task:
+        task.cancel()
+    sync.cancel()
+    lag.cancel()
+    await SHARED.backend.close()
+    if _client is not None:
+        await _client.aclose()
+
+
+app = FastAPI(title="API", version="1.0", lifespan=lifespan)
+
+
+class AccessLog:
+    """
+    Access log como middleware ASGI puro (mesmos campos do antigo @app.middleware).
+    Ao contrário do BaseHTTPMiddleware não embrulha o `receive`, pelo que
+    Request.is_disconnected() vê o disconnect do cliente (cancelamento do /work).
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.time()
+        status = 500
+        # instante de chegada, para o cálculo do deadline (request.state.t_arrival)
+        scope.setdefault("state", {})["t_arrival"] = time.monotonic()
+
+        async def send_wrapper(msg):
+            nonlocal status
+            if msg["type"] == "http.response.start":
+                status = msg["status"]
+            await send(msg)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            dt = (time.time() - t0) * 1000
+            log("http_error", method=scope["method"], path=scope["path"], error=str(e), lat_ms=int(dt))
+            raise
         dt = (time.time() - t0) * 1000
-        log("http_error", method=request.method, path=request.url.path, error=str(e), lat_ms=int(dt))
-        raise
+        log("http", method=scope["method"], path=scope["path"], status=status, lat_ms=int(dt))
+
+
+LIMITER = RateLimiter(
+    mode=RATE_LIMIT_MODE,
+    rate=RATE_LIMIT_RPS,
+    burst=RATE_LIMIT_BURST,
+    work_cost=RATE_LIMIT_WORK_COST,
+    work_share=RATE_LIMIT_WORK_SHARE,
+    work_inflight=RATE_LIMIT_WORK_INFLIGHT,
+    idle_s=RATE_LIMIT_IDLE_S,
+    max_clients=RATE_LIMIT_MAX_CLIENTS,
+    shared=SHARED if STATE_BACKEND != "memory" else None,
+    window_s=RATE_LIMIT_WINDOW_S,
+)
+
+# o último a ser adicionado é o mais exterior: o access log também regista os 429
+app.add_middleware(
+    RateLimit,
+    limiter=LIMITER,
+    trust_xff=RATE_LIMIT_TRUST_XFF,
+    xff_hops=RATE_LIMIT_XFF_HOPS,
+    token_keys=lambda: LOCAL_AUTH.keys,
+)
+app.add_middleware(AccessLog)
 
 
 @app.get("/ping")
@@ -45,47 +306,198 @@ def health():
     return {"status": "ok"}
 
 
+def request_deadline(request: Request, cap_s: Optional[float] = None) -> float:
+    """Deadline (time.monotonic) = chegada + min(header, timeout do Ingress, cap)."""
+    budget = INGRESS_TIMEOUT_S
+    raw = request.headers.get(DEADLINE_HEADER)
+    if raw:
+        try:
+            budget = min(budget, float(raw) / 1000.0)
+        except ValueError:
+            pass
+    if cap_s is not None:
+        budget = min(budget, cap_s)
+    t_arrival = getattr(request.state, "t_arrival", None) or time.monotonic()
+    return t_arrival + budget
+
+
+def remaining_s(deadline: float) -> float:
+    return deadline - time.monotonic()
+
+
+class WorkAborted(Exception):
+    def __init__(self, reason: str, done: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.done = done
+
+
+async def work_cooperative(n: int, request: Request, deadline: float) -> int:
+    """
+    Processa n em fatias dentro do event loop, cedendo entre fatias.
+    O tamanho da fatia adapta-se para durar ~WORK_SLICE_S, e entre fatias
+    verifica-se o deadline e se o cliente desligou (pedido abandonado).
+    """
+    s = 0
+    i = 0
+    chunk = 2000
+    while i < n:
+        t0 = time.perf_counter()
+        end = min(n, i + chunk)
+        for j in range(i, end):
+            s += j * j
+        i = end
+        elapsed = time.perf_counter() - t0
+        if elapsed < WORK_SLICE_S / 2:
+            chunk *= 2
+        elif elapsed > WORK_SLICE_S:
+            chunk = max(1000, chunk // 2)
+
+        await asyncio.sleep(0)
+        if time.monotonic() > deadline:
+            raise WorkAborted("deadline", i)
+        if await request.is_disconnected():
+            raise WorkAborted("client_disconnected", i)
+    return s
+
+
+async def work_executor(n: int, request: Request, deadline: float) -> int:
+    """Modo antigo (thread do executor), agora com cancelamento cooperativo."""
+    stop = threading.Event()
+
+    def cpu_bound():
+        s = 0
+        for start in range(0, n, 50000):
+            if stop.is_set():
+                raise WorkAborted("client_disconnected", start)
+            if time.monotonic() > deadline:
+                raise WorkAborted("deadline", start)
+            for i in range(start, min(n, start + 50000)):
+                s += i * i
+        return s
+
+    fut = asyncio.get_running_loop().run_in_executor(None, cpu_bound)
+    while not fut.done():
+        await asyncio.wait({fut}, timeout=0.1)
+        if not fut.done() and await request.is_disconnected():
+            stop.set()
+    return fut.result()
+
+
 @app.get("/work")
-async def work(n: int = 400000):
+async def work(request: Request, n: int = 400000):
     """
     Endpoint CPU-bound para:
     - gerar carga real (HPA)
     - ser alvo de rate limiting no Ingress
+
+    Pedidos abandonados (cliente desligou, p.ex. timeout/429 no Ingress) ou que
+    excedam o deadline (header X-Request-Timeout-Ms, timeout do Ingress ou
+    WORK_DEADLINE_S) deixam de consumir CPU; sem orçamento nem começam.
     """
-    log("work_start", n=n)
+    deadline = request_deadline(request, WORK_DEADLINE_S)
+    budget = remaining_s(deadline)
+    if budget < WORK_MIN_BUDGET_S:
+        COUNTERS["work_rejected_deadline_total"] += 1
+        log("work_rejected", n=n, reason="deadline_exhausted", budget_s=round(budget, 3))
+        raise HTTPException(status_code=504, detail="deadline_exhausted")
 
-    def cpu_bound():
-        s = 0
-        for i in range(n):
-            s += i * i
-        return s
+    log("work_start", n=n, mode=WORK_MODE, budget_s=round(budget, 3))
+    COUNTERS["work_started_total"] += 1
 
-    loop = asyncio.get_event_loop()
     t0 = time.time()
-    _ = await loop.run_in_executor(None, cpu_bound)
+    runner = work_cooperative if WORK_MODE == "cooperative" else work_executor
+    try:
+        _ = await runner(n, request, deadline)
+    except WorkAborted as e:
+        dt = time.time() - t0
+        late = max(0.0, -remaining_s(deadline))
+        COUNTERS["work_after_deadline_seconds_total"] += late
+        log("work_aborted", n=n, reason=e.reason, done=e.done, compute_s=round(dt, 3), late_s=round(late, 3))
+        if e.reason == "deadline":
+            COUNTERS["work_aborted_deadline_total"] += 1
+            raise HTTPException(status_code=504, detail="work_deadline_exceeded")
+        COUNTERS["work_aborted_disconnect_total"] += 1
+        # 499 (convenção NGINX): o cliente já não está à espera da resposta
+        return Response(status_code=499)
     dt = time.time() - t0
 
-    log("work_done", n=n, compute_s=round(dt, 3))
+    # trabalho concluído depois de o chamador já ter desistido = CPU desperdiçado
+    late = max(0.0, -remaining_s(deadline))
+    if late:
+        COUNTERS["work_late_total"] += 1
+        COUNTERS["work_after_deadline_seconds_total"] += late
+    COUNTERS["work_done_total"] += 1
+
+    log("work_done", n=n, compute_s=round(dt, 3), late_s=round(late, 3))
     return {"result": "done", "compute_s": round(dt, 3)}
 
 
+@app.get("/metrics")
+def metrics():
+    counters = {**COUNTERS, **LIMITER.stats(), **SHARED.stats}
+    body = "".join(f"api_{k} {v}\n" for k, v in counters.items())
+    return Response(body, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/runtime")
+def debug_runtime(request: Request):
+    # estado do processo para soak tests (exige a credencial de serviço)
+    auth = request.headers.get("authorization", "").encode()
+    if not hmac.compare_digest(auth, f"Bearer {AUTH_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="unauthorized")
+    return {"service": "api", **runtime.snapshot()}
+
+
 @app.get("/secure-data")
-async def secure_data():
+async def secure_data(request: Request):
     """
     Demonstração de comunicação interna com TLS *verificado*:
     API -> AUTH via HTTPS, validando CA.
+
+    Em AUTH_MODE=local o token (do cliente, ou o token de serviço da API) é
+    validado localmente, sem ida ao Auth no caminho crítico.
     """
-    headers = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+    if AUTH_MODE == "local":
+        return await secure_data_local(request)
+
+    # propaga o orçamento restante ao Auth (e limita o timeout da chamada)
+    budget = remaining_s(request_deadline(request))
+    if budget <= 0:
+        COUNTERS["auth_rejected_deadline_total"] += 1
+        raise HTTPException(status_code=504, detail="deadline_exhausted")
+    headers = {
+        "Authorization": f"Bearer {AUTH_TOKEN}",
+        DEADLINE_HEADER: str(int(budget * 1000)),
+    }
 
     try:
-        async with httpx.AsyncClient(verify=AUTH_CA_FILE, timeout=3.0) as client:
-            r = await client.get(AUTH_URL, headers=headers)
+        r = await auth_client().get(AUTH_URL, headers=headers, timeout=min(3.0, budget))
     except Exception as e:
         log("auth_call_failed", error=str(e))
         raise HTTPException(status_code=503, detail="auth_unreachable")
 
     log("auth_call", status=r.status_code)
-    if r.status_code != 200:
+    if r.status_code in (401, 403):
         raise HTTPException(status_code=401, detail="unauthorized")
+    if r.status_code == 504:
+        # o Auth ficou sem orçamento: é timeout, não falha de autenticação
+        COUNTERS["auth_upstream_deadline_total"] += 1
+        raise HTTPException(status_code=504, detail="deadline_exhausted")
+    if r.status_code >= 500:
+        raise HTTPException(status_code=503, detail="auth_unavailable")
+    if r.status_code != 200:
+        raise HTTPException(status_code=502, detail=f"auth_unexpected_status_{r.status_code}")
 
     return {"secret": "42", "auth": "valid"}
+
+
+async def secure_data_local(request: Request):
+    auth = request.headers.get("authorization", "")
+    token = auth[7:] if auth.startswith("Bearer ") and auth.count(".") == 2 else LOCAL_AUTH.token
+    if token is None:
+        # ainda sem token de serviço (Auth inacessível desde o arranque)
+        raise HTTPException(status_code=503, detail="auth_unreachable")
+    if not await LOCAL_AUTH.verify(token):
+        raise HTTPException(status_code=401, detail="unauthorized")
+    return {"secret": "42", "auth": "valid"}
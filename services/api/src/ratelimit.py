@@ -0,0 +1,280 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from .tokens import verify
+
+# Rate limiting na própria API, por cliente (o Ingress só vê o IP do nginx/NAT
+# e não distingue o k6 do monitor quando partilham origem).
+#
+#   bucket -> um token bucket por cliente; /work custa WORK_COST tokens
+#   fair   -> um bucket por (cliente, classe): o /work nunca gasta o orçamento
+#             de /ping e /secure-data; e o nº de /work em curso é repartido
+#             por igual pelos clientes ativos (nenhum monopoliza o CPU)
+#
+# Em ambos os modos o total de /work em curso no pod nunca passa de
+# work_inflight, seja qual for o nº de clientes.
+#
+# Com estado partilhado (state.SharedState), cada pedido tem ainda de caber numa
+# janela deslizante global, somada entre réplicas: W = max(window_s, burst/rate)
+# e no máximo max(burst, rate * W) pedidos em qualquer intervalo W. O burst é
+# gasto uma vez (não volta a cada janela) e o ritmo sustentado fica em `rate`
+# para o cluster inteiro: o limite efetivo deixa de crescer com o nº de pods do HPA.
+
+TOO_MANY_BODY = b'{"detail":"rate_limited"}'
+
+# rotas fora do limitador (probes do kubelet e scraping)
+EXEMPT_PATHS = frozenset(["/health", "/metrics", "/debug/runtime"])
+
+
+def path_class(path: str) -> str:
+    return "work" if path == "/work" else "light"
+
+
+class TokenBucket:
+    """Estado O(1) por cliente: tokens disponíveis e instante do último pedido."""
+
+    __slots__ = ("tokens", "last")
+
+    def __init__(self, burst: float, now: float) -> None:
+        self.tokens = burst
+        self.last = now
+
+    def take(self, cost: float, rate: float, burst: float, now: float) -> float:
+        """Consome `cost`; devolve 0 se aceite, senão os segundos até haver tokens."""
+        self.tokens = min(burst, self.tokens + (now - self.last) * rate)
+        self.last = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / rate
+
+
+class RateLimiter:
+    """
+    Buckets num OrderedDict por ordem de último acesso: as entradas paradas há
+    mais de idle_s (ou acima de max_clients) são removidas pela frente, em O(1)
+    amortizado por pedido.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        rate: float,
+        burst: float,
+        work_cost: float,
+        work_share: float,
+        work_inflight: int,
+        idle_s: float,
+        max_clients: int,
+        shared=None,
+        window_s: float = 1.0,
+    ) -> None:
+        self.mode = mode
+        self.rate = rate
+        self.burst = burst
+        self.work_cost = work_cost
+        self.work_share = work_share
+        self.work_inflight = work_inflight
+        self.idle_s = idle_s
+        self.max_clients = max_clients
+        self.buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        self.inflight: Dict[str, int] = {}  # /work em curso por cliente
+        self.inflight_total = 0
+        self.shared = shared
+        self.window_s = window_s
+        self.live_windows: Dict[float, int] = {}  # W -> índice da janela atual
+        self.rejected: Dict[str, int] = {"rate": 0, "fair_share": 0, "work_cap": 0, "shared": 0}
+        self.evicted = 0
+
+    def _limits(self, cls: str) -> Tuple[float, float, float]:
+        # (rate, burst, custo) da classe
+        if self.mode != "fair":
+            return self.rate, self.burst, self.work_cost if cls == "work" else 1.0
+        if cls == "work":
+            return self.rate * self.work_share, self.burst * self.work_share, self.work_cost
+        return self.rate * (1 - self.work_share), self.burst * (1 - self.work_share), 1.0
+
+    def _evict(self, now: float) -> None:
+        while self.buckets:
+            key, b = next(iter(self.buckets.items()))
+            if now - b.last < self.idle_s and len(self.buckets) <= self.max_clients:
+                break
+            del self.buckets[key]
+            self.evicted += 1
+
+    def _shared_width(self, rate: float, burst: float) -> float:
+        # intervalo em que um burst cheio volta a ficar disponível
+        return max(self.window_s, burst / rate) if rate > 0 else self.window_s
+
+    def _check_shared(self, key: Tuple[str, str], rate: float, burst: float, cost: float) -> Tuple[str, float]:
+        # janela deslizante aproximada por dois contadores (atual + anterior com
+        # peso proporcional ao que ainda cai no intervalo); relógio de parede,
+        # igual em todas as réplicas
+        width = self._shared_width(rate, burst)
+        limit = max(burst, rate * width)
+        wall = time.time()
+        idx = int(wall // width)
+        if self.live_windows.get(width) != idx:
+            self.live_windows[width] = idx
+            live = tuple(f":{w:g}:{i}" for w, cur in self.live_windows.items() for i in (cur, cur - 1))
+            self.shared.prune(lambda k: k.endswith(live))
+        prefix = f"rl:{key[0]}:{key[1]}:{width:g}"
+        skey = f"{prefix}:{idx}"
+        elapsed = (wall - idx * width) / width
+        prev = self.shared.count(f"{prefix}:{idx - 1}")
+        used = prev * (1 - elapsed) + self.shared.count(skey)
+        if used + cost <= limit:
+            return skey, 0.0
+        # espera até a parte da janela anterior que ainda conta libertar o excesso
+        to_end = (idx + 1) * width - wall
+        if prev > 0:
+            return skey, min(to_end, (used + cost - limit) * width / prev)
+        return skey, to_end
+
+    def check(self, client: str, cls: str, now: float) -> float:
+        """0 se o pedido passa; senão o Retry-After sugerido (s)."""
+        key = (client, cls if self.mode == "fair" else "")
+        rate, burst, cost = self._limits(cls)
+        if self.shared is not None:
+            skey, wait = self._check_shared(key, rate, burst, cost)
+            if wait:
+                self.rejected["shared"] += 1
+                return wait
+        b = self.buckets.get(key)
+        if b is None:
+            b = self.buckets[key] = TokenBucket(burst, now)
+        else:
+            self.buckets.move_to_end(key)
+        wait = b.take(cost, rate, burst, now)
+        self._evict(now)
+        if wait:
+            self.rejected["rate"] += 1
+        elif self.shared is not None:
+            self.shared.add(skey, math.ceil(cost), int(self._shared_width(rate, burst) * 2000))
+        return wait
+
+    def work_slots(self, client: str) -> int:
+        # quota justa de /work em curso: capacidade / clientes ativos (mín. 1);
+        # a soma é limitada à parte por acquire_work (o mín. 1 não a faz crescer)
+        active = len(self.inflight) + (client not in self.inflight)
+        return max(1, self.work_inflight // active)
+
+    def acquire_work(self, client: str) -> bool:
+        if self.inflight_total >= self.work_inflight:
+            self.rejected["work_cap"] += 1
+            return False
+        if self.mode == "fair" and self.inflight.get(client, 0) >= self.work_slots(client):
+            self.rejected["fair_share"] += 1
+            return False
+        self.inflight[client] = self.inflight.get(client, 0) + 1
+        self.inflight_total += 1
+        return True
+
+    def release_work(self, client: str) -> None:
+        self.inflight_total -= 1
+        n = self.inflight.get(client, 0) - 1
+        if n > 0:
+            self.inflight[client] = n
+        else:
+            self.inflight.pop(client, None)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "ratelimit_rejected_rate_total": self.rejected["rate"],
+            "ratelimit_rejected_fair_share_total": self.rejected["fair_share"],
+            "ratelimit_rejected_work_cap_total": self.rejected["work_cap"],
+            "ratelimit_rejected_shared_total": self.rejected["shared"],
+            "ratelimit_clients": len(self.buckets),
+            "ratelimit_evicted_total": self.evicted,
+            "ratelimit_work_inflight": self.inflight_total,
+        }
+
+
+def client_ip(scope, xff: Optional[bytes], xff_hops: int) -> str:
+    """
+    IP do cliente. Cada proxy de confiança (o Ingress) acrescenta um IP à direita
+    do X-Forwarded-For; os da esquerda vêm do cliente e podem ser forjados. Com
+    xff_hops proxies à frente, o cliente é o xff_hops-ésimo a contar da direita.
+    """
+    if xff and xff_hops > 0:
+        hops = [h.strip() for h in xff.split(b",") if h.strip()]
+        if len(hops) >= xff_hops:
+            return hops[-xff_hops].decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "-"
+
+
+def client_key(
+    scope,
+    trust_xff: bool,
+    xff_hops: int = 1,
+    token_keys: Optional[Callable[[], Dict[str, bytes]]] = None,
+) -> str:
+    """
+    Cliente = sujeito do token, só se a assinatura for válida (tokens.verify com
+    o key set atual); senão o IP (X-Forwarded-For de confiança ou da ligação).
+    Um Authorization inventado não cria buckets novos: conta para o IP.
+    """
+    xff: Optional[bytes] = None
+    auth: Optional[bytes] = None
+    for k, v in scope["headers"]:
+        if k == b"authorization":
+            auth = v
+        elif k == b"x-forwarded-for":
+            xff = v if xff is None else xff + b"," + v
+    if auth is not None and auth.startswith(b"Bearer ") and token_keys is not None:
+        keys = token_keys()
+        payload = verify(auth[7:].decode("latin-1"), keys) if keys else None
+        if payload is not None and payload.get("sub"):
+            return "t:" + str(payload["sub"])
+    return "ip:" + client_ip(scope, xff if trust_xff else None, xff_hops)
+
+
+class RateLimit:
+    """Middleware ASGI puro (como o AccessLog): responde 429 sem chegar à rota."""
+
+    def __init__(
+        self,
+        app,
+        limiter: RateLimiter,
+        trust_xff: bool = True,
+        xff_hops: int = 1,
+        token_keys: Optional[Callable[[], Dict[str, bytes]]] = None,
+    ) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.trust_xff = trust_xff
+        self.xff_hops = xff_hops
+        self.token_keys = token_keys
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.limiter.mode == "off" or scope["path"] in EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+        client = client_key(scope, self.trust_xff, self.xff_hops, self.token_keys)
+        cls = path_class(scope["path"])
+        wait = self.limiter.check(client, cls, time.monotonic())
+        if wait:
+            return await self.reject(send, wait)
+        if cls != "work":
+            return await self.app(scope, receive, send)
+        if not self.limiter.acquire_work(client):
+            return await self.reject(send, 1.0)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release_work(client)
+
+    @staticmethod
+    async def reject(send, retry_after: float) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(TOO_MANY_BODY)).encode()),
+                (b"retry-after", str(max(1, int(retry_after + 0.999))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": TOO_MANY_BODY})
@@ -0,0 +1,297 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+# Estado partilhado entre réplicas da API (contadores de rate limit e cache de
+# validação do Auth). Dois backends com a mesma interface de comandos:
+#
+#   memory -> dicionário no próprio processo (default; nada é partilhado)
+#   redis  -> qualquer servidor que fale o protocolo Redis (RESP), p.ex. Redis,
+#             Valkey, ou o stand-in em services/api/state_standin.py
+#
+# Por cima fica o SharedState: near-cache local + escrita em lote em background,
+# pelo que o caminho do pedido faz no máximo uma ida ao store (GET em miss).
+
+Command = Tuple[Any, ...]
+
+
+class StateError(Exception):
+    pass
+
+
+class MemoryBackend:
+    """Subconjunto de comandos Redis (GET/SET PX/INCRBY/PEXPIRE/DEL/PING) em memória."""
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self.data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self.ops = 0
+
+    def _get(self, key: str, now: float) -> Optional[bytes]:
+        item = self.data.get(key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= now:
+            del self.data[key]
+            return None
+        return item[0]
+
+    def _sweep(self, now: float) -> None:
+        expired = [k for k, (_, exp) in self.data.items() if exp is not None and exp <= now]
+        for k in expired:
+            del self.data[k]
+
+    def execute(self, cmd: Command) -> Any:
+        now = time.monotonic()
+        self.ops += 1
+        if self.ops % 10000 == 0:
+            self._sweep(now)
+        op = str(cmd[0]).upper()
+        key = str(cmd[1]) if len(cmd) > 1 else ""
+        if op == "PING":
+            return "PONG"
+        if op == "GET":
+            return self._get(key, now)
+        if op == "SET":
+            value = cmd[2] if isinstance(cmd[2], bytes) else str(cmd[2]).encode()
+            exp = None
+            if len(cmd) >= 5 and str(cmd[3]).upper() == "PX":
+                exp = now + int(cmd[4]) / 1000.0
+            self.data[key] = (value, exp)
+            return "OK"
+        if op == "INCRBY":
+            old = self._get(key, now)
+            try:
+                n = int(old or 0) + int(cmd[2])
+            except ValueError:
+                raise StateError("ERR value is not an integer or out of range")
+            exp = self.data[key][1] if key in self.data else None
+            self.data[key] = (str(n).encode(), exp)
+            return n
+        if op == "PEXPIRE":
+            if self._get(key, now) is None:
+                return 0
+            self.data[key] = (self.data[key][0], now + int(cmd[2]) / 1000.0)
+            return 1
+        if op == "DEL":
+            return sum(1 for k in cmd[1:] if self.data.pop(str(k), None) is not None)
+        raise StateError(f"ERR unknown command '{op}'")
+
+    async def pipeline(self, cmds: Sequence[Command]) -> List[Any]:
+        return [self.execute(c) for c in cmds]
+
+    async def close(self) -> None:
+        pass
+
+
+def encode_command(cmd: Command) -> bytes:
+    parts = [a if isinstance(a, bytes) else str(a).encode() for a in cmd]
+    out = [b"*%d\r\n" % len(parts)]
+    for p in parts:
+        out.append(b"$%d\r\n%s\r\n" % (len(p), p))
+    return b"".join(out)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("ligação fechada pelo servidor")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        return StateError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        n = int(rest)
+        if n < 0:
+            return None
+        data = await reader.readexactly(n + 2)
+        return data[:-2]
+    if kind == b"*":
+        n = int(rest)
+        return None if n < 0 else [await read_reply(reader) for _ in range(n)]
+    raise StateError(f"resposta RESP inválida: {line!r}")
+
+
+class RedisBackend:
+    """
+    Cliente RESP mínimo (stdlib) com uma ligação e pipelining: todos os comandos
+    de um lote seguem numa só escrita e as respostas são lidas de seguida.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, timeout_s: float) -> None:
+        u = urlparse(url)
+        self.host = u.hostname or "localhost"
+        self.port = u.port or 6379
+        self.db = int(u.path.lstrip("/") or 0)
+        self.password = u.password
+        self.timeout_s = timeout_s
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.lock = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        setup: List[Command] = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        for reply in await self._roundtrip(setup):
+            if isinstance(reply, StateError):
+                raise reply
+
+    async def _roundtrip(self, cmds: Sequence[Command]) -> List[Any]:
+        if not cmds:
+            return []
+        self.writer.write(b"".join(encode_command(c) for c in cmds))
+        await self.writer.drain()
+        return [await read_reply(self.reader) for _ in cmds]
+
+    async def _reset(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def pipeline(self, cmds: Sequence[Command]) -> List[Any]:
+        async with self.lock:
+            try:
+                if self.writer is None:
+                    await asyncio.wait_for(self._connect(), self.timeout_s)
+                return await asyncio.wait_for(self._roundtrip(cmds), self.timeout_s)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, StateError):
+                # estado da ligação desconhecido (respostas a meio): recomeça do zero
+                await self._reset()
+                raise
+
+    async def close(self) -> None:
+        async with self.lock:
+            await self._reset()
+
+
+def make_backend(kind: str, url: str, timeout_s: float):
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "redis":
+        return RedisBackend(url, timeout_s)
+    raise ValueError(f"STATE_BACKEND desconhecido: {kind}")
+
+
+class SharedState:
+    """
+    Camada de near-cache sobre o backend.
+
+    - Contadores (add/count): incrementos acumulados localmente e enviados em
+      lote (INCRBY + PEXPIRE num só pipeline) a cada sync_s; a resposta traz o
+      total global, que passa a ser a base local. Sem idas ao store no pedido.
+    - Valores (get/put): leitura na near-cache (TTL curto) e, em miss, um GET;
+      as escritas ficam em fila para o próximo lote.
+    """
+
+    def __init__(self, backend, sync_s: float, near_ttl_s: float, max_near: int = 10000) -> None:
+        self.backend = backend
+        self.sync_s = sync_s
+        self.near_ttl_s = near_ttl_s
+        self.max_near = max_near
+        self.pending: Dict[str, Tuple[int, int]] = {}  # key -> (delta, ttl_ms)
+        self.counts: Dict[str, int] = {}  # key -> último total global conhecido
+        self.writes: Dict[str, Tuple[bytes, int]] = {}  # key -> (valor, ttl_ms)
+        self.near: "OrderedDict[str, Tuple[Optional[bytes], float]]" = OrderedDict()
+        self.healthy = True
+        self.stats = {"state_flushes_total": 0, "state_gets_total": 0, "state_errors_total": 0}
+
+    # --- contadores -------------------------------------------------------
+
+    def count(self, key: str) -> int:
+        return self.counts.get(key, 0) + self.pending.get(key, (0, 0))[0]
+
+    def add(self, key: str, n: int, ttl_ms: int) -> None:
+        delta, _ = self.pending.get(key, (0, 0))
+        self.pending[key] = (delta + n, ttl_ms)
+
+    def prune(self, keep) -> None:
+        # descarta totais que já não interessam (p.ex. janelas passadas)
+        for k in [k for k in self.counts if not keep(k)]:
+            del self.counts[k]
+
+    # --- valores ----------------------------------------------------------
+
+    def _remember(self, key: str, value: Optional[bytes]) -> None:
+        self.near[key] = (value, time.monotonic() + self.near_ttl_s)
+        self.near.move_to_end(key)
+        while len(self.near) > self.max_near:
+            self.near.popitem(last=False)
+
+    def put(self, key: str, value: bytes, ttl_ms: int) -> None:
+        self.writes[key] = (value, ttl_ms)
+        self._remember(key, value)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self.near.get(key)
+        if item is not None and item[1] > time.monotonic():
+            return item[0]
+        self.stats["state_gets_total"] += 1
+        try:
+            (value,) = await self.backend.pipeline([("GET", key)])
+        except Exception:
+            self.stats["state_errors_total"] += 1
+            return None
+        self._remember(key, value)  # também cacheia ausências (até near_ttl_s)
+        return value
+
+    async def get_json(self, key: str) -> Optional[dict]:
+        raw = await self.get(key)
+        return None if raw is None else json.loads(raw)
+
+    def put_json(self, key: str, value: dict, ttl_ms: int) -> None:
+        self.put(key, json.dumps(value, separators=(",", ":")).encode(), ttl_ms)
+
+    # --- sincronização ----------------------------------------------------
+
+    async def flush(self) -> None:
+        pending, self.pending = self.pending, {}
+        writes, self.writes = self.writes, {}
+        if not pending and not writes:
+            return
+        cmds: List[Command] = []
+        keys = list(pending)
+        for k in keys:
+            delta, ttl_ms = pending[k]
+            cmds.append(("INCRBY", k, delta))
+            cmds.append(("PEXPIRE", k, ttl_ms))
+        for k, (value, ttl_ms) in writes.items():
+            cmds.append(("SET", k, value, "PX", ttl_ms))
+        try:
+            replies = await self.backend.pipeline(cmds)
+        except Exception:
+            # devolve os incrementos à fila (as escritas de cache podem perder-se)
+            for k, (delta, ttl_ms) in pending.items():
+                self.add(k, delta, ttl_ms)
+            self.stats["state_errors_total"] += 1
+            raise
+        for i, k in enumerate(keys):
+            total = replies[2 * i]
+            if isinstance(total, int):
+                self.counts[k] = total
+        self.stats["state_flushes_total"] += 1
+
+    async def run_forever(self, log) -> None:
+        while True:
+            await asyncio.sleep(self.sync_s)
+            try:
+                await self.flush()
+                if not self.healthy:
+                    log("state_recovered", backend=self.backend.name)
+                self.healthy = True
+            except Exception as e:
+                if self.healthy:
+                    log("state_sync_failed", backend=self.backend.name, error=str(e))
+                self.healthy = False
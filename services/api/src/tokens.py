@@ -0,0 +1,65 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Dict, Optional, Tuple
+
+# Tokens assinados estilo JWT (HS256): header.payload.assinatura, em base64url.
+# A API valida-os localmente com o key set publicado em /keys.
+
+
+def b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def b64url_decode(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+def parse_keys(text: str) -> Dict[str, bytes]:
+    # uma chave por linha: "<kid>:<segredo>"; a primeira é a chave ativa de assinatura
+    keys: Dict[str, bytes] = {}
+    for ln in text.splitlines():
+        ln = ln.strip()
+        if not ln or ln.startswith("#") or ":" not in ln:
+            continue
+        kid, secret = ln.split(":", 1)
+        keys[kid.strip()] = secret.strip().encode()
+    return keys
+
+
+def sign(payload: dict, kid: str, key: bytes) -> str:
+    header = {"alg": "HS256", "typ": "JWT", "kid": kid}
+    signing_input = (
+        b64url(json.dumps(header, separators=(",", ":")).encode())
+        + "."
+        + b64url(json.dumps(payload, separators=(",", ":")).encode())
+    )
+    sig = hmac.new(key, signing_input.encode(), hashlib.sha256).digest()
+    return signing_input + "." + b64url(sig)
+
+
+def issue(subject: str, ttl_s: int, kid: str, key: bytes, issuer: str = "auth") -> Tuple[str, int]:
+    now = int(time.time())
+    exp = now + ttl_s
+    return sign({"iss": issuer, "sub": subject, "iat": now, "exp": exp}, kid, key), exp
+
+
+def verify(token: str, keys: Dict[str, bytes], leeway_s: int = 5) -> Optional[dict]:
+    """Devolve o payload se a assinatura e a validade estiverem corretas, senão None."""
+    try:
+        h_b64, p_b64, s_b64 = token.split(".")
+        header = json.loads(b64url_decode(h_b64))
+        key = keys.get(header.get("kid", ""))
+        if key is None or header.get("alg") != "HS256":
+            return None
+        expected = hmac.new(key, f"{h_b64}.{p_b64}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, b64url_decode(s_b64)):
+            return None
+        payload = json.loads(b64url_decode(p_b64))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if payload.get("exp", 0) + leeway_s < time.time():
+        return None
+    return payload
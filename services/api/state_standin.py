@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Stand-in local de um servidor Redis (protocolo RESP, só os comandos usados pela
+API: GET, SET PX, INCRBY, PEXPIRE, DEL, PING), para testar STATE_BACKEND=redis
+sem instalar Redis. O armazenamento é o MemoryBackend de src/state.py.
+
+Uso (a partir da raiz do repo):
+  python3 services/api/state_standin.py [--port 6379]
+  STATE_BACKEND=redis STATE_URL=redis://127.0.0.1:6379/0 uvicorn src.main:app ...
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from src.state import MemoryBackend, StateError  # noqa: E402
+
+
+def encode_reply(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, StateError):
+        return b"-" + str(value).encode() + b"\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+" + value.encode() + b"\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+async def read_command(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # comando inline (p.ex. "PING" via telnet/nc)
+        return tuple(line.split())
+    args = []
+    for _ in range(int(line[1:-2])):
+        n = int((await reader.readline())[1:-2])
+        args.append((await reader.readexactly(n + 2))[:-2])
+    return tuple(args)
+
+
+async def serve(host: str, port: int) -> None:
+    store = MemoryBackend()
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                cmd = await read_command(reader)
+                if cmd is None:
+                    break
+                op = cmd[0].decode().upper()
+                if op in ("SELECT", "AUTH"):
+                    reply = "OK"
+                else:
+                    # o valor do SET fica em bytes; chaves e números passam a str
+                    args = [a if op == "SET" and i == 1 else a.decode() for i, a in enumerate(cmd[1:])]
+                    try:
+                        reply = store.execute((op, *args))
+                    except StateError as e:
+                        reply = e
+                writer.write(encode_reply(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"[OK] stand-in RESP em {host}:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=6379)
+    args = ap.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark do /validate (pedidos/s num core), sem rede nem uvicorn:
+chama a app ASGI diretamente, num único event loop.
+
+  legacy -> implementação antiga (Header() + def síncrono + dict -> JSON,
+            access log com @app.middleware)
+  fast   -> src.main (header lido do scope, compare_digest, resposta pré-codificada,
+            access log ASGI puro)
+
+Uso (a partir da raiz do repo, com as dependências de services/auth instaladas):
+  python3 services/auth/bench_validate.py [--seconds 5]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+from pathlib import Path
+
+from fastapi import FastAPI, Header, HTTPException, Request
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+TOKEN = "secreto123"
+
+
+def legacy_app() -> FastAPI:
+    from src.main import log
+
+    # cópia do /validate original, com o access log original (BaseHTTPMiddleware)
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def access_log(request: Request, call_next):
+        t0 = time.time()
+        resp = await call_next(request)
+        dt = (time.time() - t0) * 1000
+        log("http", method=request.method, path=request.url.path, status=resp.status_code, lat_ms=int(dt))
+        return resp
+
+    @app.get("/validate")
+    def validate(authorization: str = Header(None)):
+        if authorization == f"Bearer {TOKEN}":
+            return {"status": "valid"}
+        raise HTTPException(status_code=401, detail="invalid_token")
+
+    return app
+
+
+def scope(token: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/validate",
+        "raw_path": b"/validate",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"auth"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 40000),
+        "server": ("auth", 8000),
+    }
+
+
+async def call(app, sc: dict) -> int:
+    status = 0
+    sent = False
+    never = asyncio.Event()
+
+    async def receive():
+        # 1ª chamada: corpo vazio; depois bloqueia como um cliente que não desliga
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await never.wait()
+
+    async def send(msg):
+        nonlocal status
+        if msg["type"] == "http.response.start":
+            status = msg["status"]
+
+    await app(sc, receive, send)
+    return status
+
+
+async def bench(app, seconds: float) -> float:
+    ok_scope, bad_scope = scope(TOKEN), scope("errado")
+    assert await call(app, ok_scope) == 200
+    assert await call(app, bad_scope) == 401
+
+    n = 0
+    t_end = time.perf_counter() + seconds
+    t0 = time.perf_counter()
+    while time.perf_counter() < t_end:
+        for _ in range(100):
+            await call(app, ok_scope)
+        n += 100
+    return n / (time.perf_counter() - t0)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args()
+
+    from src.main import app as fast
+
+    results = {}
+    for name, app in (("legacy", legacy_app()), ("fast", fast)):
+        # o access log escreve uma linha JSON por pedido: descartada durante o benchmark
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            rps = asyncio.run(bench(app, args.seconds))
+        results[name] = rps
+        print(f"{name:>6}: {rps:10.0f} req/s/core")
+
+    print(f"speedup: x{results['fast'] / results['legacy']:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,12 +1,33 @@
+import asyncio
+import hmac
 import json
+import os
+import secrets
 import time
-from typing import Any
+from contextlib import asynccontextmanager
+from typing import Any, Dict, FrozenSet, Tuple
 
-from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
 
-app = FastAPI(title="Auth", version="1.0")
+from . import runtime
+from .tokens import b64url, issue, parse_keys
 
-TOKEN = "secreto123"
+# Tokens válidos: um por linha no ficheiro montado a partir do Secret (auth-tokens).
+# Sem ficheiro, cai para AUTH_TOKEN (compatibilidade com o token fixo antigo).
+TOKENS_FILE = os.getenv("AUTH_TOKENS_FILE", "/etc/auth-tokens/tokens")
+FALLBACK_TOKEN = os.getenv("AUTH_TOKEN", "secreto123")
+TOKENS_RELOAD_S = float(os.getenv("AUTH_TOKENS_RELOAD_S", "5"))
+
+# Chaves HS256 para tokens assinados ("<kid>:<segredo>" por linha, a 1ª assina).
+# Têm de ser iguais em todas as réplicas do Auth, por isso vêm do Secret.
+SIGNING_KEYS_FILE = os.getenv("AUTH_SIGNING_KEYS_FILE", "/etc/auth-tokens/signing-keys")
+TOKEN_TTL_S = int(os.getenv("AUTH_TOKEN_TTL_S", "300"))
+
+# respostas pré-codificadas (sem serialização JSON por pedido)
+VALID_BODY = b'{"status":"valid"}'
+INVALID_BODY = b'{"detail":"invalid_token"}'
+DEADLINE_BODY = b'{"detail":"deadline_exhausted"}'
 
 
 def log(event: str, **fields: Any) -> None:
@@ -14,23 +35,200 @@ def log(event: str, **fields: Any) -> None:
     print(json.dumps(payload, ensure_ascii=False), flush=True)
 
 
-@app.middleware("http")
-async def access_log(request: Request, call_next):
-    t0 = time.time()
-    resp = await call_next(request)
-    dt = (time.time() - t0) * 1000
-    log("http", method=request.method, path=request.url.path, status=resp.status_code, lat_ms=int(dt))
-    return resp
+class TokenSet:
+    """
+    Cabeçalhos `Authorization` aceites, pré-calculados em bytes.
+    Recarregado em background quando o ficheiro do Secret muda (mtime).
+    """
+
+    def __init__(self) -> None:
+        self.expected: Tuple[bytes, ...] = ()
+        self.mtime: float = -1.0
+
+    @staticmethod
+    def _headers(tokens: FrozenSet[str]) -> Tuple[bytes, ...]:
+        return tuple(f"Bearer {t}".encode() for t in sorted(tokens))
+
+    def load(self) -> None:
+        try:
+            mtime = os.stat(TOKENS_FILE).st_mtime
+        except OSError:
+            if not self.expected:
+                self.expected = self._headers(frozenset([FALLBACK_TOKEN]))
+                log("tokens_loaded", source="env", count=1)
+            return
+        if mtime == self.mtime:
+            return
+        with open(TOKENS_FILE, encoding="utf-8") as f:
+            tokens = frozenset(ln.strip() for ln in f if ln.strip() and not ln.startswith("#"))
+        if not tokens:
+            log("tokens_reload_ignored", reason="empty_file", path=TOKENS_FILE)
+            return
+        self.expected = self._headers(tokens)
+        self.mtime = mtime
+        log("tokens_loaded", source=TOKENS_FILE, count=len(tokens))
+
+    def check(self, header: bytes) -> bool:
+        # compara com todos os tokens (sem curto-circuito) em tempo constante
+        ok = False
+        for exp in self.expected:
+            ok |= hmac.compare_digest(header, exp)
+        return ok
+
+
+class SigningKeys:
+    """Key set de assinatura (recarregado quando o ficheiro muda, como o TokenSet)."""
+
+    def __init__(self) -> None:
+        self.keys: Dict[str, bytes] = {}
+        self.active: Tuple[str, bytes] = ("", b"")
+        self.mtime: float = -1.0
+
+    def load(self) -> None:
+        try:
+            mtime = os.stat(SIGNING_KEYS_FILE).st_mtime
+        except OSError:
+            if not self.keys:
+                # só para desenvolvimento local: com várias réplicas as chaves divergem
+                kid = "dev-" + secrets.token_hex(4)
+                self.keys = {kid: secrets.token_bytes(32)}
+                self.active = (kid, self.keys[kid])
+                log("signing_keys_generated", kid=kid, warning="sem Secret: chave efémera por réplica")
+            return
+        if mtime == self.mtime:
+            return
+        with open(SIGNING_KEYS_FILE, encoding="utf-8") as f:
+            keys = parse_keys(f.read())
+        if not keys:
+            log("signing_keys_reload_ignored", reason="empty_file", path=SIGNING_KEYS_FILE)
+            return
+        self.keys = keys
+        kid = next(iter(keys))
+        self.active = (kid, keys[kid])
+        self.mtime = mtime
+        log("signing_keys_loaded", source=SIGNING_KEYS_FILE, kids=list(keys), active=kid)
+
+
+TOKENS = TokenSet()
+TOKENS.load()
+SIGNING = SigningKeys()
+SIGNING.load()
+
+
+async def reload_tokens_forever() -> None:
+    while True:
+        await asyncio.sleep(TOKENS_RELOAD_S)
+        try:
+            TOKENS.load()
+            SIGNING.load()
+        except Exception as e:
+            log("tokens_reload_failed", error=str(e))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = asyncio.create_task(reload_tokens_forever())
+    lag = asyncio.create_task(runtime.LOOP_LAG.run_forever())
+    yield
+    task.cancel()
+    lag.cancel()
+
+
+app = FastAPI(title="Auth", version="1.0", lifespan=lifespan)
+
 
+class AccessLog:
+    """
+    Access log como middleware ASGI puro (mesmos campos do antigo @app.middleware):
+    evita a task group / streaming do BaseHTTPMiddleware em cada pedido.
+    """
 
-@app.get("/validate")
-def validate(authorization: str = Header(None)):
-    if authorization == f"Bearer {TOKEN}":
-        return {"status": "valid"}
-    raise HTTPException(status_code=401, detail="invalid_token")
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.time()
+        status = 500
+
+        async def send_wrapper(msg):
+            nonlocal status
+            if msg["type"] == "http.response.start":
+                status = msg["status"]
+            await send(msg)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            dt = (time.time() - t0) * 1000
+            log("http", method=scope["method"], path=scope["path"], status=status, lat_ms=int(dt))
+
+
+app.add_middleware(AccessLog)
+
+
+def bearer_header(request: Request) -> bytes:
+    for k, v in request.scope["headers"]:
+        if k == b"authorization":
+            return v
+    return b""
+
+
+async def validate(request: Request) -> Response:
+    """
+    Hot path: lê o header diretamente do scope ASGI (sem injeção de dependências
+    do FastAPI nem threadpool) e devolve uma resposta pré-codificada.
+    """
+    header = b""
+    budget = None
+    for k, v in request.scope["headers"]:
+        if k == b"authorization":
+            header = v
+        elif k == b"x-request-timeout-ms":
+            budget = v
+    # orçamento propagado pela API já esgotado: o chamador desistiu, não vale a pena responder
+    if budget is not None and budget.lstrip(b"-").isdigit() and int(budget) <= 0:
+        return Response(DEADLINE_BODY, status_code=504, media_type="application/json")
+    if TOKENS.check(header):
+        return Response(VALID_BODY, media_type="application/json")
+    return Response(INVALID_BODY, status_code=401, media_type="application/json")
+
+
+# rota Starlette "crua": evita a camada de parâmetros/serialização do FastAPI
+app.router.add_route("/validate", validate, methods=["GET"])
+
+
+@app.post("/token")
+def token(request: Request):
+    """
+    Emite um token assinado de curta duração em troca da credencial estática.
+    A API valida-o localmente (sem chamar o Auth em cada pedido).
+    """
+    if not TOKENS.check(bearer_header(request)):
+        return Response(INVALID_BODY, status_code=401, media_type="application/json")
+    kid, key = SIGNING.active
+    tok, exp = issue("api", TOKEN_TTL_S, kid, key)
+    log("token_issued", kid=kid, exp=exp)
+    return {"access_token": tok, "token_type": "bearer", "expires_in": TOKEN_TTL_S, "exp": exp}
+
+
+@app.get("/keys")
+def keys(request: Request):
+    # key set para validação local na API (HS256 é simétrico: exige a credencial)
+    if not TOKENS.check(bearer_header(request)):
+        return Response(INVALID_BODY, status_code=401, media_type="application/json")
+    return {"keys": [{"kid": kid, "alg": "HS256", "k": b64url(k)} for kid, k in SIGNING.keys.items()]}
+
+
+@app.get("/debug/runtime")
+def debug_runtime(request: Request):
+    # estado do processo para soak tests (exige uma credencial válida)
+    if not TOKENS.check(bearer_header(request)):
+        return Response(INVALID_BODY, status_code=401, media_type="application/json")
+    return {"service": "auth", **runtime.snapshot()}
 
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
-
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import resource
+import socket
+import threading
+import time
+from typing import Any, Dict
+
+# Estado do processo para testes de soak (GET /debug/runtime): RSS, FDs abertos,
+# threads e atraso do event loop. Lido periodicamente pelo scripts/soak_sample.py.
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_STARTED = time.time()
+HOSTNAME = socket.gethostname()
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, IndexError, ValueError):
+        # fora de Linux: só há o pico (ru_maxrss, em KiB)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def open_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+class LoopLag:
+    """
+    Mede o atraso do event loop: dorme `interval_s` e compara com o tempo real.
+    Um handler que bloqueia o loop aparece como lag em todos os pedidos.
+    """
+
+    def __init__(self, interval_s: float = 0.5) -> None:
+        self.interval_s = interval_s
+        self.last_ms = 0.0
+        self.max_ms = 0.0  # máximo desde a última leitura (snapshot)
+
+    async def run_forever(self) -> None:
+        while True:
+            t0 = time.monotonic()
+            await asyncio.sleep(self.interval_s)
+            lag = max(0.0, (time.monotonic() - t0 - self.interval_s) * 1000)
+            self.last_ms = lag
+            self.max_ms = max(self.max_ms, lag)
+
+
+LOOP_LAG = LoopLag()
+
+
+def snapshot() -> Dict[str, Any]:
+    max_ms, LOOP_LAG.max_ms = LOOP_LAG.max_ms, 0.0
+    return {
+        "pod": HOSTNAME,
+        "pid": os.getpid(),
+        "uptime_s": round(time.time() - _STARTED, 1),
+        "rss_bytes": rss_bytes(),
+        "open_fds": open_fds(),
+        "threads": threading.active_count(),
+        "loop_lag_ms": round(LOOP_LAG.last_ms, 2),
+        "loop_lag_max_ms": round(max_ms, 2),
+    }
@@ -0,0 +1,225 @@
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .runs import Artifact, chunk_files, iter_lines, resolve
+
+# Cache colunar do http_metrics.csv de cada run: uma diretoria por endpoint com
+# um ficheiro binário por coluna (array.tofile, ordenado por ts), lida por mmap.
+# Uma consulta a uma janela é um bisect em ts + agregação em max_points baldes,
+# sem reler o CSV nem transferir o ficheiro inteiro.
+#
+#   <CACHE_DIR>/<run>/http_metrics/meta.json   assinatura da fonte + endpoints + versão
+#   <CACHE_DIR>/<run>/http_metrics/<versão>/ep-<i>/{ts,lat,code,ok}.bin
+#
+# Cada rebuild escreve uma versão nova e troca o meta.json (os.replace): quem já
+# leu o meta anterior ainda encontra os ficheiros dessa versão, que só é apagada
+# no rebuild seguinte. As Series nunca são fechadas à mão (podem estar a ser lidas
+# noutra thread): saem do _loaded e o GC liberta o mmap quando o último leitor a larga.
+
+CACHE_DIR = Path(os.getenv("CACHE_DIR", "/tmp/dashboard-cache"))
+SOURCE = "http_metrics.csv"
+
+# coluna -> typecode do array (o mesmo formato serve o memoryview.cast)
+COLUMNS = {"ts": "d", "lat": "i", "code": "h", "ok": "B"}
+MAX_POINTS = 2000
+
+_lock = threading.Lock()
+_loaded: Dict[Tuple[str, int], Tuple[str, "Series"]] = {}
+
+
+def parse_ts(s: str) -> float:
+    # o mesmo formato aceite por scripts/resilience/model.py (Z, sem timezone = UTC)
+    s = s.strip().replace("Z", "+00:00")
+    if "." in s:
+        # nanossegundos (date -Ins): fromisoformat só aceita até micro
+        head, _, frac = s.partition(".")
+        n = len(frac) - len(frac.lstrip("0123456789"))
+        s = f"{head}.{frac[:min(n, 6)]}{frac[n:]}"
+    dt = datetime.fromisoformat(s)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def source_signature(a: Artifact) -> str:
+    files = chunk_files(a.path) if a.encoding == "chunks" else [a.path]
+    parts = []
+    for p in files:
+        st = p.stat()
+        parts.append(f"{p.name}:{st.st_size}:{st.st_mtime_ns}")
+    return "|".join(parts)
+
+
+class Series:
+    """Colunas de um endpoint, mapeadas em memória (só leitura)."""
+
+    def __init__(self, d: Path) -> None:
+        self.cols: Dict[str, memoryview] = {}
+        for col, code in COLUMNS.items():
+            p = d / f"{col}.bin"
+            if p.stat().st_size == 0:
+                self.cols[col] = memoryview(array(code))
+                continue
+            with p.open("rb") as f:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.cols[col] = memoryview(m).cast(code)
+
+    def __len__(self) -> int:
+        return len(self.cols["ts"])
+
+
+def _cache_dir(run: str) -> Path:
+    return CACHE_DIR / run / "http_metrics"
+
+
+def build(run: str, a: Artifact, signature: str, previous: Optional[str] = None) -> dict:
+    rows: Dict[str, Dict[str, array]] = {}
+    header: Optional[List[str]] = None
+    for ln in iter_lines(a):
+        if not ln:
+            continue
+        parts = ln.split(",")
+        if header is None:
+            header = parts
+            continue
+        if parts == header:
+            continue
+        rec = dict(zip(header, parts))
+        try:
+            ts = parse_ts(rec["ts_iso"])
+            ep = rec["endpoint"]
+            cols = rows.get(ep)
+            if cols is None:
+                cols = rows[ep] = {c: array(t) for c, t in COLUMNS.items()}
+            cols["ts"].append(ts)
+            cols["lat"].append(int(float(rec.get("lat_ms") or 0)))
+            cols["code"].append(int(rec.get("http_code") or 0))
+            cols["ok"].append(1 if rec.get("ok", "0").strip() == "1" else 0)
+        except (KeyError, ValueError, OverflowError):
+            continue
+
+    out = _cache_dir(run)
+    version = f"v{time.time_ns():x}-{os.getpid()}"
+    tmp = out / version
+    tmp.mkdir(parents=True)
+    endpoints = sorted(rows)
+    for i, ep in enumerate(endpoints):
+        cols = rows[ep]
+        ts = cols["ts"]
+        if any(ts[k] > ts[k + 1] for k in range(len(ts) - 1)):
+            # probes concorrentes podem chegar fora de ordem
+            order = sorted(range(len(ts)), key=ts.__getitem__)
+            cols = {c: array(v.typecode, (v[k] for k in order)) for c, v in cols.items()}
+        d = tmp / f"ep-{i}"
+        d.mkdir()
+        for col, values in cols.items():
+            with (d / f"{col}.bin").open("wb") as f:
+                values.tofile(f)
+    meta = {"source": a.name, "signature": signature, "version": version, "endpoints": endpoints,
+            "rows": {ep: len(rows[ep]["ts"]) for ep in endpoints}}
+    meta_tmp = out / f"meta.json.tmp{os.getpid()}"
+    meta_tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    os.replace(meta_tmp, out / "meta.json")
+    # fica a versão nova e a anterior (outro processo com o mesmo CACHE_DIR pode
+    # ter lido o meta antigo); num mmap já aberto o unlink não mexe nos dados mapeados
+    for p in out.iterdir():
+        if p.is_dir() and p.name not in (version, previous):
+            shutil.rmtree(p, ignore_errors=True)
+    return meta
+
+
+def _ensure(run: str) -> dict:
+    # com o _lock: o meta devolvido e a abertura das Series ficam na mesma secção,
+    # sem um rebuild pelo meio a apagar a versão que o meta aponta
+    a = resolve(run, SOURCE)
+    signature = source_signature(a)
+    previous = None
+    try:
+        meta = json.loads((_cache_dir(run) / "meta.json").read_text(encoding="utf-8"))
+        previous = meta.get("version")
+        if previous and meta.get("signature") == signature:
+            return meta
+    except (OSError, ValueError):
+        pass
+    for key in [k for k in _loaded if k[0] == run]:
+        del _loaded[key]
+    return build(run, a, signature, previous)
+
+
+def _series(run: str, meta: dict, endpoint: str) -> Series:
+    i = meta["endpoints"].index(endpoint)
+    key = (run, i)
+    cached = _loaded.get(key)
+    if cached and cached[0] == meta["version"]:
+        return cached[1]
+    s = Series(_cache_dir(run) / meta["version"] / f"ep-{i}")
+    _loaded[key] = (meta["version"], s)
+    return s
+
+
+def ensure(run: str) -> dict:
+    """meta.json do cache do run, reconstruído se a fonte mudou."""
+    with _lock:
+        return _ensure(run)
+
+
+def series(run: str, meta: dict, endpoint: str) -> Series:
+    with _lock:
+        return _series(run, meta, endpoint)
+
+
+def query(run: str, endpoint: Optional[str], t_from: Optional[float], t_to: Optional[float],
+          max_points: int = MAX_POINTS) -> dict:
+    """
+    Série agregada de um endpoint numa janela [t_from, t_to] (epoch s), em no
+    máximo max_points baldes de igual largura. Baldes sem amostras são omitidos.
+    """
+    with _lock:
+        meta = _ensure(run)
+        endpoints = meta["endpoints"]
+        if endpoint is None and endpoints:
+            endpoint = endpoints[0]
+        if endpoint not in endpoints:
+            raise KeyError(endpoint)
+        s = _series(run, meta, endpoint)
+    ts, lat, ok = s.cols["ts"], s.cols["lat"], s.cols["ok"]
+
+    out = {"run": run, "endpoint": endpoint, "endpoints": endpoints,
+           "t": [], "n": [], "ok_ratio": [], "fails": [], "lat_avg_ms": [], "lat_max_ms": []}
+    if not len(s):
+        out.update({"from": t_from, "to": t_to, "bucket_s": None, "rows": 0})
+        return out
+    t0 = ts[0] if t_from is None else t_from
+    t1 = ts[len(s) - 1] if t_to is None else t_to
+    lo, hi = bisect_left(ts, t0), bisect_right(ts, t1)
+    max_points = max(1, min(max_points, MAX_POINTS * 5))
+    width = max((t1 - t0) / max_points, 1e-3)
+    out.update({"from": t0, "to": t1, "bucket_s": width, "rows": hi - lo})
+
+    k = lo
+    while k < hi:
+        b = min(int((ts[k] - t0) / width), max_points - 1)
+        b_end = t0 + (b + 1) * width
+        j = bisect_left(ts, b_end, k, hi) if b < max_points - 1 else hi
+        if j == k:
+            j = k + 1
+        n = j - k
+        good = sum(ok[k:j])
+        lats = lat[k:j]
+        out["t"].append(round(t0 + b * width, 3))
+        out["n"].append(n)
+        out["ok_ratio"].append(round(good / n, 4))
+        out["fails"].append(n - good)
+        out["lat_avg_ms"].append(round(sum(lats) / n, 1))
+        out["lat_max_ms"].append(max(lats))
+        k = j
+    return out
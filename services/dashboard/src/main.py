@@ -1,12 +1,17 @@
+import asyncio
 import json
+import math
 import os
 import time
-from typing import Any
+from typing import Any, Optional
 
 import httpx
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.responses import HTMLResponse
 
+from . import columns, runs
+from .streaming import ArtifactResponse
+
 app = FastAPI(title="Dashboard", version="1.0")
 
 API_PUBLIC = os.getenv("API_PUBLIC", "https://api.resilience.local")
@@ -17,13 +22,39 @@ def log(event: str, **fields: Any) -> None:
     print(json.dumps(payload, ensure_ascii=False), flush=True)
 
 
-@app.middleware("http")
-async def access_log(request: Request, call_next):
-    t0 = time.time()
-    resp = await call_next(request)
-    dt = (time.time() - t0) * 1000
-    log("http", method=request.method, path=request.url.path, status=resp.status_code, lat_ms=int(dt))
-    return resp
+class AccessLog:
+    """
+    Access log como middleware ASGI puro (mesmos campos do antigo @app.middleware).
+    O BaseHTTPMiddleware passa o corpo por uma memory stream e esconde as
+    extensões ASGI do servidor (pathsend/zerocopy) às respostas de /runs.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.time()
+        status = 500
+
+        async def send_wrapper(msg):
+            nonlocal status
+            if msg["type"] == "http.response.start":
+                status = msg["status"]
+            await send(msg)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            dt = (time.time() - t0) * 1000
+            log("http_error", method=scope["method"], path=scope["path"], error=str(e), lat_ms=int(dt))
+            raise
+        dt = (time.time() - t0) * 1000
+        log("http", method=scope["method"], path=scope["path"], status=status, lat_ms=int(dt))
+
+
+app.add_middleware(AccessLog)
 
 
 HTML = """
@@ -72,6 +103,91 @@ upd();
 """
 
 
+BROWSE_HTML = """
+<!doctype html>
+<html>
+<head>
+  <meta charset="utf-8"/>
+  <title>Runs</title>
+  <style>
+    body { font-family: Arial, sans-serif; margin: 40px; }
+    .cols { display: flex; gap: 32px; }
+    #runs a { display: block; margin: 2px 0; }
+    table { border-collapse: collapse; }
+    td { padding: 2px 10px; border-bottom: 1px solid #eee; }
+    svg { border: 1px solid #ddd; border-radius: 8px; margin: 8px 0; }
+    code { background: #f5f5f5; padding: 2px 6px; border-radius: 6px; }
+  </style>
+</head>
+<body>
+  <h1>Runs</h1>
+  <div class="cols">
+    <div id="runs">...</div>
+    <div>
+      <h2 id="title"></h2>
+      <table id="files"></table>
+      <p>
+        janela: <input id="from" size="28" placeholder="from (epoch ou ISO)"/>
+        <input id="to" size="28" placeholder="to"/>
+        <button onclick="series()">séries</button>
+      </p>
+      <div id="series"></div>
+    </div>
+  </div>
+
+<script>
+let run = null;
+const fmtSize = n => n == null ? 'chunks' : n < 1024 ? n + ' B' : n < 1048576 ? (n / 1024).toFixed(1) + ' KB' : (n / 1048576).toFixed(1) + ' MB';
+
+async function loadRuns() {
+  let r = await (await fetch('/runs')).json();
+  document.getElementById('runs').innerHTML = r.runs.map(x => `<a href="#" onclick="openRun('${x.run}');return false">${x.run}</a>`).join('') || 'sem runs';
+}
+
+async function openRun(name) {
+  run = name;
+  document.getElementById('title').textContent = name;
+  let r = await (await fetch('/runs/' + name)).json();
+  document.getElementById('files').innerHTML = r.files.map(f =>
+    `<tr><td><a href="/runs/${name}/files/${f.name}">${f.name}</a></td><td>${f.encoding}</td><td>${fmtSize(f.size)}</td></tr>`).join('');
+  document.getElementById('from').value = '';
+  document.getElementById('to').value = '';
+  series();
+}
+
+function chart(label, t, ys, t0, t1, ymax, color) {
+  const W = 720, H = 120;
+  const x = v => ((v - t0) / Math.max(t1 - t0, 1e-3) * W).toFixed(1);
+  const y = v => (H - v / Math.max(ymax, 1e-9) * (H - 10)).toFixed(1);
+  const pts = t.map((v, i) => x(v) + ',' + y(ys[i])).join(' ');
+  return `<div><code>${label}</code></div><svg width="${W}" height="${H}"><polyline fill="none" stroke="${color}" points="${pts}"/></svg>`;
+}
+
+async function series() {
+  if (!run) return;
+  const q = new URLSearchParams({ max_points: 720 });
+  for (const k of ['from', 'to']) { const v = document.getElementById(k).value; if (v) q.set(k, v); }
+  let first = await fetch(`/runs/${run}/series?` + q);
+  if (!first.ok) { document.getElementById('series').textContent = 'sem http_metrics.csv'; return; }
+  first = await first.json();
+  let html = '';
+  for (const ep of first.endpoints) {
+    q.set('endpoint', ep);
+    const s = ep === first.endpoint ? first : await (await fetch(`/runs/${run}/series?` + q)).json();
+    html += `<h3>${ep} <small>(${s.rows} amostras, balde ${s.bucket_s ? s.bucket_s.toFixed(2) : '-'} s)</small></h3>`;
+    html += chart('ok_ratio', s.t, s.ok_ratio, s.from, s.to, 1, '#0a0');
+    html += chart('lat_max_ms (max ' + Math.max(0, ...s.lat_max_ms) + ')', s.t, s.lat_max_ms, s.from, s.to, Math.max(1, ...s.lat_max_ms), '#a00');
+  }
+  document.getElementById('series').innerHTML = html;
+}
+
+loadRuns();
+</script>
+</body>
+</html>
+"""
+
+
 @app.get("/", response_class=HTMLResponse)
 def index():
     return HTML
@@ -80,3 +196,75 @@ def index():
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+# -----------------------------------------------------------------------------
+# Browser de runs (RESULTS_DIR): ficheiros em stream + séries do cache colunar
+# -----------------------------------------------------------------------------
+def _artifacts(run: str):
+    try:
+        return runs.list_artifacts(run)
+    except runs.NotFound:
+        raise HTTPException(status_code=404, detail=f"run não encontrado: {run}")
+
+
+@app.get("/runs")
+def list_runs():
+    return {"results_dir": str(runs.RESULTS_DIR), "runs": runs.list_runs()}
+
+
+@app.get("/runs/{run}")
+def run_files(run: str):
+    files = [
+        {"name": a.name, "encoding": a.encoding, "size": a.size, "mtime": a.mtime}
+        for a in _artifacts(run)
+    ]
+    return {"run": run, "files": files}
+
+
+@app.api_route("/runs/{run}/files/{name:path}", methods=["GET", "HEAD"])
+def run_file(run: str, name: str):
+    try:
+        return ArtifactResponse(runs.resolve(run, name))
+    except runs.NotFound:
+        raise HTTPException(status_code=404, detail=f"ficheiro não encontrado: {name}")
+
+
+def _epoch(v: Optional[str]) -> Optional[float]:
+    if v is None or v == "":
+        return None
+    try:
+        t = float(v)
+    except ValueError:
+        try:
+            t = columns.parse_ts(v)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"instante inválido: {v}")
+    if not math.isfinite(t):
+        # float() aceita nan/inf, que rebentam a divisão em baldes do columns.query
+        raise HTTPException(status_code=400, detail=f"instante inválido: {v}")
+    return t
+
+
+@app.get("/runs/{run}/series")
+async def run_series(
+    run: str,
+    endpoint: Optional[str] = None,
+    t_from: Optional[str] = Query(None, alias="from"),
+    t_to: Optional[str] = Query(None, alias="to"),
+    max_points: int = Query(500, ge=1, le=columns.MAX_POINTS),
+):
+    """Série agregada (epoch s ou ISO em from/to) sem transferir o http_metrics.csv."""
+    t0, t1 = _epoch(t_from), _epoch(t_to)
+    try:
+        # a primeira consulta de um run constrói o cache: fora do event loop
+        return await asyncio.to_thread(columns.query, run, endpoint, t0, t1, max_points)
+    except runs.NotFound as e:
+        raise HTTPException(status_code=404, detail=f"não encontrado: {e}")
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"endpoint sem amostras: {endpoint}")
+
+
+@app.get("/browse", response_class=HTMLResponse)
+def browse():
+    return BROWSE_HTML
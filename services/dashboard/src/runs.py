@@ -0,0 +1,159 @@
+import gzip
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterator, List, Optional
+
+# Acesso só de leitura a RESULTS_DIR (results/<run>/...), com os artefactos nas
+# formas escritas pelos scripts: texto, <nome>.gz / <nome>.zst, ou <nome>.d/
+# (chunks rodados + index.jsonl + active.csv, ver scripts/resilience/artifacts.py).
+
+RESULTS_DIR = Path(os.getenv("RESULTS_DIR", "results"))
+
+COMPRESSED = {".gz": "gzip", ".zst": "zstd"}
+INDEX_NAME = "index.jsonl"
+
+
+class NotFound(Exception):
+    pass
+
+
+@dataclass
+class Artifact:
+    name: str            # nome lógico (p.ex. evidencias/api_logs.txt)
+    path: Path           # ficheiro ou diretoria de chunks em disco
+    encoding: str        # "identity", "gzip", "zstd" ou "chunks"
+    size: Optional[int]  # bytes em disco (None para chunks)
+    mtime: float
+
+
+def _safe_name(name: str) -> bool:
+    return bool(name) and "/" not in name and "\\" not in name and not name.startswith(".")
+
+
+def run_dir(run: str) -> Path:
+    if not _safe_name(run):
+        raise NotFound(run)
+    d = RESULTS_DIR / run
+    if not d.is_dir():
+        raise NotFound(run)
+    return d
+
+
+def list_runs() -> List[dict]:
+    if not RESULTS_DIR.is_dir():
+        return []
+    out = []
+    for d in sorted(RESULTS_DIR.iterdir(), key=lambda p: p.name, reverse=True):
+        if d.is_dir() and _safe_name(d.name):
+            st = d.stat()
+            out.append({"run": d.name, "mtime": st.st_mtime})
+    return out
+
+
+def _within(base: Path, p: Path) -> bool:
+    try:
+        p.resolve().relative_to(base.resolve())
+        return True
+    except ValueError:
+        return False
+
+
+def list_artifacts(run: str) -> List[Artifact]:
+    base = run_dir(run)
+    out: List[Artifact] = []
+    for root, dirs, files in os.walk(base):
+        rootp = Path(root)
+        # <nome>.d/ é um artefacto só (não se desce lá dentro)
+        chunked = [d for d in dirs if d.endswith(".d") and (rootp / d / INDEX_NAME).exists()]
+        dirs[:] = [d for d in dirs if d not in chunked and not d.startswith(".")]
+        for d in chunked:
+            p = rootp / d
+            out.append(Artifact(str(p.relative_to(base))[:-2], p, "chunks", None, p.stat().st_mtime))
+        for f in files:
+            p = rootp / f
+            if f.startswith(".") or not _within(base, p):
+                continue
+            st = p.stat()
+            enc = COMPRESSED.get(p.suffix, "identity")
+            name = str(p.relative_to(base))
+            out.append(Artifact(name[: -len(p.suffix)] if enc != "identity" else name, p, enc,
+                                st.st_size, st.st_mtime))
+    return sorted(out, key=lambda a: a.name)
+
+
+def resolve(run: str, name: str) -> Artifact:
+    """Artefacto pelo nome lógico (sem .gz/.zst) ou pelo nome em disco."""
+    base = run_dir(run)
+    if any(part in ("", ".", "..") or part.startswith(".") for part in name.split("/")):
+        raise NotFound(name)
+    for a in list_artifacts(run):
+        if a.name == name or str(a.path.relative_to(base)) == name:
+            return a
+    raise NotFound(name)
+
+
+def _open_zstd(path: Path) -> IO[bytes]:
+    try:
+        import zstandard
+    except ImportError:
+        raise NotFound(f"{path.name}: zstandard não instalado")
+    return zstandard.ZstdDecompressor().stream_reader(path.open("rb"))
+
+
+def open_decoded(path: Path, encoding: str) -> IO[bytes]:
+    if encoding == "gzip":
+        return gzip.open(path, "rb")
+    if encoding == "zstd":
+        return _open_zstd(path)
+    return path.open("rb")
+
+
+def chunk_files(d: Path) -> List[Path]:
+    files = []
+    with (d / INDEX_NAME).open(encoding="utf-8") as f:
+        for ln in f:
+            try:
+                files.append(d / json.loads(ln)["file"])
+            except (ValueError, KeyError, TypeError):
+                continue
+    files += sorted(d.glob("active.*"))
+    # o índice vem do disco: "file" com ../ ou absoluto não pode sair da diretoria
+    return [p for p in files if p.is_file() and _within(d, p)]
+
+
+def iter_decoded(a: Artifact, block: int = 256 * 1024) -> Iterator[bytes]:
+    """Conteúdo descomprimido, em blocos; chunks concatenados sem repetir o cabeçalho."""
+    if a.encoding != "chunks":
+        with open_decoded(a.path, a.encoding) as f:
+            while True:
+                buf = f.read(block)
+                if not buf:
+                    return
+                yield buf
+    header: Optional[bytes] = None
+    for p in chunk_files(a.path):
+        with open_decoded(p, COMPRESSED.get(p.suffix, "identity")) as f:
+            first = f.readline()
+            if header is None:
+                header = first
+                yield first
+            elif first != header:
+                yield first
+            while True:
+                buf = f.read(block)
+                if not buf:
+                    break
+                yield buf
+
+
+def iter_lines(a: Artifact) -> Iterator[str]:
+    pending = b""
+    for buf in iter_decoded(a):
+        pending += buf
+        *lines, pending = pending.split(b"\n")
+        for ln in lines:
+            yield ln.decode("utf-8", "replace").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8", "replace").rstrip("\r")
@@ -0,0 +1,253 @@
+import asyncio
+import mimetypes
+import os
+import re
+import zlib
+from email.utils import formatdate
+from typing import Iterator, List, Optional, Tuple
+
+from starlette.responses import Response
+
+from .runs import Artifact, iter_decoded, open_decoded
+
+# Resposta para artefactos de um run, sem carregar o ficheiro em memória:
+#   - ficheiros em disco: Range (206/416), ETag/If-None-Match (304), HEAD,
+#     zero-copy pelas extensões ASGI "http.response.zerocopy"/"pathsend" quando
+#     o servidor as anuncia; senão os.pread em blocos numa thread;
+#   - gzip on-the-fly (só sem Range e só para texto); .gz servido tal como está
+#     se o cliente aceitar gzip, descomprimido em stream caso contrário;
+#   - <nome>.d/ (chunks): concatenação virtual sem cabeçalhos repetidos (sem Range).
+
+BLOCK = 256 * 1024
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+TEXT_TYPES = {".csv": "text/csv", ".log": "text/plain", ".txt": "text/plain",
+              ".jsonl": "application/x-ndjson", ".md": "text/markdown"}
+COMPRESSIBLE = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+
+RANGE_RE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+def content_type(name: str) -> str:
+    ext = os.path.splitext(name)[1].lower()
+    ctype = TEXT_TYPES.get(ext) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if ctype.startswith("text/"):
+        ctype += "; charset=utf-8"
+    return ctype
+
+
+def accepts(header: str, coding: str) -> bool:
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if token.strip().lower() in (coding, "*"):
+            q = params.strip()
+            if not q.startswith("q="):
+                return True
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False  # q inválido: trata-se como não aceite (resposta sem compressão)
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (início, fim inclusivo) de um Range "bytes=a-b" simples.
+    Devolve None se o header não for usável (multi-range, sintaxe) -> 200 completo;
+    levanta ValueError se o intervalo não for satisfazível -> 416.
+    """
+    m = RANGE_RE.match(header)
+    if not m:
+        return None
+    a, b = m.group(1), m.group(2)
+    if not a and not b:
+        return None
+    if not a:
+        n = int(b)
+        if n == 0 or size == 0:
+            raise ValueError(header)
+        return max(0, size - n), size - 1
+    start = int(a)
+    end = min(int(b), size - 1) if b else size - 1
+    if start >= size or (b and int(b) < start):
+        raise ValueError(header)
+    return start, end
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    weak = etag[2:] if etag.startswith("W/") else etag
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == weak:
+            return True
+    return False
+
+
+class ArtifactResponse(Response):
+    def __init__(self, artifact: Artifact, status_code: int = 200) -> None:
+        self.artifact = artifact
+        self.status_code = status_code
+        self.background = None
+        self.body = b""
+        self.raw_headers = []
+
+    async def __call__(self, scope, receive, send) -> None:
+        a = self.artifact
+        req = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        head = scope.get("method") == "HEAD"
+        accept_enc = req.get("accept-encoding", "")
+        ctype = content_type(a.name)
+        compressible = ctype.startswith(COMPRESSIBLE)
+
+        headers: List[Tuple[str, str]] = [("content-type", ctype), ("vary", "accept-encoding")]
+        if a.encoding == "chunks":
+            # o conteúdo muda enquanto o run corre: sem ETag nem Range
+            headers += [("accept-ranges", "none"), ("cache-control", "no-cache")]
+            gz = compressible and accepts(accept_enc, "gzip")
+            return await self._stream(send, head, headers, iter_decoded(a), gz)
+
+        st = os.stat(a.path)
+        etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        headers += [("last-modified", formatdate(st.st_mtime, usegmt=True)), ("accept-ranges", "bytes")]
+
+        if a.encoding != "identity" and not accepts(accept_enc, a.encoding):
+            # cliente não aceita a compressão em disco: descomprime em stream
+            headers = [h for h in headers if h[0] != "accept-ranges"] + [("accept-ranges", "none"),
+                                                                         ("etag", f"W/{etag}")]
+            if _etag_matches(req.get("if-none-match", ""), etag):
+                return await self._start(send, 304, headers, end=True)
+            try:
+                fobj = open_decoded(a.path, a.encoding)
+            except Exception:
+                return await self._start(send, 406, [("content-length", "0")], end=True)
+            return await self._stream(send, head, headers, _read_blocks(fobj), False)
+
+        if a.encoding != "identity":
+            headers.append(("content-encoding", a.encoding))
+
+        rng_header = req.get("range")
+        if rng_header and req.get("if-range") and not _etag_matches(req["if-range"], etag):
+            rng_header = None
+        rng = None
+        if rng_header:
+            try:
+                rng = parse_range(rng_header, st.st_size)
+            except ValueError:
+                return await self._start(send, 416, [("content-range", f"bytes */{st.st_size}"),
+                                                     ("content-length", "0")], end=True)
+
+        if rng is None and a.encoding == "identity" and compressible \
+                and st.st_size >= GZIP_MIN_BYTES and accepts(accept_enc, "gzip"):
+            gz_etag = f'W/"{st.st_size:x}-{st.st_mtime_ns:x}-gz"'
+            headers.append(("etag", gz_etag))
+            if _etag_matches(req.get("if-none-match", ""), gz_etag):
+                return await self._start(send, 304, headers, end=True)
+            return await self._stream(send, head, headers, _pread_blocks(a.path, 0, st.st_size), True)
+
+        headers.append(("etag", etag))
+        if _etag_matches(req.get("if-none-match", ""), etag):
+            return await self._start(send, 304, headers, end=True)
+
+        status = 200
+        start, end = 0, st.st_size - 1
+        if rng is not None:
+            status = 206
+            start, end = rng
+            headers.append(("content-range", f"bytes {start}-{end}/{st.st_size}"))
+        count = end - start + 1
+        headers.append(("content-length", str(count)))
+        await self._start(send, status, headers, end=head or count == 0)
+        if head or count == 0:
+            return
+        await self._send_file(scope, send, str(a.path), start, count, whole=rng is None)
+
+    async def _start(self, send, status: int, headers, end: bool = False) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+        })
+        if end:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_file(self, scope, send, path: str, offset: int, count: int, whole: bool) -> None:
+        ext = scope.get("extensions") or {}
+        if whole and "http.response.pathsend" in ext:
+            await send({"type": "http.response.pathsend", "path": path})
+            return
+        f = open(path, "rb")
+        try:
+            if "http.response.zerocopy" in ext:
+                # o servidor faz sendfile() do ficheiro para o socket
+                await send({"type": "http.response.zerocopy", "file": f,
+                            "offset": offset, "count": count, "more_body": False})
+                return
+            fd = f.fileno()
+            sent = 0
+            while sent < count:
+                n = min(BLOCK, count - sent)
+                buf = await asyncio.to_thread(os.pread, fd, n, offset + sent)
+                if not buf:
+                    break
+                sent += len(buf)
+                await send({"type": "http.response.body", "body": buf, "more_body": sent < count})
+            if sent < count:
+                # ficheiro encolheu entretanto: fecha a resposta
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            f.close()
+
+    async def _stream(self, send, head: bool, headers, blocks: Iterator[bytes], gz: bool) -> None:
+        if gz:
+            headers = headers + [("content-encoding", "gzip")]
+        await self._start(send, 200, headers, end=head)
+        if head:
+            blocks_close = getattr(blocks, "close", None)
+            if blocks_close:
+                blocks_close()
+            return
+        comp = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if gz else None
+
+        def step() -> Optional[bytes]:
+            for buf in blocks:
+                out = comp.compress(buf) if comp else buf
+                if out:
+                    return out
+            return None
+
+        try:
+            while True:
+                out = await asyncio.to_thread(step)
+                if out is None:
+                    break
+                await send({"type": "http.response.body", "body": out, "more_body": True})
+            tail = comp.flush() if comp else b""
+            await send({"type": "http.response.body", "body": tail, "more_body": False})
+        finally:
+            close = getattr(blocks, "close", None)
+            if close:
+                close()
+
+
+def _pread_blocks(path, offset: int, count: int) -> Iterator[bytes]:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        end = offset + count
+        while offset < end:
+            buf = os.pread(fd, min(BLOCK, end - offset), offset)
+            if not buf:
+                return
+            offset += len(buf)
+            yield buf
+    finally:
+        os.close(fd)
+
+
+def _read_blocks(fobj) -> Iterator[bytes]:
+    with fobj:
+        while True:
+            buf = fobj.read(BLOCK)
+            if not buf:
+                return
+            yield buf